@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_marshmallow import Marshmallow
 from marshmallow import fields, ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -7,10 +7,15 @@ from datetime import datetime
 
 # Importar la capa de datos
 from database import DatabaseLayer
+from serializers import CompiledSchema, stream_json
+import query_cache
+import unit_of_work
 
 app = Flask(__name__)
 app.secret_key = 'tu_clave_secreta_super_segura_123'
 ma = Marshmallow(app)
+# Una conexión a MySQL por petición para todos los métodos de DatabaseLayer
+unit_of_work.init_app(app)
 
 # ==================== DECORADORES DE AUTENTICACIÓN ====================
 
@@ -63,11 +68,38 @@ class LoanSchema(ma.Schema):
     estado = fields.Str(dump_only=True)
 
 book_schema = BookSchema()
-books_schema = BookSchema(many=True)
 member_schema = MemberSchema()
-members_schema = MemberSchema(many=True)
 loan_schema = LoanSchema()
-loans_schema = LoanSchema(many=True)
+
+# Los listados usan el dump compilado (misma salida, sin recorrer los campos
+# con Marshmallow en cada fila)
+books_schema = CompiledSchema(BookSchema(many=True))
+members_schema = CompiledSchema(MemberSchema(many=True))
+loans_schema = CompiledSchema(LoanSchema(many=True))
+
+# ==================== LISTADOS EN STREAMING ====================
+
+def list_response(schema, get_rows, iter_rows):
+    """Respuesta de un listado de la API, completa o en streaming
+    
+    - ?stream=1: el arreglo JSON se envía por partes (chunked), un lote de
+      filas a la vez, sin armar la lista completa en memoria
+    - ?format=ndjson o Accept: application/x-ndjson: un objeto JSON por línea,
+      también en streaming
+    - sin parámetros: la respuesta completa de siempre
+    """
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    if ndjson or request.args.get('stream') in ('1', 'true'):
+        rows = iter_rows()
+        if rows is None:
+            return {"error": "Error al obtener el listado"}, 500
+        body = stream_json(rows, schema, app.json, ndjson)
+        response = Response(body, mimetype='application/x-ndjson' if ndjson else 'application/json')
+        # Al terminar (o cortarse) la respuesta se libera la conexión de las filas
+        response.call_on_close(rows.close)
+        return response, 200
+    return schema.jsonify(get_rows()), 200
 
 # ==================== RUTAS DE AUTENTICACIÓN ====================
 
@@ -106,17 +138,12 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Obtener datos desde la base de datos
-    libros = DatabaseLayer.get_all_books()
-    miembros = DatabaseLayer.get_all_members()
-    prestamos = DatabaseLayer.get_all_loans()
-    
-    stats = {
-        'total_libros': len(libros),
-        'libros_disponibles': sum(1 for l in libros if l['disponible']),
-        'total_miembros': len(miembros),
-        'prestamos_activos': sum(1 for p in prestamos if p['estado'] == 'Activo')
-    }
+    # Los conteos se calculan en MySQL en lugar de traer las tablas completas
+    stats = DatabaseLayer.get_dashboard_stats()
+    if stats is None:
+        flash('Error al obtener estadísticas', 'danger')
+        stats = {'total_libros': 0, 'libros_disponibles': 0,
+                 'total_miembros': 0, 'prestamos_activos': 0}
     return render_template('dashboard.html', **stats)
 
 # ==================== RUTAS DE PÁGINAS CON FORMULARIOS ====================
@@ -159,9 +186,9 @@ def create_book_form():
         año_publicacion = int(request.form.get('año_publicacion'))
         categoria = request.form.get('categoria')
         
-        book_id = DatabaseLayer.create_book(titulo, autor, isbn, año_publicacion, categoria)
+        libro = DatabaseLayer.create_book(titulo, autor, isbn, año_publicacion, categoria)
         
-        if book_id:
+        if libro:
             flash(f'Libro "{titulo}" agregado exitosamente', 'success')
         else:
             flash('Error al crear libro', 'danger')
@@ -172,14 +199,11 @@ def create_book_form():
 @app.route('/books/delete/<int:book_id>', methods=['POST'])
 @login_required
 def delete_book_form(book_id):
-    libro = DatabaseLayer.get_book_by_id(book_id)
+    libro, error = DatabaseLayer.delete_book(book_id)
     if libro:
-        if DatabaseLayer.delete_book(book_id):
-            flash(f'Libro "{libro["titulo"]}" eliminado exitosamente', 'success')
-        else:
-            flash('Error al eliminar libro', 'danger')
+        flash(f'Libro "{libro["titulo"]}" eliminado exitosamente', 'success')
     else:
-        flash('Libro no encontrado', 'danger')
+        flash(error, 'danger')
     return redirect(url_for('books_page'))
 
 # ==================== RUTAS DE FORMULARIOS - MIEMBROS ====================
@@ -193,9 +217,9 @@ def create_member_form():
         correo = request.form.get('correo')
         telefono = request.form.get('telefono')
         
-        member_id = DatabaseLayer.create_member(nombre, apellido, correo, telefono)
+        miembro = DatabaseLayer.create_member(nombre, apellido, correo, telefono)
         
-        if member_id:
+        if miembro:
             flash(f'Miembro "{nombre} {apellido}" registrado exitosamente', 'success')
         else:
             flash('Error al registrar miembro', 'danger')
@@ -206,14 +230,11 @@ def create_member_form():
 @app.route('/members/delete/<int:member_id>', methods=['POST'])
 @login_required
 def delete_member_form(member_id):
-    miembro = DatabaseLayer.get_member_by_id(member_id)
+    miembro, error = DatabaseLayer.delete_member(member_id)
     if miembro:
-        if DatabaseLayer.delete_member(member_id):
-            flash(f'Miembro "{miembro["nombre"]} {miembro["apellido"]}" eliminado exitosamente', 'success')
-        else:
-            flash('Error al eliminar miembro', 'danger')
+        flash(f'Miembro "{miembro["nombre"]} {miembro["apellido"]}" eliminado exitosamente', 'success')
     else:
-        flash('Miembro no encontrado', 'danger')
+        flash(error, 'danger')
     return redirect(url_for('members_page'))
 
 # ==================== RUTAS DE FORMULARIOS - PRÉSTAMOS ====================
@@ -225,27 +246,15 @@ def create_loan_form():
         libro_id = int(request.form.get('libro_id'))
         miembro_id = int(request.form.get('miembro_id'))
         
-        libro = DatabaseLayer.get_book_by_id(libro_id)
-        miembro = DatabaseLayer.get_member_by_id(miembro_id)
-        
-        if not libro:
-            flash('Libro no encontrado', 'danger')
-            return redirect(url_for('loans_page'))
-        
-        if not miembro:
-            flash('Miembro no encontrado', 'danger')
-            return redirect(url_for('loans_page'))
-        
-        if not libro['disponible']:
-            flash('El libro no está disponible', 'warning')
-            return redirect(url_for('loans_page'))
+        # La verificación del libro y del miembro ocurre dentro de la transacción
+        prestamo, error = DatabaseLayer.create_loan(libro_id, miembro_id)
         
-        loan_id = DatabaseLayer.create_loan(libro_id, miembro_id)
-        
-        if loan_id:
-            flash(f'Préstamo registrado: "{libro["titulo"]}" para {miembro["nombre"]} {miembro["apellido"]}', 'success')
+        if prestamo:
+            flash('Préstamo registrado exitosamente', 'success')
+        elif error == DatabaseLayer.BOOK_UNAVAILABLE:
+            flash(error, 'warning')
         else:
-            flash('Error al crear préstamo', 'danger')
+            flash(error, 'danger')
     except Exception as e:
         flash(f'Error al crear préstamo: {str(e)}', 'danger')
     return redirect(url_for('loans_page'))
@@ -253,19 +262,21 @@ def create_loan_form():
 @app.route('/loans/return/<int:loan_id>', methods=['POST'])
 @login_required
 def return_loan_form(loan_id):
-    if DatabaseLayer.return_loan(loan_id):
+    _, error = DatabaseLayer.return_loan(loan_id)
+    if not error:
         flash('Libro devuelto exitosamente', 'success')
     else:
-        flash('Error al devolver libro', 'danger')
+        flash(f'Error al devolver libro: {error}', 'danger')
     return redirect(url_for('loans_page'))
 
 @app.route('/loans/delete/<int:loan_id>', methods=['POST'])
 @login_required
 def delete_loan_form(loan_id):
-    if DatabaseLayer.delete_loan(loan_id):
+    _, error = DatabaseLayer.delete_loan(loan_id)
+    if not error:
         flash('Préstamo eliminado exitosamente', 'success')
     else:
-        flash('Error al eliminar préstamo', 'danger')
+        flash(error, 'danger')
     return redirect(url_for('loans_page'))
 
 # ==================== RUTAS DE FORMULARIOS - USUARIOS ====================
@@ -306,8 +317,7 @@ def delete_user_form(user_id):
 @app.route("/api/books", methods=["GET"])
 @login_required
 def get_books():
-    libros = DatabaseLayer.get_all_books()
-    return books_schema.jsonify(libros), 200
+    return list_response(books_schema, DatabaseLayer.get_all_books, DatabaseLayer.iter_books)
 
 @app.route("/api/books/<int:book_id>", methods=["GET"])
 @login_required
@@ -326,7 +336,7 @@ def create_book():
         if errors:
             return jsonify(errors), 400
         
-        book_id = DatabaseLayer.create_book(
+        nuevo_libro = DatabaseLayer.create_book(
             data["titulo"], 
             data["autor"], 
             data["isbn"], 
@@ -334,8 +344,7 @@ def create_book():
             data["categoria"]
         )
         
-        if book_id:
-            nuevo_libro = DatabaseLayer.get_book_by_id(book_id)
+        if nuevo_libro:
             return book_schema.jsonify(nuevo_libro), 201
         return {"error": "Error al crear libro"}, 400
     except Exception as e:
@@ -344,38 +353,37 @@ def create_book():
 @app.route("/api/books/<int:book_id>", methods=["PUT"])
 @login_required
 def update_book(book_id):
-    libro = DatabaseLayer.get_book_by_id(book_id)
-    if not libro:
-        return {"error": "Libro no encontrado"}, 404
-    
     data = request.json
-    DatabaseLayer.update_book(
+    # Los campos que no vienen conservan su valor (COALESCE en el UPDATE)
+    libro_actualizado, error = DatabaseLayer.update_book(
         book_id,
-        data.get("titulo", libro["titulo"]),
-        data.get("autor", libro["autor"]),
-        data.get("isbn", libro["isbn"]),
-        data.get("año_publicacion", libro["año_publicacion"]),
-        data.get("categoria", libro["categoria"])
+        data.get("titulo"),
+        data.get("autor"),
+        data.get("isbn"),
+        data.get("año_publicacion"),
+        data.get("categoria")
     )
     
-    libro_actualizado = DatabaseLayer.get_book_by_id(book_id)
+    if error == DatabaseLayer.BOOK_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return book_schema.jsonify(libro_actualizado), 200
 
 @app.route("/api/books/<int:book_id>", methods=["DELETE"])
 @login_required
 def delete_book(book_id):
-    libro = DatabaseLayer.get_book_by_id(book_id)
-    if not libro:
-        return {"error": "Libro no encontrado"}, 404
-    
-    DatabaseLayer.delete_book(book_id)
+    _, error = DatabaseLayer.delete_book(book_id)
+    if error == DatabaseLayer.BOOK_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return {"mensaje": "Libro eliminado exitosamente"}, 200
 
 @app.route("/api/members", methods=["GET"])
 @login_required
 def get_members():
-    miembros = DatabaseLayer.get_all_members()
-    return members_schema.jsonify(miembros), 200
+    return list_response(members_schema, DatabaseLayer.get_all_members, DatabaseLayer.iter_members)
 
 @app.route("/api/members/<int:member_id>", methods=["GET"])
 @login_required
@@ -394,15 +402,14 @@ def create_member():
         if errors:
             return jsonify(errors), 400
         
-        member_id = DatabaseLayer.create_member(
+        nuevo_miembro = DatabaseLayer.create_member(
             data["nombre"],
             data["apellido"],
             data["correo"],
             data["telefono"]
         )
         
-        if member_id:
-            nuevo_miembro = DatabaseLayer.get_member_by_id(member_id)
+        if nuevo_miembro:
             return member_schema.jsonify(nuevo_miembro), 201
         return {"error": "Error al crear miembro"}, 400
     except Exception as e:
@@ -411,37 +418,35 @@ def create_member():
 @app.route("/api/members/<int:member_id>", methods=["PUT"])
 @login_required
 def update_member(member_id):
-    miembro = DatabaseLayer.get_member_by_id(member_id)
-    if not miembro:
-        return {"error": "Miembro no encontrado"}, 404
-    
     data = request.json
-    DatabaseLayer.update_member(
+    miembro_actualizado, error = DatabaseLayer.update_member(
         member_id,
-        data.get("nombre", miembro["nombre"]),
-        data.get("apellido", miembro["apellido"]),
-        data.get("correo", miembro["correo"]),
-        data.get("telefono", miembro["telefono"])
+        data.get("nombre"),
+        data.get("apellido"),
+        data.get("correo"),
+        data.get("telefono")
     )
     
-    miembro_actualizado = DatabaseLayer.get_member_by_id(member_id)
+    if error == DatabaseLayer.MEMBER_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return member_schema.jsonify(miembro_actualizado), 200
 
 @app.route("/api/members/<int:member_id>", methods=["DELETE"])
 @login_required
 def delete_member(member_id):
-    miembro = DatabaseLayer.get_member_by_id(member_id)
-    if not miembro:
-        return {"error": "Miembro no encontrado"}, 404
-    
-    DatabaseLayer.delete_member(member_id)
+    _, error = DatabaseLayer.delete_member(member_id)
+    if error == DatabaseLayer.MEMBER_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return {"mensaje": "Miembro eliminado exitosamente"}, 200
 
 @app.route("/api/loans", methods=["GET"])
 @login_required
 def get_loans():
-    prestamos = DatabaseLayer.get_all_loans()
-    return loans_schema.jsonify(prestamos), 200
+    return list_response(loans_schema, DatabaseLayer.get_all_loans, DatabaseLayer.iter_loans)
 
 @app.route("/api/loans/<int:loan_id>", methods=["GET"])
 @login_required
@@ -460,47 +465,45 @@ def create_loan():
         if errors:
             return jsonify(errors), 400
         
-        libro = DatabaseLayer.get_book_by_id(data["libro_id"])
-        if not libro:
-            return {"error": "Libro no encontrado"}, 404
-        
-        miembro = DatabaseLayer.get_member_by_id(data["miembro_id"])
-        if not miembro:
-            return {"error": "Miembro no encontrado"}, 404
-        
-        if not libro["disponible"]:
-            return {"error": "El libro no está disponible"}, 400
-        
-        loan_id = DatabaseLayer.create_loan(data["libro_id"], data["miembro_id"])
+        nuevo_prestamo, error = DatabaseLayer.create_loan(data["libro_id"], data["miembro_id"])
         
-        if loan_id:
-            nuevo_prestamo = DatabaseLayer.get_loan_by_id(loan_id)
+        if nuevo_prestamo:
             return loan_schema.jsonify(nuevo_prestamo), 201
-        return {"error": "Error al crear préstamo"}, 400
+        if error in (DatabaseLayer.BOOK_NOT_FOUND, DatabaseLayer.MEMBER_NOT_FOUND):
+            return {"error": error}, 404
+        return {"error": error}, 400
     except Exception as e:
         return {"error": str(e)}, 400
 
 @app.route("/api/loans/<int:loan_id>", methods=["PUT"])
 @login_required
 def update_loan(loan_id):
-    prestamo = DatabaseLayer.get_loan_by_id(loan_id)
-    if not prestamo:
-        return {"error": "Préstamo no encontrado"}, 404
-    
-    DatabaseLayer.return_loan(loan_id)
-    
-    prestamo_actualizado = DatabaseLayer.get_loan_by_id(loan_id)
+    prestamo_actualizado, error = DatabaseLayer.return_loan(loan_id)
+    if error == DatabaseLayer.LOAN_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return loan_schema.jsonify(prestamo_actualizado), 200
 
 @app.route("/api/loans/<int:loan_id>", methods=["DELETE"])
 @login_required
 def delete_loan(loan_id):
-    prestamo = DatabaseLayer.get_loan_by_id(loan_id)
-    if not prestamo:
-        return {"error": "Préstamo no encontrado"}, 404
-    
-    DatabaseLayer.delete_loan(loan_id)
+    _, error = DatabaseLayer.delete_loan(loan_id)
+    if error == DatabaseLayer.LOAN_NOT_FOUND:
+        return {"error": error}, 404
+    if error:
+        return {"error": error}, 400
     return {"mensaje": "Préstamo eliminado exitosamente"}, 200
 
+@app.route("/api/stats/db", methods=["GET"])
+@login_required
+def get_db_stats():
+    return jsonify(unit_of_work.stats()), 200
+
+@app.route("/api/stats/cache", methods=["GET"])
+@login_required
+def get_cache_stats():
+    return jsonify(query_cache.stats()), 200
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
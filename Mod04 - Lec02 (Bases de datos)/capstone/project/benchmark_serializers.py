@@ -0,0 +1,153 @@
+"""
+Benchmark de serialización de listados: Marshmallow vs dump compilado
+
+Genera filas como las devuelve el cursor de MySQL (dict con int, str y
+datetime), verifica que las dos respuestas sean idénticas byte a byte y mide
+cuánto tarda cada una en armar el cuerpo de /api/books, /api/members y
+/api/loans. Después compara la respuesta completa con la de ?stream=1:
+memoria máxima y tiempo hasta las primeras filas. No necesita la base de datos.
+
+Uso:
+    python benchmark_serializers.py                  # 1000, 10000 y 50000 filas
+    python benchmark_serializers.py --rows 100000 --repeat 3
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app import app, BookSchema, MemberSchema, LoanSchema
+from database import DatabaseLayer
+from serializers import CompiledSchema, stream_json
+
+START = datetime(2024, 1, 1, 9, 30)
+CATEGORIES = ("Ficción", "Clásico", "Distopía", "Ensayo")
+
+
+def book_row(i):
+    return {"id": i, "titulo": f"Título del libro {i}", "autor": f"Autor {i % 500}",
+            "isbn": f"978-{i:010d}", "año_publicacion": 1900 + i % 124,
+            "categoria": CATEGORIES[i % len(CATEGORIES)],
+            "disponible": i % 3 != 0, "created_at": START + timedelta(minutes=i)}
+
+
+def member_row(i):
+    return {"id": i, "nombre": f"Nombre{i}", "apellido": f"Apellido{i}",
+            "correo": f"miembro{i}@email.com", "telefono": f"787-{i % 10000:04d}",
+            "fecha_registro": START + timedelta(minutes=i)}
+
+
+def loan_row(i):
+    returned = i % 2 == 0
+    return {"id": i, "libro_id": i % 5000 + 1, "miembro_id": i % 1000 + 1,
+            "fecha_prestamo": START + timedelta(hours=i),
+            "fecha_devolucion": START + timedelta(hours=i + 72) if returned else None,
+            "estado": "Devuelto" if returned else "Activo"}
+
+
+CASES = (
+    ("/api/books", BookSchema, book_row),
+    ("/api/members", MemberSchema, member_row),
+    ("/api/loans", LoanSchema, loan_row),
+)
+
+
+def best_of(repeat, function):
+    """Mejor tiempo (s) de `repeat` ejecuciones y el último resultado"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def full_body(schema, make_row, count):
+    # Como get_all_*: fetchall() arma la lista completa antes de serializar
+    rows = [make_row(i) for i in range(1, count + 1)]
+    yield schema.jsonify(rows).get_data()
+
+
+def streamed_body(schema, make_row, count):
+    # Como iter_*: lotes de STREAM_BATCH_SIZE filas leídos con fetchmany()
+    size = DatabaseLayer.STREAM_BATCH_SIZE
+    batches = ([make_row(i) for i in range(start, min(start + size, count + 1))]
+               for start in range(1, count + 1, size))
+    for chunk in stream_json(batches, schema, app.json):
+        yield chunk.encode()
+
+
+def measure_stream(body):
+    """(s hasta el primer trozo con filas, s total, bytes) y, en otra pasada, la memoria máxima"""
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in body():
+        if first is None and len(chunk) > 1:  # el "[" inicial no trae filas
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+
+    tracemalloc.start()
+    for _ in body():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Marshmallow vs dump compilado")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5, help="Se toma el mejor de N intentos")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14}{'filas':>8}{'marshmallow ms':>16}{'compilado ms':>14}"
+          f"{'  (dump + JSON)':<20}{'mejora':>8}")
+    with app.app_context():
+        for debug in (False, True):
+            app.debug = debug
+            for path, schema_class, make_row in CASES:
+                marshmallow_schema = schema_class(many=True)
+                compiled_schema = CompiledSchema(schema_class(many=True))
+                assert compiled_schema.compiled, f"{schema_class.__name__} no se pudo compilar"
+                for count in args.rows:
+                    rows = [make_row(i) for i in range(1, count + 1)]
+                    before, expected = best_of(args.repeat, lambda: marshmallow_schema.jsonify(rows).get_data())
+                    after, body = best_of(args.repeat, lambda: compiled_schema.jsonify(rows).get_data())
+                    if body != expected:
+                        raise SystemExit(f"❌ {path} ({count} filas): las respuestas no son idénticas")
+                    dump, data = best_of(args.repeat, lambda: compiled_schema.dump(rows))
+                    if debug and count != args.rows[-1]:
+                        continue
+                    label = f"{path}{' *' if debug else ''}"
+                    print(f"{label:<14}{count:>8}{before * 1000:>16.1f}{after * 1000:>14.1f}"
+                          f"{f'  ({dump * 1000:.1f} + {(after - dump) * 1000:.1f})':<20}"
+                          f"{before / after:>7.1f}x")
+    print()
+    print("✅ Respuestas idénticas byte a byte en todos los casos (* = modo debug, JSON indentado)")
+
+    print()
+    print(f"{'endpoint':<24}{'filas':>8}{'primeras filas ms':>19}{'total ms':>10}{'memoria máx. MB':>17}")
+    with app.app_context():
+        app.debug = False
+        for path, schema_class, make_row in CASES:
+            schema = CompiledSchema(schema_class(many=True))
+            count = args.rows[-1]
+            results = {}
+            for label, body in ((path, lambda: full_body(schema, make_row, count)),
+                                (f"{path}?stream=1", lambda: streamed_body(schema, make_row, count))):
+                gc.collect()
+                first, total, size, peak = measure_stream(body)
+                results[label] = size
+                print(f"{label:<24}{count:>8}{first * 1000:>19.1f}{total * 1000:>10.1f}{peak / 1e6:>17.1f}")
+            if len(set(results.values())) != 1:
+                raise SystemExit(f"❌ {path}: el cuerpo en streaming no tiene el mismo tamaño")
+
+
+if __name__ == "__main__":
+    main()
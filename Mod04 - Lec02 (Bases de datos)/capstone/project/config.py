@@ -9,6 +9,8 @@ class DatabaseConfig:
     PASSWORD = ""  # Cambiar por tu contraseña de MySQL
     DATABASE = "biblioteca_db"
     PORT = 3306
+    # True: cada petición HTTP es una sola transacción (ver unit_of_work.py)
+    TRANSACTION_PER_REQUEST = False
     
     @staticmethod
     def get_connection():
@@ -33,4 +35,13 @@ class DatabaseConfig:
         if cursor:
             cursor.close()
         if connection and connection.is_connected():
-            connection.close()
\ No newline at end of file
+            connection.close()
+
+
+class CacheConfig:
+    """Caché de resultados de las lecturas (ver query_cache.py)"""
+    
+    ENABLED = True
+    MAX_BYTES = 32 * 1024 * 1024  # tamaño máximo del LRU en memoria de cada worker
+    TTL = 60                      # segundos; acota lo que un worker tarda en ver los cambios de otro sin SHARED_URL
+    SHARED_URL = None             # p. ej. "redis://localhost:6379/0" (requiere pip install redis)
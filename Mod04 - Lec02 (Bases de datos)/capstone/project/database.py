@@ -1,15 +1,124 @@
 from config import DatabaseConfig
+from unit_of_work import get_connection, close_connection
+from query_cache import cached, invalidates
 from datetime import datetime
+from mysql.connector import IntegrityError, errorcode
+
+class RowStream:
+    """Filas de una consulta en curso, en lotes de `batch_size` (iterador)
+    
+    El cursor no usa buffer: MySQL envía las filas a medida que se piden, así
+    que en memoria hay un solo lote. La conexión queda abierta hasta que se
+    leen todas las filas o se llama a close().
+    """
+    
+    def __init__(self, connection, cursor, batch_size):
+        self._connection = connection
+        self._cursor = cursor
+        self._batch_size = batch_size
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        if self._connection is None:
+            raise StopIteration
+        try:
+            rows = self._cursor.fetchmany(self._batch_size)
+        except Exception as e:
+            # Se relanza: si la iteración terminara normalmente, la respuesta
+            # en streaming se cerraría como un listado completo
+            print(f"Error al leer filas: {e}")
+            self.close()
+            raise
+        if not rows:
+            self.close()
+            raise StopIteration
+        return rows
+    
+    def close(self):
+        """Libera la conexión; si quedaron filas sin leer, cancela la consulta"""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if not connection.unread_result:
+            DatabaseConfig.close_connection(connection, self._cursor)
+            return
+        # Se cortó a mitad (p. ej. el cliente cerró la conexión). Cerrar no
+        # alcanza: con la extensión C de mysql-connector (la opción por
+        # defecto) close() lee el resto del resultado, es decir, trae toda la
+        # tabla. Primero se cancela la consulta desde otra conexión
+        RowStream._kill_query(connection.connection_id)
+        try:
+            connection.close()
+        except Exception:
+            pass  # el resultado cancelado termina con un error
+    
+    @staticmethod
+    def _kill_query(connection_id):
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("KILL QUERY %s", (connection_id,))
+        except Exception as e:
+            print(f"Error al cancelar la consulta: {e}")
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+
 
 class DatabaseLayer:
     """Capa de datos para manejar todas las operaciones de base de datos"""
     
+    # Errores de create_loan / return_loan
+    BOOK_NOT_FOUND = "Libro no encontrado"
+    BOOK_UNAVAILABLE = "El libro no está disponible"
+    MEMBER_NOT_FOUND = "Miembro no encontrado"
+    LOAN_NOT_FOUND = "Préstamo no encontrado"
+    LOAN_ALREADY_RETURNED = "El préstamo ya fue devuelto"
+    LOAN_ERROR = "Error al procesar el préstamo"
+    # Errores de update_book / update_member
+    BOOK_ERROR = "Error al actualizar libro"
+    MEMBER_ERROR = "Error al actualizar miembro"
+    # Errores de delete_book / delete_member / delete_loan
+    BOOK_DELETE_ERROR = "Error al eliminar libro"
+    MEMBER_DELETE_ERROR = "Error al eliminar miembro"
+    LOAN_DELETE_ERROR = "Error al eliminar préstamo"
+    
+    # Filas que se leen por fetchmany en los listados en streaming
+    STREAM_BATCH_SIZE = 500
+    
+    @staticmethod
+    def _iter_query(query, params=()):
+        """Ejecuta una consulta y devuelve un RowStream con sus filas en lotes
+        
+        La consulta se ejecuta aquí, antes de armar la respuesta: si no hay
+        conexión o la consulta falla, devuelve None y la ruta responde 500 en
+        lugar de un listado vacío. No usa la conexión de la petición: el
+        cuerpo se sigue leyendo después del teardown.
+        """
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+        except Exception as e:
+            print(f"Error al leer filas: {e}")
+            DatabaseConfig.close_connection(connection, cursor)
+            return None
+        return RowStream(connection, cursor, DatabaseLayer.STREAM_BATCH_SIZE)
+    
     # ==================== USUARIOS DEL SISTEMA ====================
     
     @staticmethod
     def get_user_by_username(username):
         """Obtiene un usuario por su username"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return None
         
@@ -23,12 +132,12 @@ class DatabaseLayer:
             print(f"Error al obtener usuario: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
     def get_all_users():
         """Obtiene todos los usuarios del sistema"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return []
         
@@ -41,12 +150,12 @@ class DatabaseLayer:
             print(f"Error al obtener usuarios: {e}")
             return []
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
     def create_user(username, password, nombre, rol):
         """Crea un nuevo usuario del sistema"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return False
         
@@ -60,12 +169,12 @@ class DatabaseLayer:
             print(f"Error al crear usuario: {e}")
             return False
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
     def delete_user(user_id):
         """Elimina un usuario del sistema"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return False
         
@@ -78,14 +187,41 @@ class DatabaseLayer:
             print(f"Error al eliminar usuario: {e}")
             return False
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
+    
+    # ==================== ESTADÍSTICAS ====================
+    
+    @staticmethod
+    @cached("libros", "miembros", "prestamos")
+    def get_dashboard_stats():
+        """Obtiene los conteos del dashboard en una sola consulta"""
+        connection = get_connection()
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            query = """SELECT
+                           (SELECT COUNT(*) FROM libros) AS total_libros,
+                           (SELECT COUNT(*) FROM libros WHERE disponible = TRUE) AS libros_disponibles,
+                           (SELECT COUNT(*) FROM miembros) AS total_miembros,
+                           (SELECT COUNT(*) FROM prestamos WHERE estado = 'Activo') AS prestamos_activos"""
+            cursor.execute(query)
+            stats = cursor.fetchone()
+            return stats
+        except Exception as e:
+            print(f"Error al obtener estadísticas: {e}")
+            return None
+        finally:
+            close_connection(connection, cursor)
     
     # ==================== LIBROS ====================
     
     @staticmethod
+    @cached("libros")
     def get_all_books():
         """Obtiene todos los libros"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return []
         
@@ -98,12 +234,18 @@ class DatabaseLayer:
             print(f"Error al obtener libros: {e}")
             return []
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    def iter_books():
+        """Todos los libros en lotes (RowStream, para streaming); None si la consulta falla"""
+        return DatabaseLayer._iter_query("SELECT * FROM libros")
+    
+    @staticmethod
+    @cached("libros")
     def get_book_by_id(book_id):
         """Obtiene un libro por su ID"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return None
         
@@ -116,70 +258,95 @@ class DatabaseLayer:
             print(f"Error al obtener libro: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("libros")
     def create_book(titulo, autor, isbn, año_publicacion, categoria):
-        """Crea un nuevo libro"""
-        connection = DatabaseConfig.get_connection()
+        """Crea un nuevo libro y devuelve la fila creada"""
+        connection = get_connection()
         if not connection:
             return None
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
             query = """INSERT INTO libros (titulo, autor, isbn, año_publicacion, categoria, disponible) 
                        VALUES (%s, %s, %s, %s, %s, TRUE)"""
             cursor.execute(query, (titulo, autor, isbn, año_publicacion, categoria))
+            # La fila (con los valores por defecto de MySQL) se lee en la misma conexión
+            cursor.execute("SELECT * FROM libros WHERE id = %s", (cursor.lastrowid,))
+            book = cursor.fetchone()
             connection.commit()
-            return cursor.lastrowid
+            return book
         except Exception as e:
             print(f"Error al crear libro: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
-    def update_book(book_id, titulo, autor, isbn, año_publicacion, categoria):
-        """Actualiza un libro"""
-        connection = DatabaseConfig.get_connection()
+    @invalidates("libros")
+    def update_book(book_id, titulo=None, autor=None, isbn=None, año_publicacion=None, categoria=None):
+        """Actualiza un libro (None deja el valor actual) y devuelve la fila actualizada
+        
+        Devuelve (libro, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.BOOK_ERROR
         
         try:
-            cursor = connection.cursor()
-            query = """UPDATE libros SET titulo = %s, autor = %s, isbn = %s, 
-                       año_publicacion = %s, categoria = %s WHERE id = %s"""
+            cursor = connection.cursor(dictionary=True)
+            query = """UPDATE libros SET titulo = COALESCE(%s, titulo), autor = COALESCE(%s, autor),
+                       isbn = COALESCE(%s, isbn), año_publicacion = COALESCE(%s, año_publicacion),
+                       categoria = COALESCE(%s, categoria) WHERE id = %s"""
             cursor.execute(query, (titulo, autor, isbn, año_publicacion, categoria, book_id))
+            # rowcount no sirve para saber si existe (es 0 si no cambió nada): se
+            # lee la fila en la misma conexión, que además es la respuesta
+            cursor.execute("SELECT * FROM libros WHERE id = %s", (book_id,))
+            book = cursor.fetchone()
             connection.commit()
-            return True
+            if not book:
+                return None, DatabaseLayer.BOOK_NOT_FOUND
+            return book, None
         except Exception as e:
             print(f"Error al actualizar libro: {e}")
-            return False
+            return None, DatabaseLayer.BOOK_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("libros", "prestamos")
     def delete_book(book_id):
-        """Elimina un libro"""
-        connection = DatabaseConfig.get_connection()
+        """Elimina un libro y devuelve la fila eliminada
+        
+        Devuelve (libro, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.BOOK_DELETE_ERROR
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM libros WHERE id = %s FOR UPDATE", (book_id,))
+            book = cursor.fetchone()
+            if not book:
+                connection.rollback()
+                return None, DatabaseLayer.BOOK_NOT_FOUND
             cursor.execute("DELETE FROM libros WHERE id = %s", (book_id,))
             connection.commit()
-            return True
+            return book, None
         except Exception as e:
             print(f"Error al eliminar libro: {e}")
-            return False
+            return None, DatabaseLayer.BOOK_DELETE_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("libros")
     def update_book_availability(book_id, disponible):
         """Actualiza la disponibilidad de un libro"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return False
         
@@ -192,14 +359,15 @@ class DatabaseLayer:
             print(f"Error al actualizar disponibilidad: {e}")
             return False
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     # ==================== MIEMBROS ====================
     
     @staticmethod
+    @cached("miembros")
     def get_all_members():
         """Obtiene todos los miembros"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return []
         
@@ -212,12 +380,18 @@ class DatabaseLayer:
             print(f"Error al obtener miembros: {e}")
             return []
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    def iter_members():
+        """Todos los miembros en lotes (RowStream, para streaming); None si la consulta falla"""
+        return DatabaseLayer._iter_query("SELECT * FROM miembros")
+    
+    @staticmethod
+    @cached("miembros")
     def get_member_by_id(member_id):
         """Obtiene un miembro por su ID"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return None
         
@@ -230,70 +404,93 @@ class DatabaseLayer:
             print(f"Error al obtener miembro: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("miembros")
     def create_member(nombre, apellido, correo, telefono):
-        """Crea un nuevo miembro"""
-        connection = DatabaseConfig.get_connection()
+        """Crea un nuevo miembro y devuelve la fila creada"""
+        connection = get_connection()
         if not connection:
             return None
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
             query = "INSERT INTO miembros (nombre, apellido, correo, telefono) VALUES (%s, %s, %s, %s)"
             cursor.execute(query, (nombre, apellido, correo, telefono))
+            # fecha_registro la asigna MySQL: se lee la fila en la misma conexión
+            cursor.execute("SELECT * FROM miembros WHERE id = %s", (cursor.lastrowid,))
+            member = cursor.fetchone()
             connection.commit()
-            return cursor.lastrowid
+            return member
         except Exception as e:
             print(f"Error al crear miembro: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
-    def update_member(member_id, nombre, apellido, correo, telefono):
-        """Actualiza un miembro"""
-        connection = DatabaseConfig.get_connection()
+    @invalidates("miembros")
+    def update_member(member_id, nombre=None, apellido=None, correo=None, telefono=None):
+        """Actualiza un miembro (None deja el valor actual) y devuelve la fila actualizada
+        
+        Devuelve (miembro, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.MEMBER_ERROR
         
         try:
-            cursor = connection.cursor()
-            query = "UPDATE miembros SET nombre = %s, apellido = %s, correo = %s, telefono = %s WHERE id = %s"
+            cursor = connection.cursor(dictionary=True)
+            query = """UPDATE miembros SET nombre = COALESCE(%s, nombre), apellido = COALESCE(%s, apellido),
+                       correo = COALESCE(%s, correo), telefono = COALESCE(%s, telefono) WHERE id = %s"""
             cursor.execute(query, (nombre, apellido, correo, telefono, member_id))
+            cursor.execute("SELECT * FROM miembros WHERE id = %s", (member_id,))
+            member = cursor.fetchone()
             connection.commit()
-            return True
+            if not member:
+                return None, DatabaseLayer.MEMBER_NOT_FOUND
+            return member, None
         except Exception as e:
             print(f"Error al actualizar miembro: {e}")
-            return False
+            return None, DatabaseLayer.MEMBER_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("miembros", "prestamos")
     def delete_member(member_id):
-        """Elimina un miembro"""
-        connection = DatabaseConfig.get_connection()
+        """Elimina un miembro y devuelve la fila eliminada
+        
+        Devuelve (miembro, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.MEMBER_DELETE_ERROR
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM miembros WHERE id = %s FOR UPDATE", (member_id,))
+            member = cursor.fetchone()
+            if not member:
+                connection.rollback()
+                return None, DatabaseLayer.MEMBER_NOT_FOUND
             cursor.execute("DELETE FROM miembros WHERE id = %s", (member_id,))
             connection.commit()
-            return True
+            return member, None
         except Exception as e:
             print(f"Error al eliminar miembro: {e}")
-            return False
+            return None, DatabaseLayer.MEMBER_DELETE_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     # ==================== PRÉSTAMOS ====================
     
     @staticmethod
+    @cached("prestamos")
     def get_all_loans():
         """Obtiene todos los préstamos"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return []
         
@@ -306,12 +503,18 @@ class DatabaseLayer:
             print(f"Error al obtener préstamos: {e}")
             return []
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
+    
+    @staticmethod
+    def iter_loans():
+        """Todos los préstamos en lotes (RowStream, para streaming); None si la consulta falla"""
+        return DatabaseLayer._iter_query("SELECT * FROM prestamos ORDER BY fecha_prestamo DESC")
     
     @staticmethod
+    @cached("prestamos")
     def get_loan_by_id(loan_id):
         """Obtiene un préstamo por su ID"""
-        connection = DatabaseConfig.get_connection()
+        connection = get_connection()
         if not connection:
             return None
         
@@ -324,73 +527,112 @@ class DatabaseLayer:
             print(f"Error al obtener préstamo: {e}")
             return None
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("prestamos", "libros")
     def create_loan(libro_id, miembro_id):
-        """Crea un nuevo préstamo"""
-        connection = DatabaseConfig.get_connection()
+        """Crea un préstamo y marca el libro como prestado en una sola transacción
+        
+        Devuelve (préstamo creado, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return None
+            return None, DatabaseLayer.LOAN_ERROR
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
+            # Bloquear la fila del libro: otro préstamo simultáneo espera aquí
+            cursor.execute("SELECT disponible FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+            libro = cursor.fetchone()
+            if not libro:
+                connection.rollback()
+                return None, DatabaseLayer.BOOK_NOT_FOUND
+            if not libro['disponible']:
+                connection.rollback()
+                return None, DatabaseLayer.BOOK_UNAVAILABLE
+            
+            # La FK de miembro_id verifica que el miembro existe
             query = "INSERT INTO prestamos (libro_id, miembro_id, estado) VALUES (%s, %s, 'Activo')"
             cursor.execute(query, (libro_id, miembro_id))
-            connection.commit()
-            
-            # Actualizar disponibilidad del libro
-            DatabaseLayer.update_book_availability(libro_id, False)
+            loan_id = cursor.lastrowid
             
-            return cursor.lastrowid
+            cursor.execute("UPDATE libros SET disponible = FALSE WHERE id = %s", (libro_id,))
+            cursor.execute("SELECT * FROM prestamos WHERE id = %s", (loan_id,))
+            prestamo = cursor.fetchone()
+            connection.commit()
+            return prestamo, None
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+                return None, DatabaseLayer.MEMBER_NOT_FOUND
+            print(f"Error al crear préstamo: {e}")
+            return None, DatabaseLayer.LOAN_ERROR
         except Exception as e:
             print(f"Error al crear préstamo: {e}")
-            return None
+            return None, DatabaseLayer.LOAN_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("prestamos", "libros")
     def return_loan(loan_id):
-        """Marca un préstamo como devuelto"""
-        connection = DatabaseConfig.get_connection()
+        """Marca un préstamo como devuelto y libera el libro en una sola transacción
+        
+        Devuelve (préstamo actualizado, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.LOAN_ERROR
         
         try:
-            # Obtener el préstamo para saber qué libro liberar
-            loan = DatabaseLayer.get_loan_by_id(loan_id)
-            if not loan:
-                return False
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT estado FROM prestamos WHERE id = %s FOR UPDATE", (loan_id,))
+            prestamo = cursor.fetchone()
+            if not prestamo:
+                connection.rollback()
+                return None, DatabaseLayer.LOAN_NOT_FOUND
+            if prestamo['estado'] != 'Activo':
+                connection.rollback()
+                return None, DatabaseLayer.LOAN_ALREADY_RETURNED
             
-            cursor = connection.cursor()
-            query = "UPDATE prestamos SET fecha_devolucion = NOW(), estado = 'Devuelto' WHERE id = %s"
+            # Préstamo y libro se actualizan en la misma sentencia
+            query = """UPDATE prestamos p JOIN libros l ON l.id = p.libro_id
+                       SET p.fecha_devolucion = NOW(), p.estado = 'Devuelto', l.disponible = TRUE
+                       WHERE p.id = %s"""
             cursor.execute(query, (loan_id,))
+            cursor.execute("SELECT * FROM prestamos WHERE id = %s", (loan_id,))
+            prestamo = cursor.fetchone()
             connection.commit()
-            
-            # Actualizar disponibilidad del libro
-            DatabaseLayer.update_book_availability(loan['libro_id'], True)
-            
-            return True
+            return prestamo, None
         except Exception as e:
             print(f"Error al devolver préstamo: {e}")
-            return False
+            return None, DatabaseLayer.LOAN_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
+            close_connection(connection, cursor)
     
     @staticmethod
+    @invalidates("prestamos")
     def delete_loan(loan_id):
-        """Elimina un préstamo"""
-        connection = DatabaseConfig.get_connection()
+        """Elimina un préstamo y devuelve la fila eliminada
+        
+        Devuelve (préstamo, None) o (None, mensaje de error)
+        """
+        connection = get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.LOAN_DELETE_ERROR
         
         try:
-            cursor = connection.cursor()
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM prestamos WHERE id = %s FOR UPDATE", (loan_id,))
+            prestamo = cursor.fetchone()
+            if not prestamo:
+                connection.rollback()
+                return None, DatabaseLayer.LOAN_NOT_FOUND
             cursor.execute("DELETE FROM prestamos WHERE id = %s", (loan_id,))
             connection.commit()
-            return True
+            return prestamo, None
         except Exception as e:
             print(f"Error al eliminar préstamo: {e}")
-            return False
+            return None, DatabaseLayer.LOAN_DELETE_ERROR
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
\ No newline at end of file
+            close_connection(connection, cursor)
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+Caché de resultados de las lecturas de DatabaseLayer
+
+Las páginas de libros, miembros, préstamos y el dashboard leen las tablas
+completas en cada visita, aunque las escrituras son mucho menos frecuentes.
+
+- Claves versionadas: cada tabla tiene un número de versión, y la clave de un
+  resultado incluye la versión de las tablas que leyó. Los métodos que
+  escriben (@invalidates) incrementan la versión de sus tablas, así que los
+  resultados viejos dejan de encontrarse sin tener que buscarlos y borrarlos.
+- LRU en memoria, acotado en bytes (CacheConfig.MAX_BYTES). Los resultados se
+  guardan serializados con pickle: el tamaño es exacto y cada acierto
+  devuelve una copia que se puede modificar.
+- Backend compartido opcional (CacheConfig.SHARED_URL, Redis): guarda las
+  versiones y una segunda copia de los valores, para que varios workers vean
+  las mismas invalidaciones y aprovechen los resultados de los otros. Sin
+  él, LocalBackend cumple el mismo papel dentro del proceso; en ese caso
+  CacheConfig.TTL acota lo que un worker tarda en ver los cambios de otro.
+
+La versión se incrementa después del commit. Si la petición es una sola
+transacción (unit_of_work.py), se incrementa después del commit de la
+petición, y mientras tanto esa petición no usa el caché para las tablas que
+escribió.
+
+No se guardan resultados vacíos: un método de DatabaseLayer devuelve []
+o None también cuando la consulta falló.
+"""
+
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+import unit_of_work
+from config import CacheConfig
+
+KEY_PREFIX = "biblioteca:cache:"
+
+
+class LRUCache:
+    """LRU en memoria acotado por el tamaño total de los valores (bytes)"""
+
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # clave -> (vence, valor)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return False
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self.bytes -= len(key) + len(value)
+
+
+class LocalBackend:
+    """Versiones de las tablas dentro del proceso (sustituto del backend compartido)
+
+    No guarda valores: en un solo proceso ya están en el LRU.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tables):
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+
+class RedisBackend:
+    """Versiones y valores en Redis, compartidos por todos los workers"""
+
+    shared = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def versions(self, tables):
+        keys = [f"{KEY_PREFIX}version:{table}" for table in tables]
+        values = self.client.mget(keys)
+        if None in values:
+            # Una versión que no existe (Redis nuevo o vaciado) empieza en el
+            # tiempo actual, no en 0: así no coincide con una versión vieja que
+            # siga en el LRU de algún worker
+            for key, value in zip(keys, values):
+                if value is None:
+                    self.client.set(key, time.time_ns(), nx=True)
+            values = self.client.mget(keys)
+        return [int(value) for value in values]
+
+    def bump(self, tables):
+        pipeline = self.client.pipeline()
+        for table in tables:
+            pipeline.incr(f"{KEY_PREFIX}version:{table}")
+        pipeline.execute()
+
+    def get(self, key):
+        return self.client.get(KEY_PREFIX + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(KEY_PREFIX + key, value, ex=ttl)
+
+
+def create_backend(url):
+    """Backend para CacheConfig.SHARED_URL; LocalBackend si no hay o no se puede usar"""
+    if not url:
+        return LocalBackend()
+    try:
+        import redis
+    except ImportError:
+        print("Error al configurar el caché compartido: falta el paquete redis (pip install redis)")
+        return LocalBackend()
+    try:
+        client = redis.Redis.from_url(url, socket_timeout=0.5)
+        client.ping()
+        return RedisBackend(client)
+    except Exception as e:
+        print(f"Error al conectar al caché compartido: {e}")
+        return LocalBackend()
+
+
+class QueryCache:
+    """LRU local + backend de versiones (y valores) + contadores"""
+
+    def __init__(self, backend, max_bytes, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.local = LRUCache(max_bytes, ttl)
+        self._lock = threading.Lock()
+        self._counters = {}  # método -> {"hits", "shared_hits", "misses"}
+
+    def _count(self, name, counter):
+        with self._lock:
+            counters = self._counters.setdefault(name, {"hits": 0, "shared_hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def get_or_load(self, name, tables, args, load):
+        """Resultado de load() para la versión actual de `tables`"""
+        try:
+            versions = self.backend.versions(tables)
+        except Exception as e:
+            print(f"Error al leer el caché: {e}")
+            return load()
+        key = f"{name}{args!r}@" + ",".join(f"{t}={v}" for t, v in zip(tables, versions))
+
+        data = self.local.get(key)
+        if data is not None:
+            self._count(name, "hits")
+            return pickle.loads(data)
+        if self.backend.shared:
+            try:
+                data = self.backend.get(key)
+            except Exception as e:
+                print(f"Error al leer el caché: {e}")
+            if data is not None:
+                self._count(name, "shared_hits")
+                self.local.set(key, data)
+                return pickle.loads(data)
+
+        self._count(name, "misses")
+        result = load()
+        if result:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            self.local.set(key, data)
+            if self.backend.shared:
+                try:
+                    self.backend.set(key, data, self.ttl)
+                except Exception as e:
+                    print(f"Error al guardar en el caché: {e}")
+        return result
+
+    def bump(self, tables):
+        try:
+            self.backend.bump(tables)
+        except Exception as e:
+            # Sin la nueva versión, los otros workers no ven el cambio hasta
+            # que vence el TTL; el LRU propio se vacía para no servir datos viejos
+            print(f"Error al invalidar el caché: {e}")
+            self.local.clear()
+
+    def stats(self):
+        with self._lock:
+            methods = {name: dict(counters) for name, counters in self._counters.items()}
+        totals = {counter: sum(c[counter] for c in methods.values())
+                  for counter in ("hits", "shared_hits", "misses")}
+        lookups = sum(totals.values())
+        return {
+            **totals,
+            "hit_rate": round((totals["hits"] + totals["shared_hits"]) / lookups, 3) if lookups else 0,
+            "entries": len(self.local),
+            "bytes": self.local.bytes,
+            "max_bytes": self.local.max_bytes,
+            "evictions": self.local.evictions,
+            "shared_backend": self.backend.shared,
+            "methods": methods,
+        }
+
+
+cache = QueryCache(create_backend(CacheConfig.SHARED_URL), CacheConfig.MAX_BYTES, CacheConfig.TTL)
+
+
+def _written_tables():
+    """Tablas que la petición escribió y todavía no confirmó (transacción por petición)"""
+    if not has_app_context():
+        return None
+    return g.get("cache_written_tables")
+
+
+def cached(*tables):
+    """Guarda en el caché el resultado de un método que lee `tables`"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args):
+            written = _written_tables()
+            if not CacheConfig.ENABLED or (written and written.intersection(tables)):
+                return method(*args)
+            return cache.get_or_load(method.__name__, tables, args, lambda: method(*args))
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Incrementa la versión de `tables` cuando lo que escribió el método está confirmado"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                unit = unit_of_work.current()
+                if unit is not None and unit.transactional:
+                    g.setdefault("cache_written_tables", set()).update(tables)
+                    unit.after_commit(lambda: cache.bump(tables))
+                else:
+                    cache.bump(tables)
+        return wrapper
+    return decorator
+
+
+def stats():
+    return cache.stats()
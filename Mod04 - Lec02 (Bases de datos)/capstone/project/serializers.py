@@ -0,0 +1,139 @@
+"""
+Serialización rápida de listados para la REST API
+
+Un dump de Marshmallow recorre en Python, por cada fila, todos los campos del
+esquema: obtiene el valor con un accessor, llama a field.serialize, revisa
+hooks... En listados grandes eso domina el tiempo de la respuesta.
+
+CompiledSchema lee el esquema una sola vez y genera una función que arma
+el diccionario de una fila con las mismas conversiones que los campos de
+Marshmallow (Int -> int, Str -> str, Bool, DateTime -> ISO 8601). El JSON lo
+sigue generando flask.jsonify, así que la respuesta es idéntica byte a byte
+a la de schema.jsonify().
+
+Si el esquema usa algo que el compilador no conoce (otros tipos de campo,
+data_key, attribute, hooks @pre_dump/@post_dump...) se usa schema.dump.
+
+stream_json() arma el mismo cuerpo por partes, un lote de filas a la vez,
+para enviarlo en streaming sin tener el listado completo en memoria.
+"""
+
+from flask import jsonify
+from marshmallow import fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# Conversión de cada tipo de campo: expresión sobre `v` (valor no nulo)
+_CONVERTERS = {
+    fields.Integer: "v if type(v) is int else int(v)",
+    fields.String: "v if type(v) is str else _text(v)",
+    fields.Boolean: "_bool(v, {truthy}, {falsy})",
+    fields.DateTime: "v.isoformat()",
+}
+
+
+def _text(v):
+    # Igual que marshmallow.utils.ensure_text_type
+    return v.decode("utf-8") if isinstance(v, bytes) else str(v)
+
+
+def _bool(v, truthy, falsy):
+    # Igual que fields.Boolean._serialize
+    try:
+        if v in truthy:
+            return True
+        if v in falsy:
+            return False
+    except TypeError:
+        pass
+    return bool(v)
+
+
+def _converter(field):
+    """Expresión de conversión para un campo, o None si no se puede compilar"""
+    if field.data_key is not None or field.attribute is not None or field.dump_default is not missing:
+        return None
+    if type(field) is fields.DateTime and field.format not in (None, "iso", "iso8601"):
+        return None
+    if isinstance(field, fields.Integer) and (field.as_string or type(field) is not fields.Integer):
+        return None
+    for field_class, expression in _CONVERTERS.items():
+        # Email, Url... heredan de String y se serializan igual
+        if type(field) is field_class or (field_class is fields.String and isinstance(field, fields.String)):
+            return expression
+    return None
+
+
+def _compile(schema):
+    """Función row -> dict equivalente a schema.dump(row), o None si no se puede compilar"""
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return None
+    namespace = {"_text": _text, "_bool": _bool, "_MISSING": missing}
+    lines = ["def dump(row):", "    get = row.get", "    out = {}"]
+    # Claves en el orden en que las escribe flask.jsonify (sort_keys=True)
+    for i, (name, field) in enumerate(sorted(schema.dump_fields.items())):
+        expression = _converter(field)
+        if expression is None:
+            return None
+        if isinstance(field, fields.Boolean):
+            namespace[f"_truthy{i}"] = frozenset(field.truthy)
+            namespace[f"_falsy{i}"] = frozenset(field.falsy)
+            expression = expression.format(truthy=f"_truthy{i}", falsy=f"_falsy{i}")
+        lines += [f"    v = get({name!r}, _MISSING)",
+                  "    if v is not _MISSING:",
+                  f"        out[{name!r}] = None if v is None else {expression}"]
+    lines.append("    return out")
+    exec("\n".join(lines), namespace)
+    return namespace["dump"]
+
+
+class CompiledSchema:
+    """Esquema de Marshmallow con dump compilado (misma interfaz que dump/jsonify)"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.many = schema.many
+        self._dump_one = _compile(schema)
+
+    @property
+    def compiled(self):
+        return self._dump_one is not None
+
+    def dump(self, obj, many=None):
+        many = self.many if many is None else many
+        if self._dump_one is None:
+            return self.schema.dump(obj, many=many)
+        if many:
+            dump_one = self._dump_one
+            return [dump_one(row) for row in obj]
+        return self._dump_one(obj)
+
+    def jsonify(self, obj, many=None):
+        return jsonify(self.dump(obj, many))
+
+
+def stream_json(batches, schema, json_provider, ndjson=False):
+    """Cuerpo de un listado por partes, a partir de lotes de filas
+
+    - Arreglo JSON: mismos bytes que schema.jsonify() con JSON compacto
+      (fuera del modo debug)
+    - NDJSON: un objeto JSON por línea
+
+    Cada lote se codifica con el proveedor JSON de la app (json_provider),
+    con las mismas opciones que usa jsonify.
+    """
+    if ndjson:
+        for rows in batches:
+            yield "".join(json_provider.dumps(item, separators=(",", ":")) + "\n"
+                          for item in schema.dump(rows, many=True))
+        return
+
+    yield "["
+    first = True
+    for rows in batches:
+        if not rows:
+            continue
+        # "[a,b,c]" -> "a,b,c": un solo llamado al codificador por lote
+        chunk = json_provider.dumps(schema.dump(rows, many=True), separators=(",", ":"))[1:-1]
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]\n"
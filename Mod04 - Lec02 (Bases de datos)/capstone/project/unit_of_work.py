@@ -0,0 +1,203 @@
+"""
+Unidad de trabajo por petición HTTP
+
+Cada método de DatabaseLayer abre y cierra una conexión. Dentro de una
+petición de Flask, en cambio, los métodos piden la conexión con
+get_connection() y la devuelven con close_connection(). Esas funciones usan
+la unidad de trabajo guardada en `g`: una sola conexión por petición, que se
+abre la primera vez que se necesita y se cierra en el teardown de la app.
+Fuera de una petición (setup_users.py, scripts) se abre una conexión por
+método, como antes.
+
+Cada método sigue haciendo su propio commit o rollback. Si un método termina
+sin hacerlo (una lectura, o un error sin rollback), lo que quedó pendiente
+se descarta al devolver la conexión, para que el commit del método
+siguiente no lo guarde.
+
+Con DatabaseConfig.TRANSACTION_PER_REQUEST = True, la petición completa es
+una sola transacción:
+- Cada método corre dentro de un SAVEPOINT.
+- Su commit libera el savepoint y su rollback vuelve a él.
+- El commit real se hace en after_request, antes de enviar la respuesta.
+- Si la petición termina con una excepción, se hace rollback de todo.
+
+Métricas: cada respuesta lleva X-DB-Connections (conexiones abiertas en la
+petición), y stats() acumula los totales del proceso.
+"""
+
+import threading
+
+from flask import g, has_app_context, jsonify
+
+from config import DatabaseConfig
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "connections": 0, "calls": 0, "max_connections": 0}
+
+
+class UnitOfWork:
+    """Conexión (y opcionalmente transacción) compartida por una petición"""
+
+    def __init__(self, transactional=False):
+        self.transactional = transactional
+        self.connection = None
+        self.connections = 0  # conexiones abiertas durante la petición
+        self.calls = 0        # métodos de DatabaseLayer que usaron la conexión
+        self._after_commit = []
+
+    def _execute(self, sql):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+    def acquire(self):
+        """Conexión para un método de DatabaseLayer (None si no se pudo conectar)"""
+        if self.connection is None:
+            self.connection = DatabaseConfig.get_connection()
+            if self.connection is None:
+                return None
+            self.connections += 1
+        self.calls += 1
+        savepoint = None
+        if self.transactional:
+            savepoint = f"uow_{self.calls}"
+            self._execute(f"SAVEPOINT {savepoint}")
+        return _Scope(self, savepoint)
+
+    def after_commit(self, callback):
+        """Llama a callback cuando lo escrito en la petición esté confirmado"""
+        if self.transactional:
+            self._after_commit.append(callback)
+        else:
+            callback()
+
+    def commit(self):
+        """Commit de la transacción de la petición; False si falló"""
+        if not self.transactional or self.connection is None:
+            return True
+        try:
+            self.connection.commit()
+        except Exception as e:
+            print(f"Error al confirmar la transacción de la petición: {e}")
+            return False
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def close(self):
+        """Descarta lo que no se confirmó y cierra la conexión"""
+        if self.connection is None:
+            return
+        try:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+        except Exception as e:
+            print(f"Error al revertir la transacción de la petición: {e}")
+        finally:
+            DatabaseConfig.close_connection(self.connection)
+            self.connection = None
+
+
+class _Scope:
+    """Lo que recibe un método: la conexión de la petición, con commit y rollback propios"""
+
+    def __init__(self, unit, savepoint):
+        self._unit = unit
+        self._connection = unit.connection
+        self._savepoint = savepoint
+        self._done = False
+
+    def cursor(self, *args, **kwargs):
+        return self._connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        if self._savepoint:
+            self._unit._execute(f"RELEASE SAVEPOINT {self._savepoint}")
+        else:
+            self._connection.commit()
+        self._done = True
+
+    def rollback(self):
+        if self._savepoint:
+            self._unit._execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+        else:
+            self._connection.rollback()
+        self._done = True
+
+    def release(self, cursor=None):
+        if cursor:
+            cursor.close()
+        if self._done:
+            return
+        if self._savepoint or self._connection.in_transaction:
+            self.rollback()
+
+
+def current():
+    """Unidad de trabajo de la petición en curso (None fuera de Flask)"""
+    if not has_app_context():
+        return None
+    unit = g.get("unit_of_work")
+    if unit is None:
+        unit = g.unit_of_work = UnitOfWork(DatabaseConfig.TRANSACTION_PER_REQUEST)
+    return unit
+
+
+def get_connection():
+    """Reemplazo de DatabaseConfig.get_connection para los métodos de DatabaseLayer"""
+    unit = current()
+    if unit is None:
+        return DatabaseConfig.get_connection()
+    return unit.acquire()
+
+
+def close_connection(connection, cursor=None):
+    """Reemplazo de DatabaseConfig.close_connection para los métodos de DatabaseLayer"""
+    if isinstance(connection, _Scope):
+        connection.release(cursor)
+    else:
+        DatabaseConfig.close_connection(connection, cursor)
+
+
+def stats():
+    """Totales del proceso: peticiones que usaron la base, conexiones y métodos"""
+    with _stats_lock:
+        result = dict(_stats)
+    requests = result["requests"]
+    result["connections_per_request"] = round(result["connections"] / requests, 2) if requests else 0
+    result["calls_per_request"] = round(result["calls"] / requests, 2) if requests else 0
+    return result
+
+
+def _after_request(response):
+    unit = g.get("unit_of_work")
+    if unit is None:
+        return response
+    # Flask también llama a after_request con el 500 de una excepción sin
+    # manejar: en ese caso no se confirma y el teardown hace rollback
+    if response.status_code < 500 and not unit.commit():
+        response = jsonify({"error": "Error al guardar los cambios"})
+        response.status_code = 500
+    response.headers["X-DB-Connections"] = str(unit.connections)
+    return response
+
+
+def _teardown(exc):
+    unit = g.pop("unit_of_work", None)
+    if unit is None:
+        return
+    unit.close()
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["connections"] += unit.connections
+        _stats["calls"] += unit.calls
+        _stats["max_connections"] = max(_stats["max_connections"], unit.connections)
+
+
+def init_app(app):
+    """Registra la unidad de trabajo en los hooks de la app"""
+    app.after_request(_after_request)
+    app.teardown_appcontext(_teardown)
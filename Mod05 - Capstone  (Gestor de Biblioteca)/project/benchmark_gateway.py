@@ -0,0 +1,213 @@
+"""
+Benchmark del API Gateway: síncrono (Flask) vs asíncrono (Quart)
+
+Levanta un servicio simulado que responde como los cuatro microservicios
+con una latencia fija (no necesita MySQL ni los servicios reales), inicia
+cada gateway apuntando a él con su servidor de producción y mide peticiones
+por segundo y latencias con distintos niveles de concurrencia.
+
+Uso:
+    python benchmark_gateway.py
+    python benchmark_gateway.py --path /loans --concurrency 10,100,1000 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+import requests
+
+from shared.config import ServiceConfig
+from shared.tokens import issue_token
+from start_services import PROJECT_DIR, asgi_command, wsgi_command
+
+STUB_PORT = 5901
+SYNC_PORT = 5902
+ASYNC_PORT = 5903
+
+# ---------------------------------------------------------------------------
+# Servicio simulado (app ASGI mínima, se sirve con uvicorn en otro proceso)
+# ---------------------------------------------------------------------------
+
+STUB_LATENCY = float(os.environ.get("BENCH_LATENCY", 0.05))
+STUB_ROWS = int(os.environ.get("BENCH_ROWS", 20))
+_FECHA = "Tue, 02 Jan 2024 10:00:00 GMT"
+
+_STUB_USER = {"id": 1, "nombre": "Benchmark", "rol": "admin"}
+_STUB_TOKEN, _STUB_TOKEN_TTL = issue_token(_STUB_USER, ttl=24 * 3600)  # no se renueva durante la medición
+_STUB_ROUTES = {
+    "/auth/login": {"user": _STUB_USER, "token": _STUB_TOKEN, "expires_in": _STUB_TOKEN_TTL},
+    "/auth/users": [{"id": 1, "username": "admin", "nombre": "Benchmark", "rol": "admin"}],
+    "/books/stats": {"total_libros": STUB_ROWS, "libros_disponibles": STUB_ROWS},
+    "/members/stats": {"total_miembros": STUB_ROWS},
+    "/loans/stats": {"total_prestamos": STUB_ROWS, "prestamos_activos": STUB_ROWS},
+    "/books": [{"id": i, "titulo": f"Libro {i}", "autor": "Autor", "isbn": str(i),
+                "año_publicacion": 2000, "categoria": "Ficción", "disponible": True}
+               for i in range(1, STUB_ROWS + 1)],
+    "/members": [{"id": i, "nombre": "Nombre", "apellido": f"Apellido {i}", "correo": f"m{i}@correo.com",
+                  "telefono": "555-0000", "fecha_registro": _FECHA}
+                 for i in range(1, STUB_ROWS + 1)],
+    "/loans/detailed": [{"id": i, "libro_id": i, "miembro_id": i, "fecha_prestamo": _FECHA,
+                         "fecha_devolucion": None, "estado": "Activo", "libro_titulo": f"Libro {i}",
+                         "miembro_nombre": "Nombre", "miembro_apellido": f"Apellido {i}"}
+                        for i in range(1, STUB_ROWS + 1)],
+    "/health": {"service": "stub", "status": "healthy"},
+}
+_STUB_BODIES = {path: json.dumps(body).encode() for path, body in _STUB_ROUTES.items()}
+
+
+async def stub_app(scope, receive, send):
+    """Responde como el microservicio correspondiente tras STUB_LATENCY segundos"""
+    if scope["type"] != "http":
+        return
+    body = _STUB_BODIES.get(scope["path"])
+    if scope["path"] != "/health":
+        await asyncio.sleep(STUB_LATENCY)
+    headers = [(b"content-type", b"application/json"),
+               (b"x-total-count", str(STUB_ROWS).encode())]
+    await send({"type": "http.response.start", "status": 200 if body else 404, "headers": headers})
+    await send({"type": "http.response.body", "body": body or b"{}"})
+
+# ---------------------------------------------------------------------------
+# Procesos
+# ---------------------------------------------------------------------------
+
+def launch(command, env):
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El proceso del puerto {port} no respondió en {timeout} s")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+# ---------------------------------------------------------------------------
+# Carga
+# ---------------------------------------------------------------------------
+
+async def run_load(port, path, concurrency, duration):
+    """`concurrency` clientes pidiendo `path` sin pausa durante `duration` segundos"""
+    base_url = f"http://127.0.0.1:{port}"
+    # unsafe=True: acepta la cookie de sesión aunque el host sea una IP
+    async with aiohttp.ClientSession(base_url,
+                                     connector=aiohttp.TCPConnector(limit=concurrency),
+                                     cookie_jar=aiohttp.CookieJar(unsafe=True),
+                                     timeout=aiohttp.ClientTimeout(total=60)) as client:
+        async with client.post("/login", data={"username": "admin", "password": "admin"}) as response:
+            await response.read()
+        async with client.get(path) as response:  # calentamiento
+            await response.read()
+
+        latencies = []
+        errors = 0
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.monotonic()
+                try:
+                    async with client.get(path, allow_redirects=False) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    latencies.append(time.monotonic() - start)
+                else:
+                    errors += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del gateway síncrono vs asíncrono")
+    parser.add_argument("--path", default="/dashboard", help="Ruta del gateway a medir")
+    parser.add_argument("--concurrency", default="10,100,500",
+                        help="Clientes concurrentes, separados por coma")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por medición")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Latencia simulada de cada microservicio (s)")
+    parser.add_argument("--rows", type=int, default=20, help="Registros por listado simulado")
+    parser.add_argument("--workers", type=int, default=ServiceConfig.WSGI_WORKERS["gateway"],
+                        help="Procesos de cada gateway")
+    parser.add_argument("--threads", type=int, default=ServiceConfig.WSGI_THREADS["gateway"],
+                        help="Hilos por proceso del gateway síncrono")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    stub_url = f"http://127.0.0.1:{STUB_PORT}"
+    # Sin modelo de lectura: se mide el camino que consulta a los servicios en cada petición
+    env = dict(os.environ, GATEWAY_READ_MODEL="0",
+               BENCH_LATENCY=str(args.latency), BENCH_ROWS=str(args.rows),
+               AUTH_SERVICE_URL=stub_url, BOOKS_SERVICE_URL=stub_url,
+               MEMBERS_SERVICE_URL=stub_url, LOANS_SERVICE_URL=stub_url)
+
+    stub = launch([sys.executable, "-m", "uvicorn", "benchmark_gateway:stub_app",
+                   "--host", "127.0.0.1", "--port", str(STUB_PORT),
+                   "--no-access-log", "--log-level", "warning"], env)
+    gateways = [
+        ("sync", SYNC_PORT, wsgi_command("gateway", "gateway/app.py", SYNC_PORT,
+                                         args.workers, args.threads)),
+        ("async", ASYNC_PORT, asgi_command("gateway", "gateway/async_app.py", ASYNC_PORT,
+                                           args.workers)),
+    ]
+
+    print(f"Ruta: {args.path} | latencia simulada: {args.latency * 1000:.0f} ms | "
+          f"{args.workers} procesos por gateway ({args.threads} hilos en el síncrono)")
+    print()
+    print(f"{'gateway':<8}{'clientes':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+
+    try:
+        wait_ready(STUB_PORT)
+        for name, port, command in gateways:
+            process = launch(command, env)
+            try:
+                wait_ready(port)
+                for concurrency in levels:
+                    result = asyncio.run(run_load(port, args.path, concurrency, args.duration))
+                    print(f"{name:<8}{concurrency:>9}{result['rps']:>10.1f}{result['p50']:>10.1f}"
+                          f"{result['p95']:>10.1f}{result['p99']:>10.1f}{result['errors']:>9}")
+            finally:
+                stop(process)
+    finally:
+        stop(stub)
+
+
+if __name__ == "__main__":
+    main()
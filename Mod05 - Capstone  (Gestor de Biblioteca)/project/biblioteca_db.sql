@@ -1,3 +1,7 @@
+-- Esquema inicial (versión 1). Los cambios posteriores, como los índices de
+-- consulta, están en migrations/: después de este script hay que ejecutar
+--     python start_services.py migrate
+
 -- Crear la base de datos
 CREATE DATABASE IF NOT EXISTS biblioteca_db;
 
@@ -48,6 +52,18 @@ CREATE TABLE IF NOT EXISTS prestamos (
     FOREIGN KEY (miembro_id) REFERENCES miembros(id) ON DELETE CASCADE
 );
 
+-- Outbox de eventos de cambio (libros, miembros y préstamos).
+-- Se escribe en la misma transacción que el cambio y se publica por GET /events
+CREATE TABLE IF NOT EXISTS eventos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    entidad ENUM('libro', 'miembro', 'prestamo') NOT NULL,
+    accion ENUM('created', 'updated', 'deleted') NOT NULL,
+    entidad_id INT NOT NULL,
+    datos JSON NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_eventos_created_at (created_at)
+);
+
 -- ⚠️ IMPORTANTE: No insertar usuarios aquí
 -- Los usuarios se crearán ejecutando el script setup_users.py
 -- Esto asegura que las contraseñas estén correctamente hasheadas
@@ -0,0 +1 @@
+# API Gateway
\ No newline at end of file
@@ -1,17 +1,84 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-import requests
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, session, get_flashed_messages
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from shared.config import ServiceConfig
+from shared.http_client import auth_service, books_service, members_service, loans_service, request_token
+from shared.tokens import TokenError, token_verifier
+from shared.tracing import exporter, instrument
+from gateway.fallback import describe_age, fallback_cache
+from gateway.fanout import DownstreamCall, fan_out
+from gateway.paging import PagedList
+from gateway.read_model import read_models
 from functools import wraps
 
 app = Flask(__name__, 
             template_folder='../templates',
             static_folder='../static')
-app.secret_key = 'tu_clave_secreta_super_segura_123'
+app.secret_key = ServiceConfig.GATEWAY_SECRET_KEY
+instrument(app, 'gateway')
+
+def save_user(data):
+    """Guarda en la sesión el usuario y el token que devolvió el servicio de autenticación"""
+    user = data['user']
+    session['user_id'] = user['id']
+    session['user_nombre'] = user['nombre']
+    session['user_rol'] = user['rol']
+    session['token'] = data['token']
+
+@app.before_request
+def start_read_models():
+    read_models.start()
+
+@app.before_request
+def attach_token():
+    """Deja el token de la sesión listo para los clientes, renovándolo si está por expirar
+
+    Los servicios lo verifican localmente; el gateway solo vuelve a llamar a
+    auth cuando le quedan menos de TOKEN_REFRESH_BEFORE segundos.
+    """
+    token = session.get('token')
+    request_token.set(token)
+    if token is None:
+        if 'user_id' in session:
+            session.clear()  # sesión iniciada antes de usar tokens
+        return
+    try:
+        if token_verifier.expires_in(token) < ServiceConfig.TOKEN_REFRESH_BEFORE:
+            response = auth_service.post("/auth/refresh")
+            if response.status_code == 200:
+                save_user(response.json())
+                request_token.set(session['token'])
+            elif response.status_code == 401:
+                raise TokenError("el usuario ya no es válido")
+    except TokenError:
+        session.clear()
+        request_token.set(None)
+    except Exception as e:
+        # auth no responde: se sigue con el token actual mientras sea válido
+        print(f"Error al renovar el token: {e}")
+
+def stream_page(template, **context):
+    """stream_template que consume los mensajes flash antes de enviar la respuesta
+
+    La cookie de sesión se escribe antes de que empiece el streaming; si los
+    mensajes se consumieran al renderizar, volverían a mostrarse en la
+    siguiente página.
+    """
+    get_flashed_messages()
+    return stream_template(template, **context)
+
+def render_fallback(template, name, label, error):
+    """Renderiza la página con el último listado guardado, o vacía si no hay"""
+    cached = fallback_cache.load(name)
+    if cached is None:
+        flash(f'Error al obtener {label}: {str(error)}', 'danger')
+        return render_template(template, **{name: []})
+    rows, age = cached
+    flash(f'No se pudo obtener {label} ({error}); se muestran datos guardados {describe_age(age)}', 'warning')
+    return render_template(template, **{name: rows})
 
 def login_required(f):
     @wraps(f)
@@ -47,19 +114,20 @@ def login():
         password = request.form.get('password')
         
         try:
-            response = requests.post(
-                f"{ServiceConfig.AUTH_SERVICE_URL}/auth/login",
-                json={"username": username, "password": password}
+            response = auth_service.post(
+                "/auth/login",
+                json={"username": username, "password": password},
+                # auth limita los intentos por IP del cliente, no por la del gateway
+                headers={"X-Forwarded-For": request.remote_addr}
             )
             
             if response.status_code == 200:
-                data = response.json()
-                user = data['user']
-                session['user_id'] = user['id']
-                session['user_nombre'] = user['nombre']
-                session['user_rol'] = user['rol']
+                save_user(response.json())
                 flash('¡Bienvenido de nuevo!', 'success')
                 return redirect(url_for('dashboard'))
+            elif response.status_code in (429, 503):
+                wait = response.headers.get('Retry-After', 'unos')
+                flash(f'Demasiados intentos de inicio de sesión. Intenta de nuevo en {wait} segundos', 'warning')
             else:
                 flash('Usuario o contraseña incorrectos', 'danger')
         except Exception as e:
@@ -76,20 +144,27 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
+    if read_models.ready():
+        return render_template('dashboard.html', **read_models.dashboard_stats())
     try:
-        books_response = requests.get(f"{ServiceConfig.BOOKS_SERVICE_URL}/books")
-        members_response = requests.get(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members")
-        loans_response = requests.get(f"{ServiceConfig.LOANS_SERVICE_URL}/loans")
-        
-        libros = books_response.json() if books_response.status_code == 200 else []
-        miembros = members_response.json() if members_response.status_code == 200 else []
-        prestamos = loans_response.json() if loans_response.status_code == 200 else []
+        # Solo se piden los conteos: el costo no crece con el tamaño del catálogo
+        result = fan_out(
+            DownstreamCall('libros', books_service, "/books/stats", default={}),
+            DownstreamCall('miembros', members_service, "/members/stats", default={}),
+            DownstreamCall('prestamos', loans_service, "/loans/stats", default={})
+        )
+        stale_age = fallback_cache.fill(result, 'dashboard')
+        if not result.ok:
+            message = f'Algunos servicios no respondieron: {result.error_message()}'
+            if stale_age is not None:
+                message += f' (se muestran datos guardados {describe_age(stale_age)})'
+            flash(message, 'warning')
         
         stats = {
-            'total_libros': len(libros),
-            'libros_disponibles': sum(1 for l in libros if l['disponible']),
-            'total_miembros': len(miembros),
-            'prestamos_activos': sum(1 for p in prestamos if p['estado'] == 'Activo')
+            'total_libros': result['libros'].get('total_libros', 0),
+            'libros_disponibles': result['libros'].get('libros_disponibles', 0),
+            'total_miembros': result['miembros'].get('total_miembros', 0),
+            'prestamos_activos': result['prestamos'].get('prestamos_activos', 0)
         }
         return render_template('dashboard.html', **stats)
     except Exception as e:
@@ -100,13 +175,14 @@ def dashboard():
 @app.route('/books')
 @login_required
 def books_page():
+    if read_models.ready(read_models.books):
+        return render_template('books.html', libros=read_models.books.rows())
     try:
-        response = requests.get(f"{ServiceConfig.BOOKS_SERVICE_URL}/books")
-        libros = response.json() if response.status_code == 200 else []
-        return render_template('books.html', libros=libros)
+        # Las páginas siguientes se piden mientras se envía el HTML
+        libros = PagedList(books_service, "/books")
+        return stream_page('books.html', libros=fallback_cache.recording('libros', libros))
     except Exception as e:
-        flash(f'Error al obtener libros: {str(e)}', 'danger')
-        return render_template('books.html', libros=[])
+        return render_fallback('books.html', 'libros', 'libros', e)
 
 @app.route('/books/create', methods=['POST'])
 @login_required
@@ -120,7 +196,8 @@ def create_book_form():
             'categoria': request.form.get('categoria')
         }
         
-        response = requests.post(f"{ServiceConfig.BOOKS_SERVICE_URL}/books", json=data)
+        response = books_service.post("/books", json=data)
+        read_models.wait_for(response)
         
         if response.status_code == 201:
             flash(f'Libro "{data["titulo"]}" agregado exitosamente', 'success')
@@ -134,7 +211,8 @@ def create_book_form():
 @login_required
 def delete_book_form(book_id):
     try:
-        response = requests.delete(f"{ServiceConfig.BOOKS_SERVICE_URL}/books/{book_id}")
+        response = books_service.delete(f"/books/{book_id}")
+        read_models.wait_for(response)
         if response.status_code == 200:
             flash('Libro eliminado exitosamente', 'success')
         else:
@@ -146,13 +224,13 @@ def delete_book_form(book_id):
 @app.route('/members')
 @login_required
 def members_page():
+    if read_models.ready(read_models.members):
+        return render_template('members.html', miembros=read_models.members.rows())
     try:
-        response = requests.get(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members")
-        miembros = response.json() if response.status_code == 200 else []
-        return render_template('members.html', miembros=miembros)
+        miembros = PagedList(members_service, "/members")
+        return stream_page('members.html', miembros=fallback_cache.recording('miembros', miembros))
     except Exception as e:
-        flash(f'Error al obtener miembros: {str(e)}', 'danger')
-        return render_template('members.html', miembros=[])
+        return render_fallback('members.html', 'miembros', 'miembros', e)
 
 @app.route('/members/create', methods=['POST'])
 @login_required
@@ -165,7 +243,8 @@ def create_member_form():
             'telefono': request.form.get('telefono')
         }
         
-        response = requests.post(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members", json=data)
+        response = members_service.post("/members", json=data)
+        read_models.wait_for(response)
         
         if response.status_code == 201:
             flash(f'Miembro "{data["nombre"]} {data["apellido"]}" registrado exitosamente', 'success')
@@ -179,7 +258,8 @@ def create_member_form():
 @login_required
 def delete_member_form(member_id):
     try:
-        response = requests.delete(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members/{member_id}")
+        response = members_service.delete(f"/members/{member_id}")
+        read_models.wait_for(response)
         if response.status_code == 200:
             flash('Miembro eliminado exitosamente', 'success')
         else:
@@ -191,16 +271,24 @@ def delete_member_form(member_id):
 @app.route('/loans')
 @login_required
 def loans_page():
+    if read_models.ready():
+        return render_template('loans.html', prestamos=read_models.loans_detailed(),
+                               libros=read_models.books.rows(), miembros=read_models.members.rows())
     try:
-        loans_response = requests.get(f"{ServiceConfig.LOANS_SERVICE_URL}/loans")
-        books_response = requests.get(f"{ServiceConfig.BOOKS_SERVICE_URL}/books")
-        members_response = requests.get(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members")
-        
-        prestamos = loans_response.json() if loans_response.status_code == 200 else []
-        libros = books_response.json() if books_response.status_code == 200 else []
-        miembros = members_response.json() if members_response.status_code == 200 else []
+        # El listado ya trae título y miembro (JOIN en el servicio de préstamos);
+        # libros y miembros solo se piden con los campos que usan los selects
+        result = fan_out(
+            DownstreamCall('prestamos', loans_service, "/loans/detailed", default=[], stream=True),
+            DownstreamCall('libros', books_service, "/books", default=[], paged=True,
+                           fields=('titulo', 'autor', 'disponible')),
+            DownstreamCall('miembros', members_service, "/members", default=[], paged=True,
+                           fields=('nombre', 'apellido'))
+        )
+        if not result.ok:
+            flash(f'Algunos servicios no respondieron: {result.error_message()}', 'warning')
         
-        return render_template('loans.html', prestamos=prestamos, libros=libros, miembros=miembros)
+        return stream_page('loans.html', prestamos=result['prestamos'],
+                           libros=result['libros'], miembros=result['miembros'])
     except Exception as e:
         flash(f'Error al obtener datos: {str(e)}', 'danger')
         return render_template('loans.html', prestamos=[], libros=[], miembros=[])
@@ -214,7 +302,8 @@ def create_loan_form():
             'miembro_id': int(request.form.get('miembro_id'))
         }
         
-        response = requests.post(f"{ServiceConfig.LOANS_SERVICE_URL}/loans", json=data)
+        response = loans_service.post("/loans", json=data)
+        read_models.wait_for(response)
         
         if response.status_code == 201:
             flash('Préstamo registrado exitosamente', 'success')
@@ -229,7 +318,8 @@ def create_loan_form():
 @login_required
 def return_loan_form(loan_id):
     try:
-        response = requests.put(f"{ServiceConfig.LOANS_SERVICE_URL}/loans/{loan_id}/return")
+        response = loans_service.put(f"/loans/{loan_id}/return")
+        read_models.wait_for(response)
         if response.status_code == 200:
             flash('Libro devuelto exitosamente', 'success')
         else:
@@ -242,7 +332,8 @@ def return_loan_form(loan_id):
 @login_required
 def delete_loan_form(loan_id):
     try:
-        response = requests.delete(f"{ServiceConfig.LOANS_SERVICE_URL}/loans/{loan_id}")
+        response = loans_service.delete(f"/loans/{loan_id}")
+        read_models.wait_for(response)
         if response.status_code == 200:
             flash('Préstamo eliminado exitosamente', 'success')
         else:
@@ -255,7 +346,7 @@ def delete_loan_form(loan_id):
 @admin_required
 def users_page():
     try:
-        response = requests.get(f"{ServiceConfig.AUTH_SERVICE_URL}/auth/users")
+        response = auth_service.get("/auth/users")
         usuarios = response.json() if response.status_code == 200 else []
         return render_template('users.html', usuarios=usuarios)
     except Exception as e:
@@ -273,7 +364,7 @@ def create_user_form():
             'rol': request.form.get('rol')
         }
         
-        response = requests.post(f"{ServiceConfig.AUTH_SERVICE_URL}/auth/users", json=data)
+        response = auth_service.post("/auth/users", json=data)
         
         if response.status_code == 201:
             flash(f'Usuario "{data["username"]}" creado exitosamente', 'success')
@@ -290,7 +381,7 @@ def delete_user_form(user_id):
         flash('No puedes eliminar tu propio usuario', 'danger')
     else:
         try:
-            response = requests.delete(f"{ServiceConfig.AUTH_SERVICE_URL}/auth/users/{user_id}")
+            response = auth_service.delete(f"/auth/users/{user_id}")
             if response.status_code == 200:
                 flash('Usuario eliminado exitosamente', 'success')
             else:
@@ -299,6 +390,13 @@ def delete_user_form(user_id):
             flash(f'Error: {str(e)}', 'danger')
     return redirect(url_for('users_page'))
 
+@app.route('/health')
+def health():
+    breakers = {client.breaker.name: client.breaker.stats()
+                for client in (auth_service, books_service, members_service, loans_service)}
+    return {"service": "gateway", "status": "healthy", "breakers": breakers,
+            "read_models": read_models.stats(), "tracing": exporter.stats()}, 200
+
 if __name__ == "__main__":
     print("🌐 API Gateway iniciado en puerto 5000")
     print("=" * 60)
@@ -0,0 +1,427 @@
+"""
+API Gateway asíncrono (Quart, ASGI)
+
+Mismas rutas, sesión y plantillas que gateway/app.py, pero cada petición es
+una corrutina: mientras espera a los microservicios no ocupa un hilo, así que
+pocos procesos pueden tener miles de llamadas en curso.
+
+    python start_services.py --async-gateway
+    uvicorn gateway.async_app:app --port 5000 --workers 2
+"""
+
+import asyncio
+
+from quart import Quart, render_template, stream_template, request, redirect, url_for, flash, session, get_flashed_messages
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.config import ServiceConfig
+from shared.async_http_client import auth_service, books_service, members_service, loans_service
+from shared.http_client import request_token
+from shared.tokens import TokenError, token_verifier
+from shared.tracing import exporter, instrument_async
+from gateway.fallback import describe_age, fallback_cache
+from gateway.fanout import DownstreamCall, async_fan_out
+from gateway.paging import AsyncPagedList
+from gateway.read_model import read_models
+from functools import wraps
+
+app = Quart(__name__,
+            template_folder='../templates',
+            static_folder='../static')
+app.secret_key = ServiceConfig.GATEWAY_SECRET_KEY
+instrument_async(app, 'gateway')
+
+@app.after_serving
+async def close_clients():
+    for client in (auth_service, books_service, members_service, loans_service):
+        await client.close()
+
+def save_user(data):
+    """Guarda en la sesión el usuario y el token que devolvió el servicio de autenticación"""
+    user = data['user']
+    session['user_id'] = user['id']
+    session['user_nombre'] = user['nombre']
+    session['user_rol'] = user['rol']
+    session['token'] = data['token']
+
+@app.before_request
+async def start_read_models():
+    read_models.start()
+
+@app.before_request
+async def attach_token():
+    """Deja el token de la sesión listo para los clientes, como en gateway/app.py"""
+    token = session.get('token')
+    request_token.set(token)
+    if token is None:
+        if 'user_id' in session:
+            session.clear()  # sesión iniciada antes de usar tokens
+        return
+    try:
+        if token_verifier.expires_in(token) < ServiceConfig.TOKEN_REFRESH_BEFORE:
+            response = await auth_service.post("/auth/refresh")
+            if response.status_code == 200:
+                save_user(response.json())
+                request_token.set(session['token'])
+            elif response.status_code == 401:
+                raise TokenError("el usuario ya no es válido")
+    except TokenError:
+        session.clear()
+        request_token.set(None)
+    except Exception as e:
+        # auth no responde: se sigue con el token actual mientras sea válido
+        print(f"Error al renovar el token: {e}")
+
+async def stream_page(template, **context):
+    """stream_template que consume los mensajes flash antes de enviar la respuesta
+
+    Igual que en gateway/app.py: la cookie de sesión se escribe antes del
+    cuerpo, así que los mensajes no pueden consumirse durante el streaming.
+    Además Quart renderiza sobre una copia del contexto de la petición que no
+    conserva los mensajes ya leídos, por eso se pasan a la plantilla.
+    """
+    messages = get_flashed_messages(with_categories=True)
+
+    def flashed_messages(with_categories=False, category_filter=()):
+        selected = [m for m in messages if not category_filter or m[0] in category_filter]
+        return selected if with_categories else [message for _, message in selected]
+
+    return await stream_template(template, get_flashed_messages=flashed_messages, **context)
+
+async def render_fallback(template, name, label, error):
+    """Renderiza la página con el último listado guardado, o vacía si no hay"""
+    cached = fallback_cache.load(name)
+    if cached is None:
+        await flash(f'Error al obtener {label}: {str(error)}', 'danger')
+        return await render_template(template, **{name: []})
+    rows, age = cached
+    await flash(f'No se pudo obtener {label} ({error}); se muestran datos guardados {describe_age(age)}', 'warning')
+    return await render_template(template, **{name: rows})
+
+def login_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            await flash('Debes iniciar sesión para acceder a esta página', 'warning')
+            return redirect(url_for('login'))
+        return await f(*args, **kwargs)
+    return decorated_function
+
+def admin_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            await flash('Debes iniciar sesión', 'warning')
+            return redirect(url_for('login'))
+        if session.get('user_rol') != 'admin':
+            await flash('No tienes permisos para acceder a esta página', 'danger')
+            return redirect(url_for('dashboard'))
+        return await f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/')
+async def index():
+    if 'user_id' in session:
+        return redirect(url_for('dashboard'))
+    return redirect(url_for('login'))
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    if request.method == 'POST':
+        form = await request.form
+        username = form.get('username')
+        password = form.get('password')
+
+        try:
+            response = await auth_service.post(
+                "/auth/login",
+                json={"username": username, "password": password},
+                # auth limita los intentos por IP del cliente, no por la del gateway
+                headers={"X-Forwarded-For": request.remote_addr}
+            )
+
+            if response.status_code == 200:
+                save_user(response.json())
+                await flash('¡Bienvenido de nuevo!', 'success')
+                return redirect(url_for('dashboard'))
+            elif response.status_code in (429, 503):
+                wait = response.headers.get('Retry-After', 'unos')
+                await flash(f'Demasiados intentos de inicio de sesión. Intenta de nuevo en {wait} segundos', 'warning')
+            else:
+                await flash('Usuario o contraseña incorrectos', 'danger')
+        except Exception as e:
+            await flash(f'Error al conectar con el servicio de autenticación: {str(e)}', 'danger')
+
+    return await render_template('login.html')
+
+@app.route('/logout')
+async def logout():
+    session.clear()
+    await flash('Has cerrado sesión exitosamente', 'success')
+    return redirect(url_for('login'))
+
+@app.route('/dashboard')
+@login_required
+async def dashboard():
+    if read_models.ready():
+        return await render_template('dashboard.html', **read_models.dashboard_stats())
+    try:
+        result = await async_fan_out(
+            DownstreamCall('libros', books_service, "/books/stats", default={}),
+            DownstreamCall('miembros', members_service, "/members/stats", default={}),
+            DownstreamCall('prestamos', loans_service, "/loans/stats", default={})
+        )
+        stale_age = fallback_cache.fill(result, 'dashboard')
+        if not result.ok:
+            message = f'Algunos servicios no respondieron: {result.error_message()}'
+            if stale_age is not None:
+                message += f' (se muestran datos guardados {describe_age(stale_age)})'
+            await flash(message, 'warning')
+
+        stats = {
+            'total_libros': result['libros'].get('total_libros', 0),
+            'libros_disponibles': result['libros'].get('libros_disponibles', 0),
+            'total_miembros': result['miembros'].get('total_miembros', 0),
+            'prestamos_activos': result['prestamos'].get('prestamos_activos', 0)
+        }
+        return await render_template('dashboard.html', **stats)
+    except Exception as e:
+        await flash(f'Error al obtener datos: {str(e)}', 'danger')
+        return await render_template('dashboard.html', total_libros=0, libros_disponibles=0,
+                                     total_miembros=0, prestamos_activos=0)
+
+@app.route('/books')
+@login_required
+async def books_page():
+    if read_models.ready(read_models.books):
+        return await render_template('books.html', libros=read_models.books.rows())
+    try:
+        libros = await AsyncPagedList.open(books_service, "/books")
+        return await stream_page('books.html', libros=fallback_cache.recording_async('libros', libros))
+    except Exception as e:
+        return await render_fallback('books.html', 'libros', 'libros', e)
+
+@app.route('/books/create', methods=['POST'])
+@login_required
+async def create_book_form():
+    try:
+        form = await request.form
+        data = {
+            'titulo': form.get('titulo'),
+            'autor': form.get('autor'),
+            'isbn': form.get('isbn'),
+            'año_publicacion': int(form.get('año_publicacion')),
+            'categoria': form.get('categoria')
+        }
+
+        response = await books_service.post("/books", json=data)
+        await asyncio.to_thread(read_models.wait_for, response)
+
+        if response.status_code == 201:
+            await flash(f'Libro "{data["titulo"]}" agregado exitosamente', 'success')
+        else:
+            await flash('Error al crear libro', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('books_page'))
+
+@app.route('/books/delete/<int:book_id>', methods=['POST'])
+@login_required
+async def delete_book_form(book_id):
+    try:
+        response = await books_service.delete(f"/books/{book_id}")
+        await asyncio.to_thread(read_models.wait_for, response)
+        if response.status_code == 200:
+            await flash('Libro eliminado exitosamente', 'success')
+        else:
+            await flash('Error al eliminar libro', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('books_page'))
+
+@app.route('/members')
+@login_required
+async def members_page():
+    if read_models.ready(read_models.members):
+        return await render_template('members.html', miembros=read_models.members.rows())
+    try:
+        miembros = await AsyncPagedList.open(members_service, "/members")
+        return await stream_page('members.html', miembros=fallback_cache.recording_async('miembros', miembros))
+    except Exception as e:
+        return await render_fallback('members.html', 'miembros', 'miembros', e)
+
+@app.route('/members/create', methods=['POST'])
+@login_required
+async def create_member_form():
+    try:
+        form = await request.form
+        data = {
+            'nombre': form.get('nombre'),
+            'apellido': form.get('apellido'),
+            'correo': form.get('correo'),
+            'telefono': form.get('telefono')
+        }
+
+        response = await members_service.post("/members", json=data)
+        await asyncio.to_thread(read_models.wait_for, response)
+
+        if response.status_code == 201:
+            await flash(f'Miembro "{data["nombre"]} {data["apellido"]}" registrado exitosamente', 'success')
+        else:
+            await flash('Error al registrar miembro', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('members_page'))
+
+@app.route('/members/delete/<int:member_id>', methods=['POST'])
+@login_required
+async def delete_member_form(member_id):
+    try:
+        response = await members_service.delete(f"/members/{member_id}")
+        await asyncio.to_thread(read_models.wait_for, response)
+        if response.status_code == 200:
+            await flash('Miembro eliminado exitosamente', 'success')
+        else:
+            await flash('Error al eliminar miembro', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('members_page'))
+
+@app.route('/loans')
+@login_required
+async def loans_page():
+    if read_models.ready():
+        return await render_template('loans.html', prestamos=read_models.loans_detailed(),
+                                     libros=read_models.books.rows(), miembros=read_models.members.rows())
+    try:
+        result = await async_fan_out(
+            DownstreamCall('prestamos', loans_service, "/loans/detailed", default=[], stream=True),
+            DownstreamCall('libros', books_service, "/books", default=[], paged=True,
+                           fields=('titulo', 'autor', 'disponible')),
+            DownstreamCall('miembros', members_service, "/members", default=[], paged=True,
+                           fields=('nombre', 'apellido'))
+        )
+        if not result.ok:
+            await flash(f'Algunos servicios no respondieron: {result.error_message()}', 'warning')
+
+        return await stream_page('loans.html', prestamos=result['prestamos'],
+                                 libros=result['libros'], miembros=result['miembros'])
+    except Exception as e:
+        await flash(f'Error al obtener datos: {str(e)}', 'danger')
+        return await render_template('loans.html', prestamos=[], libros=[], miembros=[])
+
+@app.route('/loans/create', methods=['POST'])
+@login_required
+async def create_loan_form():
+    try:
+        form = await request.form
+        data = {
+            'libro_id': int(form.get('libro_id')),
+            'miembro_id': int(form.get('miembro_id'))
+        }
+
+        response = await loans_service.post("/loans", json=data)
+        await asyncio.to_thread(read_models.wait_for, response)
+
+        if response.status_code == 201:
+            await flash('Préstamo registrado exitosamente', 'success')
+        else:
+            error_msg = response.json().get('error', 'Error desconocido')
+            await flash(f'Error: {error_msg}', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('loans_page'))
+
+@app.route('/loans/return/<int:loan_id>', methods=['POST'])
+@login_required
+async def return_loan_form(loan_id):
+    try:
+        response = await loans_service.put(f"/loans/{loan_id}/return")
+        await asyncio.to_thread(read_models.wait_for, response)
+        if response.status_code == 200:
+            await flash('Libro devuelto exitosamente', 'success')
+        else:
+            await flash('Error al devolver libro', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('loans_page'))
+
+@app.route('/loans/delete/<int:loan_id>', methods=['POST'])
+@login_required
+async def delete_loan_form(loan_id):
+    try:
+        response = await loans_service.delete(f"/loans/{loan_id}")
+        await asyncio.to_thread(read_models.wait_for, response)
+        if response.status_code == 200:
+            await flash('Préstamo eliminado exitosamente', 'success')
+        else:
+            await flash('Error al eliminar préstamo', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('loans_page'))
+
+@app.route('/users')
+@admin_required
+async def users_page():
+    try:
+        response = await auth_service.get("/auth/users")
+        usuarios = response.json() if response.status_code == 200 else []
+        return await render_template('users.html', usuarios=usuarios)
+    except Exception as e:
+        await flash(f'Error al obtener usuarios: {str(e)}', 'danger')
+        return await render_template('users.html', usuarios=[])
+
+@app.route('/users/create', methods=['POST'])
+@admin_required
+async def create_user_form():
+    try:
+        form = await request.form
+        data = {
+            'username': form.get('username'),
+            'password': form.get('password'),
+            'nombre': form.get('nombre'),
+            'rol': form.get('rol')
+        }
+
+        response = await auth_service.post("/auth/users", json=data)
+
+        if response.status_code == 201:
+            await flash(f'Usuario "{data["username"]}" creado exitosamente', 'success')
+        else:
+            await flash('Error al crear usuario', 'danger')
+    except Exception as e:
+        await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('users_page'))
+
+@app.route('/users/delete/<int:user_id>', methods=['POST'])
+@admin_required
+async def delete_user_form(user_id):
+    if user_id == session['user_id']:
+        await flash('No puedes eliminar tu propio usuario', 'danger')
+    else:
+        try:
+            response = await auth_service.delete(f"/auth/users/{user_id}")
+            if response.status_code == 200:
+                await flash('Usuario eliminado exitosamente', 'success')
+            else:
+                await flash('Error al eliminar usuario', 'danger')
+        except Exception as e:
+            await flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('users_page'))
+
+@app.route('/health')
+async def health():
+    breakers = {client.breaker.name: client.breaker.stats()
+                for client in (auth_service, books_service, members_service, loans_service)}
+    return {"service": "gateway", "status": "healthy", "breakers": breakers,
+            "read_models": read_models.stats(), "tracing": exporter.stats()}, 200
+
+if __name__ == "__main__":
+    print("🌐 API Gateway (asíncrono) iniciado en puerto 5000")
+    print("=" * 60)
+    print("Accede a: http://localhost:5000")
+    print("=" * 60)
+    app.run(port=5000, debug=True, use_reloader=False)
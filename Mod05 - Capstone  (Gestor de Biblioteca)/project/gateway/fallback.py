@@ -0,0 +1,84 @@
+import time
+
+from shared.cache import TTLCache
+from shared.config import ServiceConfig
+
+
+class FallbackCache:
+    """Última respuesta correcta de cada lectura del gateway
+
+    Si el servicio falla (o su circuito está abierto) la página se muestra
+    con estos datos, avisando su antigüedad, en lugar de quedar vacía.
+    Los listados se guardan mientras se envían al navegador, solo si
+    tienen como máximo `max_rows` registros.
+    """
+
+    def __init__(self, max_age=None, max_rows=None):
+        self.max_rows = max_rows or ServiceConfig.FALLBACK_MAX_ROWS
+        self._cache = TTLCache(maxsize=64, ttl=max_age or ServiceConfig.FALLBACK_MAX_AGE)
+
+    def store(self, key, value):
+        self._cache.set(key, (value, time.time()))
+
+    def load(self, key):
+        """Devuelve (valor, segundos de antigüedad) o None"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, time.time() - stored_at
+
+    def fill(self, result, prefix):
+        """Completa un fan-out con la última respuesta buena de cada llamada fallida
+
+        Guarda las respuestas correctas y devuelve la antigüedad del dato
+        guardado más viejo que se usó, o None si no se usó ninguno.
+        """
+        oldest = None
+        for name in result.data:
+            key = f"{prefix}:{name}"
+            if name not in result.errors:
+                self.store(key, result.data[name])
+                continue
+            cached = self.load(key)
+            if cached is not None:
+                result.data[name], age = cached
+                oldest = max(oldest or 0, age)
+        return oldest
+
+    def recording(self, key, rows):
+        """Itera `rows` (un PagedList) y, si se recorrió completo, lo guarda"""
+        saved = []
+        for row in rows:
+            if saved is not None:
+                saved.append(row)
+                if len(saved) > self.max_rows:
+                    saved = None
+            yield row
+        if saved is not None and rows.complete:
+            self.store(key, saved)
+
+    async def recording_async(self, key, rows):
+        """recording() para listados asíncronos (AsyncPagedList)"""
+        saved = []
+        async for row in rows:
+            if saved is not None:
+                saved.append(row)
+                if len(saved) > self.max_rows:
+                    saved = None
+            yield row
+        if saved is not None and rows.complete:
+            self.store(key, saved)
+
+
+def describe_age(seconds):
+    """Antigüedad legible para los mensajes ("hace 3 min")"""
+    if seconds < 60:
+        return f"hace {int(seconds)} s"
+    if seconds < 3600:
+        return f"hace {int(seconds // 60)} min"
+    return f"hace {int(seconds // 3600)} h"
+
+
+# Una por proceso del gateway
+fallback_cache = FallbackCache()
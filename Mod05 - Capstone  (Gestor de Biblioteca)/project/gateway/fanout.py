@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from shared.config import ServiceConfig
+from gateway.paging import AsyncPagedList, PagedList
+
+# Pool compartido por todas las peticiones del gateway
+_executor = ThreadPoolExecutor(max_workers=ServiceConfig.FANOUT_WORKERS,
+                               thread_name_prefix="fanout")
+
+
+class DownstreamCall:
+    """Una llamada GET (vía un ServiceClient o AsyncServiceClient) dentro de un fan-out
+
+    - `default`: valor que se usa si la llamada falla (política de fallo parcial)
+    - `required`: si falla, todo el fan-out falla con FanOutError
+    - `paged`: recorre todas las páginas del listado y devuelve la lista completa
+    - `stream`: devuelve un PagedList con la primera página ya descargada
+    - `fields`: proyección de columnas para listados paginados
+    """
+
+    def __init__(self, name, client, path, default=None, timeout=None, required=False,
+                 paged=False, stream=False, fields=None):
+        self.name = name
+        self.client = client
+        self.path = path
+        self.default = default
+        self.timeout = timeout if timeout is not None else ServiceConfig.REQUEST_TIMEOUT
+        self.required = required
+        self.paged = paged
+        self.stream = stream
+        self.fields = fields
+
+
+class FanOutError(Exception):
+    """Falló al menos una llamada marcada como `required`"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{name}: {msg}" for name, msg in errors.items()))
+
+
+class FanOutResult:
+    """Resultados por nombre de llamada y errores de las que fallaron"""
+
+    def __init__(self, data, errors):
+        self.data = data
+        self.errors = errors
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def error_message(self):
+        return ", ".join(f"{name} ({msg})" for name, msg in self.errors.items())
+
+
+def _fetch(call):
+    if call.paged or call.stream:
+        pages = PagedList(call.client, call.path, fields=call.fields, timeout=call.timeout)
+        return pages if call.stream else list(pages)
+    response = call.client.get(call.path, timeout=call.timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response.json()
+
+
+def fan_out(*calls):
+    """Ejecuta las llamadas en paralelo y espera a todas
+
+    La latencia total es la de la llamada más lenta (acotada por su timeout),
+    no la suma de todas. Cada fallo se reemplaza por el `default` de su llamada.
+    """
+    start = time.monotonic()
+    # Cada llamada corre con una copia del contexto (incluye el token del usuario)
+    futures = [(call, _executor.submit(contextvars.copy_context().run, _fetch, call)) for call in calls]
+
+    data = {}
+    errors = {}
+    for call, future in futures:
+        # `timeout` de requests es por operación de socket; aquí se acota el total
+        remaining = max(0, call.timeout - (time.monotonic() - start))
+        try:
+            data[call.name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            errors[call.name] = "tiempo de espera agotado"
+            data[call.name] = call.default
+        except Exception as e:
+            errors[call.name] = str(e)
+            data[call.name] = call.default
+    return _result(calls, data, errors)
+
+
+async def _fetch_async(call):
+    if call.paged or call.stream:
+        pages = await AsyncPagedList.open(call.client, call.path, fields=call.fields, timeout=call.timeout)
+        return pages if call.stream else [row async for row in pages]
+    response = await call.client.get(call.path, timeout=call.timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response.json()
+
+
+async def async_fan_out(*calls):
+    """Versión asíncrona de fan_out, con la misma política de fallos
+
+    Las llamadas son corrutinas del event loop: ninguna ocupa un hilo
+    mientras espera la respuesta.
+    """
+    results = await asyncio.gather(
+        *(asyncio.wait_for(_fetch_async(call), call.timeout) for call in calls),
+        return_exceptions=True
+    )
+
+    data = {}
+    errors = {}
+    for call, result in zip(calls, results):
+        if isinstance(result, asyncio.TimeoutError):
+            errors[call.name] = "tiempo de espera agotado"
+            data[call.name] = call.default
+        elif isinstance(result, Exception):
+            errors[call.name] = str(result)
+            data[call.name] = call.default
+        else:
+            data[call.name] = result
+    return _result(calls, data, errors)
+
+
+def _result(calls, data, errors):
+    required_errors = {name: msg for name, msg in errors.items()
+                       if any(c.name == name and c.required for c in calls)}
+    if required_errors:
+        raise FanOutError(required_errors)
+    return FanOutResult(data, errors)
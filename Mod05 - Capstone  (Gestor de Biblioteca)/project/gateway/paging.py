@@ -0,0 +1,131 @@
+from email.utils import parsedate_to_datetime
+
+from shared.config import ServiceConfig
+
+# jsonify serializa los datetime como fechas HTTP ("Tue, 02 Jan 2024 ...");
+# las plantillas esperan datetime para poder usar strftime
+DATE_FIELDS = ("fecha_registro", "fecha_prestamo", "fecha_devolucion", "created_at")
+
+
+def decode_row(row):
+    """Convierte los campos de fecha de un registro JSON a datetime"""
+    for field in DATE_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            row[field] = parsedate_to_datetime(value).replace(tzinfo=None)
+    return row
+
+
+class _PagedListBase:
+    """Parámetros y lectura de cada página, comunes a PagedList y AsyncPagedList"""
+
+    def __init__(self, client, path, page_size=None, fields=None, timeout=None):
+        self._client = client
+        self._path = path
+        self._page_size = page_size or ServiceConfig.PAGE_SIZE_MAX
+        self._fields = fields
+        self._timeout = timeout
+        self._first_page = []
+        self._next_cursor = None
+        self.total = None
+        self.complete = True  # False si falló alguna página durante la iteración
+
+    def _request_kwargs(self, cursor, count):
+        params = {'limit': self._page_size}
+        if cursor:
+            params.update(cursor)
+        if not count:
+            params['count'] = 0
+        if self._fields:
+            params['fields'] = ','.join(self._fields)
+
+        kwargs = {'params': params}
+        if self._timeout is not None:
+            kwargs['timeout'] = self._timeout
+        return kwargs
+
+    def _parse_page(self, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        rows = [decode_row(row) for row in response.json()]
+        total = response.headers.get('X-Total-Count')
+        return rows, self._parse_cursor(response.headers), int(total) if total else None
+
+    @staticmethod
+    def _parse_cursor(headers):
+        """Parámetros de la página siguiente (None si es la última)
+
+        Los listados ordenados por fecha (préstamos) completan el cursor con
+        `X-Next-After-Date`, que se reenvía como `after_date`.
+        """
+        after_id = headers.get('X-Next-After-Id')
+        if not after_id:
+            return None
+        cursor = {'after_id': after_id}
+        after_date = headers.get('X-Next-After-Date')
+        if after_date:
+            cursor['after_date'] = after_date
+        return cursor
+
+
+class PagedList(_PagedListBase):
+    """Listado de un microservicio recorrido página a página (keyset)
+
+    La primera página se pide al crear el objeto, así los errores se detectan
+    antes de empezar a renderizar; las siguientes se piden al iterar, por lo
+    que nunca hay más de una página en memoria.
+    """
+
+    def __init__(self, client, path, page_size=None, fields=None, timeout=None):
+        super().__init__(client, path, page_size, fields, timeout)
+        self._first_page, self._next_cursor, self.total = self._fetch_page(None, count=True)
+
+    def _fetch_page(self, cursor, count):
+        response = self._client.get(self._path, **self._request_kwargs(cursor, count))
+        return self._parse_page(response)
+
+    def __iter__(self):
+        yield from self._first_page
+        cursor = self._next_cursor
+        while cursor:
+            try:
+                rows, cursor, _ = self._fetch_page(cursor, count=False)
+            except Exception as e:
+                # La respuesta ya se está enviando: no se puede avisar con flash
+                print(f"Error al obtener página de {self._path}: {e}")
+                self.complete = False
+                return
+            yield from rows
+
+
+class AsyncPagedList(_PagedListBase):
+    """PagedList para el gateway asíncrono (AsyncServiceClient)
+
+    Se crea con `await AsyncPagedList.open(...)` y se recorre con `async for`;
+    las plantillas de Quart lo iteran directamente en `{% for %}`.
+    """
+
+    @classmethod
+    async def open(cls, client, path, page_size=None, fields=None, timeout=None):
+        pages = cls(client, path, page_size, fields, timeout)
+        pages._first_page, pages._next_cursor, pages.total = await pages._fetch_page(None, count=True)
+        return pages
+
+    async def _fetch_page(self, cursor, count):
+        response = await self._client.get(self._path, **self._request_kwargs(cursor, count))
+        return self._parse_page(response)
+
+    async def __aiter__(self):
+        for row in self._first_page:
+            yield row
+        cursor = self._next_cursor
+        while cursor:
+            try:
+                rows, cursor, _ = await self._fetch_page(cursor, count=False)
+            except Exception as e:
+                print(f"Error al obtener página de {self._path}: {e}")
+                self.complete = False
+                return
+            for row in rows:
+                yield row
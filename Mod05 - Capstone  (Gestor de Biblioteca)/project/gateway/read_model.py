@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: waitress sirve el gateway en un solo proceso
+    fcntl = None
+
+from shared.config import ServiceConfig
+from shared.http_client import books_service, loans_service, members_service, request_token
+from shared.tokens import issue_token
+from gateway.paging import PagedList, decode_row
+
+# Identidad con la que el gateway se suscribe a los eventos
+GATEWAY_IDENTITY = {"id": 0, "nombre": "gateway", "rol": "servicio"}
+
+
+def read_sse(lines):
+    """Agrupa las líneas de un stream SSE en eventos (event, id, data)"""
+    event, event_id, data = None, None, []
+    for line in lines:
+        if not line:
+            if event is not None:
+                yield event, event_id, "\n".join(data)
+            event, event_id, data = None, None, []
+        elif line.startswith(":"):
+            continue  # keepalive
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "id":
+                event_id = int(value)
+            elif field == "data":
+                data.append(value)
+
+
+class ReadModel:
+    """Copia en memoria de un listado de un servicio, al día con sus eventos
+
+    Un hilo por modelo carga el listado completo al empezar (o si el servicio
+    pide `reset`) y después aplica los eventos de GET /events a medida que
+    llegan. Las filas se guardan por id en orden ascendente (los ids nuevos
+    siempre son mayores). `counters` son conteos que se mantienen con cada
+    cambio, p. ej. libros disponibles, para no recorrer las filas.
+
+    Mientras no esté sincronizado (`ready` es False) el gateway consulta al
+    servicio como siempre.
+    """
+
+    def __init__(self, name, client, path, entity, counters=None):
+        self.name = name
+        self.client = client
+        self.path = path
+        self.entity = entity
+        self._counter_rules = counters or {}
+        self._rows = {}
+        self._counters = dict.fromkeys(self._counter_rules, 0)
+        self._cond = threading.Condition()
+        self.ready = False
+        self.last_event_id = 0
+        self._events_applied = 0
+        self._reloads = 0
+        self._connected_at = None
+
+    # ---- lectura (peticiones del gateway) ----
+
+    def rows(self):
+        with self._cond:
+            return list(self._rows.values())
+
+    def get(self, row_id):
+        return self._rows.get(row_id)
+
+    def count(self):
+        return len(self._rows)
+
+    def counter(self, name):
+        return self._counters[name]
+
+    def wait_for(self, event_id, timeout):
+        """Espera hasta haber aplicado el evento `event_id` (o timeout); True si lo vio"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.ready or self.last_event_id >= event_id, timeout)
+
+    # ---- escritura (hilo del modelo) ----
+
+    def _count(self, row, sign):
+        for name, rule in self._counter_rules.items():
+            if rule(row):
+                self._counters[name] += sign
+
+    def _load(self, cursor):
+        pages = PagedList(self.client, self.path)
+        rows = {row["id"]: row for row in pages}
+        if not pages.complete:
+            # Falló una página: se conserva la copia anterior y run() reconecta,
+            # lo que provoca otro reset y otra carga completa
+            raise RuntimeError(f"carga incompleta de {self.path}")
+        counters = dict.fromkeys(self._counter_rules, 0)
+        for row in rows.values():
+            for name, rule in self._counter_rules.items():
+                counters[name] += bool(rule(row))
+        with self._cond:
+            self._rows = rows
+            self._counters = counters
+            self.last_event_id = cursor
+            self.ready = True
+            self._reloads += 1
+            self._cond.notify_all()
+
+    def _apply(self, event_id, payload):
+        change = json.loads(payload)
+        row_id = change["id"]
+        with self._cond:
+            old = self._rows.pop(row_id, None) if change["accion"] == "deleted" else self._rows.get(row_id)
+            if old is not None:
+                self._count(old, -1)
+            if change["accion"] != "deleted" and change["datos"] is not None:
+                row = decode_row(change["datos"])
+                if old is None and self._rows and row_id < next(reversed(self._rows)):
+                    # Alta fuera de orden (no debería pasar con AUTO_INCREMENT)
+                    self._rows[row_id] = row
+                    self._rows = dict(sorted(self._rows.items()))
+                else:
+                    self._rows[row_id] = row
+                self._count(row, 1)
+            self.last_event_id = event_id
+            self._events_applied += 1
+            self._cond.notify_all()
+
+    def _advance(self, event_id):
+        with self._cond:
+            self.last_event_id = event_id
+            self._cond.notify_all()
+
+    def _mark_stale(self):
+        with self._cond:
+            self.ready = False
+            self._connected_at = None
+            self._cond.notify_all()
+
+    def _consume(self):
+        token, _ = issue_token(GATEWAY_IDENTITY)
+        request_token.set(token)  # PagedList del hilo usa el mismo token
+        params = {"after_id": self.last_event_id} if self.ready else {}
+        response = self.client.session.get(
+            f"{self.client.base_url}/events", params=params, stream=True,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=(ServiceConfig.REQUEST_TIMEOUT, ServiceConfig.EVENTS_KEEPALIVE * 3)
+        )
+        with response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            self._connected_at = time.time()
+            for event, event_id, data in read_sse(response.iter_lines(decode_unicode=True)):
+                if event == "reset":
+                    self._load(event_id)
+                elif event == "cursor":
+                    self._advance(event_id)
+                elif event == self.entity:
+                    self._apply(event_id, data)
+
+    def run(self):
+        backoff = 1
+        while True:
+            try:
+                self._consume()
+                backoff = 1
+            except Exception as e:
+                print(f"Modelo de lectura {self.name}: {e}")
+            # Desconectado: hasta reconectar y ponerse al día se consulta al servicio
+            self._mark_stale()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "ready": self.ready,
+                "rows": len(self._rows),
+                "last_event_id": self.last_event_id,
+                "events_applied": self._events_applied,
+                "reloads": self._reloads,
+                "connected_since": self._connected_at,
+            }
+
+
+class ReadModels:
+    """Modelos de lectura de libros, miembros y préstamos de un proceso del gateway
+
+    Cada suscripción ocupa un hilo del servicio durante toda su vida, y cada
+    modelo guarda una copia completa de su tabla. Por eso solo un proceso del
+    gateway por host se suscribe: el que toma el lock READ_MODEL_LOCK_FILE.
+    Los demás consultan a los servicios como sin modelo de lectura, y
+    reintentan tomar el lock por si el proceso suscriptor termina.
+    """
+
+    def __init__(self):
+        self.books = ReadModel("libros", books_service, "/books", "libro",
+                               counters={"libros_disponibles": lambda row: row.get("disponible")})
+        self.members = ReadModel("miembros", members_service, "/members", "miembro")
+        self.loans = ReadModel("prestamos", loans_service, "/loans", "prestamo",
+                               counters={"prestamos_activos": lambda row: row.get("estado") == "Activo"})
+        self._all = (self.books, self.members, self.loans)
+        self._pid = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self.subscriber = False
+
+    def start(self):
+        """Arranca la suscripción una vez por proceso (con gunicorn, en cada worker)"""
+        if not ServiceConfig.READ_MODEL_ENABLED or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._subscribe, name="read-model", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _take_lock(self):
+        """True si este proceso es el suscriptor del host"""
+        if fcntl is None:
+            return True
+        lock_file = open(ServiceConfig.READ_MODEL_LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # El lock se libera cuando el proceso termina (y se cierra el archivo)
+        self._lock_file = lock_file
+        return True
+
+    def _subscribe(self):
+        while not self._take_lock():
+            time.sleep(ServiceConfig.READ_MODEL_LOCK_RETRY)
+        self.subscriber = True
+        for model in self._all:
+            threading.Thread(target=model.run, name=f"read-model-{model.name}", daemon=True).start()
+
+    def ready(self, *models):
+        return all(model.ready for model in (models or self._all))
+
+    def wait_for(self, response):
+        """Tras una escritura, espera a que los modelos incluyan su evento (X-Event-Id)
+
+        Así, al redirigir al listado, el usuario ya ve su propio cambio.
+        """
+        event_id = response.headers.get('X-Event-Id')
+        if not event_id:
+            return
+        deadline = time.monotonic() + ServiceConfig.READ_MODEL_WAIT
+        for model in self._all:
+            if model.ready:
+                model.wait_for(int(event_id), max(0, deadline - time.monotonic()))
+
+    def dashboard_stats(self):
+        return {
+            'total_libros': self.books.count(),
+            'libros_disponibles': self.books.counter('libros_disponibles'),
+            'total_miembros': self.members.count(),
+            'prestamos_activos': self.loans.counter('prestamos_activos')
+        }
+
+    def loans_detailed(self):
+        """Equivalente a GET /loans/detailed: préstamos con título y miembro, más recientes primero"""
+        loans = []
+        for loan in self.loans.rows():
+            book = self.books.get(loan["libro_id"]) or {}
+            member = self.members.get(loan["miembro_id"]) or {}
+            loans.append(dict(loan, libro_titulo=book.get("titulo"),
+                              miembro_nombre=member.get("nombre"),
+                              miembro_apellido=member.get("apellido")))
+        loans.sort(key=lambda loan: (loan["fecha_prestamo"], loan["id"]), reverse=True)
+        return loans
+
+    def stats(self):
+        return {"subscriber": self.subscriber, **{model.name: model.stats() for model in self._all}}
+
+
+# Una instancia por proceso del gateway (síncrono o asíncrono)
+read_models = ReadModels()
@@ -0,0 +1,10 @@
+"""
+Pruebas de carga de la arquitectura completa (gateway + microservicios)
+
+- dataset.py: genera N libros, miembros, préstamos y usuarios de prueba
+- scenarios.py: usuarios virtuales que ejecutan una mezcla de escenarios
+  (login, dashboard, listados, ciclo de préstamo y devolución)
+- report.py: latencias p50/p95/p99 y req/s por ruta, y comparación entre corridas
+
+Se ejecuta con `python -m loadtest` (ver README.md, "Pruebas de carga").
+"""
@@ -0,0 +1,232 @@
+"""
+Pruebas de carga reproducibles
+
+Uso:
+    python -m loadtest seed --books 10000 --members 2000 --loans 3000
+    python -m loadtest run --start --concurrency 50 --duration 60 --output base.json
+    python -m loadtest run --start --compare base.json      # falla si hay regresiones
+    python -m loadtest compare base.json loadtest/results/20240102-100000.json
+
+Por defecto usa SQLite (loadtest/data/biblioteca.db), así que no necesita
+un servidor MySQL; con --backend mysql usa la base de shared/config.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import requests
+
+from benchmark_gateway import launch, stop, wait_ready
+from shared.config import DatabaseConfig, ServiceConfig
+from start_services import PROJECT_DIR
+from loadtest import report
+from loadtest.scenarios import DEFAULT_MIX, parse_mix, run_load
+
+# Descripción del último conjunto de datos generado (la usa `run`)
+DATASET_INFO = os.path.join(PROJECT_DIR, "loadtest", "data", "dataset.json")
+
+# Durante la prueba los límites de login no deben frenar a los usuarios virtuales
+# (todos vienen de la misma IP y repiten usuario)
+UNLIMITED_LOGIN_ENV = {
+    "LOGIN_USER_BURST": "1000000", "LOGIN_USER_RATE": "1000000",
+    "LOGIN_IP_BURST": "1000000", "LOGIN_IP_RATE": "1000000",
+}
+STACK_READY_TIMEOUT = 90
+
+
+def use_backend(backend, sqlite_path):
+    DatabaseConfig.BACKEND = backend
+    if sqlite_path:
+        DatabaseConfig.SQLITE_PATH = os.path.abspath(sqlite_path)
+
+
+def seed(args):
+    from loadtest.dataset import generate
+
+    use_backend(args.backend, args.sqlite_path)
+    if args.backend == "sqlite":
+        # Siempre una base nueva: mismos parámetros, mismos datos
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(DatabaseConfig.SQLITE_PATH + suffix):
+                os.remove(DatabaseConfig.SQLITE_PATH + suffix)
+
+    print(f"Generando datos en {DatabaseConfig.SQLITE_PATH if args.backend == 'sqlite' else args.backend}...")
+    started = time.monotonic()
+    info = generate(args.books, args.members, args.loans, users=args.users,
+                    returned=args.returned, seed=args.seed)
+    os.makedirs(os.path.dirname(DATASET_INFO), exist_ok=True)
+    with open(DATASET_INFO, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    print(json.dumps(info, indent=2))
+    print(f"Listo en {time.monotonic() - started:.1f} s")
+
+
+def start_stack(args):
+    """Inicia start_services.py con la base de la prueba; devuelve el proceso"""
+    try:
+        requests.get(f"http://127.0.0.1:{ServiceConfig.GATEWAY_PORT}/health", timeout=1)
+        raise RuntimeError(f"Ya hay un servicio en el puerto {ServiceConfig.GATEWAY_PORT}; "
+                           "detenlo o usa `run` sin --start")
+    except requests.RequestException:
+        pass
+
+    env = dict(os.environ, DB_BACKEND=args.backend, **UNLIMITED_LOGIN_ENV)
+    if args.sqlite_path:
+        env["DB_SQLITE_PATH"] = os.path.abspath(args.sqlite_path)
+    command = [sys.executable, "start_services.py"]
+    if args.production:
+        command.append("--production")
+    if args.async_gateway:
+        command.append("--async-gateway")
+
+    process = launch(command, env)
+    try:
+        for port in (5001, 5002, 5003, 5004, ServiceConfig.GATEWAY_PORT):
+            wait_ready(port, timeout=STACK_READY_TIMEOUT)
+    except RuntimeError:
+        stop(process)
+        raise
+    return process
+
+
+def check(baseline_path, result, threshold):
+    """Compara con la corrida base; devuelve 1 si hubo regresiones"""
+    baseline = report.load(baseline_path)
+    for key in ("concurrency", "mix", "dataset", "server", "gateway"):
+        if baseline["meta"].get(key) != result["meta"].get(key):
+            print(f"⚠️  La corrida base tiene otro valor de '{key}'; la comparación puede no ser válida")
+    rows, regressions = report.compare(baseline, result, threshold)
+    print()
+    print(f"Comparación con {baseline_path} (commit {baseline['meta'].get('commit')}), "
+          f"umbral {threshold:.0f} %:")
+    report.print_comparison(rows)
+    print()
+    if regressions:
+        print("❌ Regresiones:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+    print("✅ Sin regresiones")
+    return 0
+
+
+def run(args):
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    dataset = None
+    if os.path.exists(DATASET_INFO):
+        with open(DATASET_INFO, encoding="utf-8") as f:
+            dataset = json.load(f)
+    users = args.users or (dataset or {}).get("users", 20)
+    urls = {
+        "gateway": args.gateway_url,
+        "auth": ServiceConfig.AUTH_SERVICE_URL,
+        "books": ServiceConfig.BOOKS_SERVICE_URL,
+        "members": ServiceConfig.MEMBERS_SERVICE_URL,
+        "loans": ServiceConfig.LOANS_SERVICE_URL,
+    }
+
+    process = start_stack(args) if args.start else None
+    try:
+        print(f"{args.concurrency} usuarios virtuales, {args.duration:.0f} s "
+              f"(+{args.warmup:.0f} s de calentamiento), mezcla {mix}")
+        started_at = datetime.now().isoformat(timespec="seconds")
+        samples = asyncio.run(run_load(urls, users, args.concurrency, args.duration,
+                                       warmup=args.warmup, mix=mix, seed=args.seed, think=args.think))
+    finally:
+        if process:
+            stop(process)
+
+    all_samples = [sample for route_samples in samples.values() for sample in route_samples]
+    result = {
+        "meta": {
+            "started_at": started_at,
+            "commit": report.git_commit(),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "think": args.think,
+            "mix": mix,
+            "seed": args.seed,
+            "server": "production" if args.production else "development",
+            "gateway": "async" if args.async_gateway else "sync",
+            "dataset": dataset,
+            "urls": urls,
+        },
+        "routes": report.summarize(samples, args.duration),
+        "total": report.summarize({"total": all_samples}, args.duration)["total"],
+    }
+
+    print()
+    report.print_routes({**result["routes"], "(total)": result["total"]})
+    path = report.save(result, args.output)
+    print()
+    print(f"Resultados en {path}")
+    if args.compare:
+        return check(args.compare, result, args.threshold)
+    return 0
+
+
+def compare(args):
+    return check(args.baseline, report.load(args.current), args.threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Pruebas de carga de la biblioteca")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def database_options(command):
+        command.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite",
+                             help="Base de datos (sqlite no necesita servidor)")
+        command.add_argument("--sqlite-path", help=f"Archivo SQLite (por defecto {DatabaseConfig.SQLITE_PATH})")
+
+    seed_parser = commands.add_parser("seed", help="Genera el conjunto de datos")
+    database_options(seed_parser)
+    seed_parser.add_argument("--books", type=int, default=5000)
+    seed_parser.add_argument("--members", type=int, default=1000)
+    seed_parser.add_argument("--loans", type=int, default=2000)
+    seed_parser.add_argument("--returned", type=float, default=0.6, help="Fracción de préstamos ya devueltos")
+    seed_parser.add_argument("--users", type=int, default=20, help="Usuarios de login (carga001...)")
+    seed_parser.add_argument("--seed", type=int, default=1)
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser("run", help="Ejecuta la prueba de carga")
+    database_options(run_parser)
+    run_parser.add_argument("--start", action="store_true",
+                            help="Inicia los servicios con start_services.py (y los detiene al final)")
+    run_parser.add_argument("--production", action="store_true", help="Con --start: servidor WSGI de producción")
+    run_parser.add_argument("--async-gateway", action="store_true", help="Con --start: gateway asíncrono")
+    run_parser.add_argument("--gateway-url", default=f"http://127.0.0.1:{ServiceConfig.GATEWAY_PORT}")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="Usuarios virtuales")
+    run_parser.add_argument("--duration", type=float, default=30, help="Segundos de medición")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Segundos de calentamiento (no se miden)")
+    run_parser.add_argument("--mix", help=f"Pesos de los escenarios, p. ej. dashboard=4,churn=1 "
+                                          f"(disponibles: {', '.join(DEFAULT_MIX)})")
+    run_parser.add_argument("--think", type=float, default=0, help="Pausa media entre escenarios (s)")
+    run_parser.add_argument("--users", type=int, help="Usuarios de login generados (por defecto, los de seed)")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="Archivo JSON de resultados (por defecto loadtest/results/<fecha>.json)")
+    run_parser.add_argument("--compare", metavar="BASE.json", help="Compara con una corrida anterior")
+    run_parser.add_argument("--threshold", type=float, default=10, help="Umbral de regresión en %%")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compara dos corridas")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="Umbral de regresión en %%")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(args.handler(args))
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import random
+
+from werkzeug.security import generate_password_hash
+
+from shared.config import DatabaseConfig, ServiceConfig
+from shared.database import DatabaseLayer
+
+# Usuarios que crea el generador (todos con la misma contraseña)
+LOAD_USER_PREFIX = "carga"
+LOAD_USER_PASSWORD = "carga123"
+
+_TITLE_WORDS = ("Historia", "Sombra", "Mar", "Ciudad", "Jardín", "Noche", "Camino", "Tiempo",
+                "Memoria", "Río", "Fuego", "Silencio", "Viaje", "Isla", "Luz", "Invierno")
+_NAMES = ("María", "José", "Ana", "Luis", "Carmen", "Pedro", "Lucía", "Jorge", "Elena", "Carlos",
+          "Sofía", "Miguel", "Laura", "Andrés", "Isabel", "Rafael")
+_SURNAMES = ("González", "Rodríguez", "Pérez", "Martínez", "Rivera", "Torres", "Ramos", "Vega",
+             "Cruz", "Ortiz", "Morales", "Santiago", "Díaz", "Colón", "Reyes", "Flores")
+_CATEGORIES = ("Ficción", "Clásico", "Distopía", "Ciencia", "Historia", "Poesía", "Ensayo", "Infantil")
+
+
+def user_name(index):
+    return f"{LOAD_USER_PREFIX}{index:03d}"
+
+
+def _books(count, rng):
+    for i in range(count):
+        title = f"{rng.choice(_TITLE_WORDS)} de la {rng.choice(_TITLE_WORDS).lower()} {i + 1}"
+        author = f"{rng.choice(_NAMES)} {rng.choice(_SURNAMES)}"
+        yield (title, author, f"978-{i + 1:010d}", rng.randint(1600, 2024), rng.choice(_CATEGORIES))
+
+
+def _members(count, rng):
+    for i in range(count):
+        yield (rng.choice(_NAMES), rng.choice(_SURNAMES), f"miembro{i + 1}@carga.test",
+               f"787-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}")
+
+
+def _insert_in_batches(insert, rows):
+    rows = list(rows)
+    inserted = 0
+    for start in range(0, len(rows), ServiceConfig.BULK_BATCH_SIZE):
+        count, errors = insert(rows[start:start + ServiceConfig.BULK_BATCH_SIZE])
+        if errors:
+            raise RuntimeError(f"No se pudo insertar el lote: {errors[0][1]}")
+        inserted += count
+    return inserted
+
+
+def generate(books, members, loans, users=20, returned=0.6, seed=1):
+    """Llena la base con un conjunto de datos reproducible (misma semilla, mismos datos)
+
+    Crea `books` libros, `members` miembros, `loans` préstamos (cada uno de
+    un libro distinto; una fracción `returned` ya devueltos) y `users`
+    bibliotecarios para el login de las pruebas. Usa DatabaseLayer, así que
+    escribe en el motor configurado (MySQL o SQLite) y registra los eventos
+    como la API.
+    """
+    if loans > books:
+        raise ValueError("No puede haber más préstamos que libros (cada préstamo activo ocupa uno)")
+    if DatabaseLayer.get_book_stats() is None:
+        raise RuntimeError("No se pudo conectar a la base de datos")
+    if DatabaseLayer.get_user_by_username(user_name(1)):
+        raise RuntimeError("La base de datos ya tiene los datos de carga; usa una base nueva")
+
+    rng = random.Random(seed)
+
+    # Los hashes son lentos a propósito: se calcula uno y se reutiliza
+    password_hash = generate_password_hash(LOAD_USER_PASSWORD, method=ServiceConfig.PASSWORD_HASH_METHOD)
+    for i in range(1, users + 1):
+        DatabaseLayer.create_user(user_name(i), password_hash, f"Usuario de carga {i}", "bibliotecario")
+
+    book_count = _insert_in_batches(DatabaseLayer.create_books_batch, _books(books, rng))
+    member_count = _insert_in_batches(DatabaseLayer.create_members_batch, _members(members, rng))
+
+    # Con MySQL los ids no empiezan necesariamente en 1 (y puede haber datos de ejemplo)
+    book_ids = [row["id"] for row in DatabaseLayer.get_all_books(fields=["disponible"]) if row["disponible"]]
+    member_ids = [row["id"] for row in DatabaseLayer.get_all_members(fields=["id"])]
+    returned_count = 0
+    for book_id in rng.sample(book_ids, loans):
+        loan_id, error = DatabaseLayer.create_loan(book_id, rng.choice(member_ids))
+        if error:
+            raise RuntimeError(f"No se pudo crear el préstamo del libro {book_id}: {error}")
+        if rng.random() < returned:
+            DatabaseLayer.return_loan(loan_id)
+            returned_count += 1
+
+    return {
+        "backend": DatabaseConfig.BACKEND,
+        "seed": seed,
+        "books": book_count,
+        "members": member_count,
+        "loans": loans,
+        "returned_loans": returned_count,
+        "users": users,
+    }
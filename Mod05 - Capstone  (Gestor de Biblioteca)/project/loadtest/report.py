@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+from datetime import datetime
+
+from start_services import PROJECT_DIR
+
+RESULTS_DIR = os.path.join(PROJECT_DIR, "loadtest", "results")
+
+# Diferencias por debajo de esto se consideran ruido aunque superen el umbral relativo
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_ERROR_RATE_DELTA = 0.01
+
+
+def percentile(latencies, p):
+    """Percentil `p` (0-1) de una lista ordenada de latencias en segundos, en milisegundos"""
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+
+def summarize(samples, elapsed):
+    """Métricas por ruta a partir de {ruta: [(latencia, ok), ...]} medidas en `elapsed` segundos"""
+    routes = {}
+    for route, route_samples in sorted(samples.items()):
+        latencies = sorted(latency for latency, ok in route_samples if ok)
+        errors = len(route_samples) - len(latencies)
+        routes[route] = {
+            "requests": len(route_samples),
+            "errors": errors,
+            "error_rate": errors / len(route_samples) if route_samples else 0.0,
+            "rps": len(latencies) / elapsed if elapsed else 0.0,
+            "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        }
+    return routes
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save(result, path=None):
+    """Guarda el resultado en JSON (por defecto loadtest/results/<fecha>.json); devuelve la ruta"""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_routes(routes):
+    print(f"{'ruta':<34}{'peticiones':>11}{'errores':>9}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, m in routes.items():
+        print(f"{route:<34}{m['requests']:>11}{m['errors']:>9}{m['rps']:>9.1f}"
+              f"{m['p50']:>9.1f}{m['p95']:>9.1f}{m['p99']:>9.1f}")
+
+
+def _change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(baseline, current, threshold=10.0):
+    """Compara dos resultados ruta por ruta
+
+    Es una regresión que en una ruta el p95 o el p99 suba más de `threshold`
+    por ciento (y más de MIN_LATENCY_DELTA_MS), que las req/s bajen más de
+    `threshold` por ciento o que la tasa de errores suba. Devuelve
+    (filas para imprimir, lista de regresiones).
+    """
+    rows = []
+    regressions = []
+    for route in sorted(set(baseline["routes"]) | set(current["routes"])):
+        before = baseline["routes"].get(route)
+        after = current["routes"].get(route)
+        if before is None or after is None:
+            rows.append((route, before, after, {}))
+            continue
+
+        changes = {metric: _change(before[metric], after[metric]) for metric in ("rps", "p50", "p95", "p99")}
+        rows.append((route, before, after, changes))
+        for metric in ("p95", "p99"):
+            if (changes[metric] > threshold
+                    and after[metric] - before[metric] > MIN_LATENCY_DELTA_MS):
+                regressions.append(f"{route}: {metric} {before[metric]:.1f} -> {after[metric]:.1f} ms "
+                                   f"(+{changes[metric]:.0f} %)")
+        if changes["rps"] < -threshold:
+            regressions.append(f"{route}: req/s {before['rps']:.1f} -> {after['rps']:.1f} "
+                               f"({changes['rps']:.0f} %)")
+        if after["error_rate"] - before["error_rate"] > MIN_ERROR_RATE_DELTA:
+            regressions.append(f"{route}: errores {before['error_rate']:.1%} -> {after['error_rate']:.1%}")
+    return rows, regressions
+
+
+def print_comparison(rows):
+    titles = ("req/s", "p50 ms", "p95 ms", "p99 ms")
+    print(f"{'ruta':<34}" + "".join(f"{title + ' (base / actual)':>27}" for title in titles))
+    for route, before, after, changes in rows:
+        if not changes:
+            print(f"{route:<34}  {'solo en la base' if after is None else 'nueva ruta'}")
+            continue
+        cells = "".join(f"{before[m]:>11.1f}{after[m]:>8.1f}{changes[m]:>+6.0f} %"
+                        for m in ("rps", "p50", "p95", "p99"))
+        print(f"{route:<34}{cells}")
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+from loadtest.dataset import LOAD_USER_PASSWORD, user_name
+
+# Peso de cada escenario en la mezcla por defecto
+DEFAULT_MIX = {"login": 1, "dashboard": 4, "books": 2, "members": 2, "loans": 2, "churn": 2}
+
+# Intentos de login durante la preparación (auth puede responder 429/503)
+SETUP_LOGIN_ATTEMPTS = 20
+SETUP_LOGIN_CONCURRENCY = 4
+REQUEST_TIMEOUT = 30
+TOKEN_RENEW_BEFORE = 60
+
+
+def parse_mix(text):
+    """"dashboard=4,churn=1" -> {"dashboard": 4, "churn": 1}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Escenario desconocido: {name} (disponibles: {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+class Recorder:
+    """Latencias por ruta de las peticiones que empiezan dentro de la ventana de medición"""
+
+    def __init__(self):
+        self.window_start = self.window_end = float("inf")
+        self.samples = {}
+
+    def start(self, warmup, duration):
+        self.window_start = time.monotonic() + warmup
+        self.window_end = self.window_start + duration
+
+    def record(self, route, started, latency, ok):
+        if self.window_start <= started < self.window_end:
+            self.samples.setdefault(route, []).append((latency, ok))
+
+
+async def _retry_after(response, attempt):
+    delay = response.headers.get("Retry-After") if response is not None else None
+    await asyncio.sleep(float(delay) if delay else min(2 ** attempt * 0.1, 5))
+
+
+async def api_login(session, auth_url, username):
+    """Token de auth para llamar a los servicios directamente; devuelve (token, expira en s)"""
+    for attempt in range(SETUP_LOGIN_ATTEMPTS):
+        async with session.post(f"{auth_url}/auth/login",
+                                json={"username": username, "password": LOAD_USER_PASSWORD}) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data["token"], data["expires_in"]
+            if response.status not in (429, 503):
+                raise RuntimeError(f"Login de {username} en auth: HTTP {response.status}")
+            await _retry_after(response, attempt)
+    raise RuntimeError(f"Login de {username} en auth: demasiados reintentos")
+
+
+async def list_ids(session, url, token, keep=None, fields="id"):
+    """Ids de un listado recorriendo sus páginas (keyset)"""
+    ids = []
+    after_id = None
+    while True:
+        params = {"limit": 1000, "count": 0, "fields": fields}
+        if after_id:
+            params["after_id"] = after_id
+        async with session.get(url, params=params, headers={"Authorization": f"Bearer {token}"}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"GET {url}: HTTP {response.status}")
+            rows = await response.json()
+            after_id = response.headers.get("X-Next-After-Id")
+        ids.extend(row["id"] for row in rows if keep is None or keep(row))
+        if not after_id:
+            return ids
+
+
+class VirtualUser:
+    """Un usuario que ejecuta escenarios de la mezcla sin pausa (o con `think` segundos de media)
+
+    Navega por el gateway con su propia cookie de sesión. El ciclo de
+    préstamo y devolución va directo al servicio de préstamos con un token,
+    porque necesita el id del préstamo creado (el gateway solo redirige);
+    usa libros propios para no competir con los demás usuarios por el mismo.
+    """
+
+    def __init__(self, index, urls, connector, recorder, mix, rng, books, members, think=0):
+        self.username = user_name(index)
+        self.urls = urls
+        self.recorder = recorder
+        self.rng = rng
+        self.scenarios = list(mix)
+        self.weights = list(mix.values())
+        self.books = books
+        self.members = members
+        self.think = think
+        self._next_book = 0
+        self._token = None
+        self._token_expires = 0
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        # unsafe=True: acepta la cookie de sesión aunque el host sea una IP
+        self.gateway = aiohttp.ClientSession(urls["gateway"], connector=connector, connector_owner=False,
+                                             cookie_jar=aiohttp.CookieJar(unsafe=True), timeout=timeout)
+        self.api = aiohttp.ClientSession(connector=connector, connector_owner=False, timeout=timeout)
+
+    async def close(self):
+        await self.gateway.close()
+        await self.api.close()
+
+    async def setup(self):
+        """Inicia sesión en el gateway y obtiene un token (no se mide)"""
+        for attempt in range(SETUP_LOGIN_ATTEMPTS):
+            async with self.gateway.post("/login", allow_redirects=False,
+                                         data={"username": self.username,
+                                               "password": LOAD_USER_PASSWORD}) as response:
+                if response.status == 302:
+                    break
+            await _retry_after(None, attempt)
+        else:
+            raise RuntimeError(f"Login de {self.username} en el gateway: demasiados reintentos")
+        await self._renew_token()
+
+    async def _renew_token(self):
+        self._token, expires_in = await api_login(self.api, self.urls["auth"], self.username)
+        self._token_expires = time.monotonic() + expires_in
+
+    async def _call(self, route, session, method, url, expected, **kwargs):
+        started = time.monotonic()
+        body = None
+        try:
+            async with session.request(method, url, allow_redirects=False, **kwargs) as response:
+                body = await response.read()
+                ok = response.status == expected
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        self.recorder.record(route, started, time.monotonic() - started, ok)
+        return ok, body
+
+    # ---- escenarios ----
+
+    async def login(self):
+        await self._call("POST /login", self.gateway, "POST", "/login", 302,
+                         data={"username": self.username, "password": LOAD_USER_PASSWORD})
+
+    async def dashboard(self):
+        await self._call("GET /dashboard", self.gateway, "GET", "/dashboard", 200)
+
+    async def list_books(self):
+        await self._call("GET /books", self.gateway, "GET", "/books", 200)
+
+    async def list_members(self):
+        await self._call("GET /members", self.gateway, "GET", "/members", 200)
+
+    async def list_loans(self):
+        await self._call("GET /loans", self.gateway, "GET", "/loans", 200)
+
+    async def churn(self):
+        """Presta uno de sus libros a un miembro al azar y lo devuelve"""
+        if not self.books:
+            return
+        if time.monotonic() > self._token_expires - TOKEN_RENEW_BEFORE:
+            await self._renew_token()
+        book_id = self.books[self._next_book % len(self.books)]
+        self._next_book += 1
+        headers = {"Authorization": f"Bearer {self._token}"}
+        loans_url = self.urls["loans"]
+
+        ok, body = await self._call("loans: POST /loans", self.api, "POST", f"{loans_url}/loans", 201,
+                                    json={"libro_id": book_id, "miembro_id": self.rng.choice(self.members)},
+                                    headers=headers)
+        if ok:
+            loan_id = json.loads(body)["id"]
+            await self._call("loans: PUT /loans/<id>/return", self.api, "PUT",
+                             f"{loans_url}/loans/{loan_id}/return", 200, headers=headers)
+
+    async def run(self, until):
+        while time.monotonic() < until:
+            scenario = self.rng.choices(self.scenarios, self.weights)[0]
+            await SCENARIOS[scenario](self)
+            if self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+
+
+SCENARIOS = {
+    "login": VirtualUser.login,
+    "dashboard": VirtualUser.dashboard,
+    "books": VirtualUser.list_books,
+    "members": VirtualUser.list_members,
+    "loans": VirtualUser.list_loans,
+    "churn": VirtualUser.churn,
+}
+
+
+async def run_load(urls, users, concurrency, duration, warmup=5, mix=None, seed=1, think=0):
+    """Ejecuta la mezcla de escenarios con `concurrency` usuarios virtuales
+
+    Los usuarios inician sesión con las cuentas del generador (hay `users`;
+    si hay más usuarios virtuales se reparten). Se mide durante `duration`
+    segundos después de `warmup` segundos de calentamiento. Devuelve
+    {ruta: [(latencia, ok), ...]}.
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    recorder = Recorder()
+    # Los usuarios virtuales son el límite de concurrencia
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector, connector_owner=False) as session:
+            token, _ = await api_login(session, urls["auth"], user_name(1))
+            books = await list_ids(session, f"{urls['books']}/books", token,
+                                   keep=lambda row: row["disponible"], fields="disponible")
+            members = await list_ids(session, f"{urls['members']}/members", token)
+        if not members:
+            raise RuntimeError("No hay miembros: genera los datos con `python -m loadtest seed`")
+        if "churn" in mix and len(books) < concurrency:
+            raise RuntimeError(f"El ciclo de préstamos necesita al menos {concurrency} libros disponibles "
+                               f"(uno por usuario virtual); hay {len(books)}")
+
+        # Cada usuario virtual recibe libros disponibles distintos para el ciclo de préstamos
+        rng.shuffle(books)
+        virtual_users = [
+            VirtualUser(i % users + 1, urls, connector, recorder, mix, random.Random(seed * 1000 + i),
+                        books[i::concurrency], members, think)
+            for i in range(concurrency)
+        ]
+        try:
+            semaphore = asyncio.Semaphore(SETUP_LOGIN_CONCURRENCY)
+
+            async def setup(user):
+                async with semaphore:
+                    await user.setup()
+
+            await asyncio.gather(*(setup(user) for user in virtual_users))
+
+            recorder.start(warmup, duration)
+            await asyncio.gather(*(user.run(recorder.window_end) for user in virtual_users))
+        finally:
+            await asyncio.gather(*(user.close() for user in virtual_users))
+    finally:
+        await connector.close()
+    return recorder.samples
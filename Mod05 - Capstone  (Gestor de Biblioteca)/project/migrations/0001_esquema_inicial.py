@@ -0,0 +1,65 @@
+"""Tablas de la biblioteca tal como las crea biblioteca_db.sql (sin índices de consulta)"""
+
+TABLES = {
+    "usuarios": """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(500) NOT NULL,
+            nombre VARCHAR(100) NOT NULL,
+            rol ENUM('admin', 'bibliotecario') NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    "libros": """
+        CREATE TABLE IF NOT EXISTS libros (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            titulo VARCHAR(200) NOT NULL,
+            autor VARCHAR(150) NOT NULL,
+            isbn VARCHAR(20) UNIQUE NOT NULL,
+            año_publicacion INT NOT NULL,
+            categoria VARCHAR(100) NOT NULL,
+            disponible BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    "miembros": """
+        CREATE TABLE IF NOT EXISTS miembros (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            apellido VARCHAR(100) NOT NULL,
+            correo VARCHAR(150) UNIQUE NOT NULL,
+            telefono VARCHAR(20) NOT NULL,
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    "prestamos": """
+        CREATE TABLE IF NOT EXISTS prestamos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            libro_id INT NOT NULL,
+            miembro_id INT NOT NULL,
+            fecha_prestamo TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_devolucion TIMESTAMP NULL,
+            estado ENUM('Activo', 'Devuelto') DEFAULT 'Activo',
+            FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE,
+            FOREIGN KEY (miembro_id) REFERENCES miembros(id) ON DELETE CASCADE
+        )""",
+    "eventos": """
+        CREATE TABLE IF NOT EXISTS eventos (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            entidad ENUM('libro', 'miembro', 'prestamo') NOT NULL,
+            accion ENUM('created', 'updated', 'deleted') NOT NULL,
+            entidad_id INT NOT NULL,
+            datos JSON NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_eventos_created_at (created_at)
+        )""",
+}
+
+
+def up(m):
+    # IF NOT EXISTS: en una base creada con biblioteca_db.sql solo se registra la versión
+    for ddl in TABLES.values():
+        m.execute(ddl)
+
+
+def down(m):
+    for table in reversed(TABLES):
+        m.execute(f"DROP TABLE IF EXISTS `{table}`")
@@ -0,0 +1,32 @@
+"""Índices de las consultas frecuentes de DatabaseLayer"""
+
+# (tabla, nombre, columnas, opciones); si ya hay un índice equivalente no se crea otro
+INDEXES = (
+    # get_user_by_username (login). biblioteca_db.sql ya lo crea con el UNIQUE de la columna
+    ("usuarios", "uq_usuarios_username", ("username",), {"unique": True}),
+    # get_all_loans / get_all_loans_detailed: ORDER BY fecha_prestamo DESC, id DESC
+    # (InnoDB agrega el id a cada índice secundario, así que cubre el desempate)
+    ("prestamos", "idx_prestamos_fecha", ("fecha_prestamo",), {}),
+    # Préstamos de un libro (checkout, delete_book); reemplaza al índice de la FK libro_id
+    ("prestamos", "idx_prestamos_libro_estado", ("libro_id", "estado"), {}),
+    # Préstamos de un miembro (delete_member); equivale al índice de la FK miembro_id
+    ("prestamos", "idx_prestamos_miembro", ("miembro_id",), {}),
+    # GET /books/search
+    ("libros", "idx_libros_titulo", ("titulo",), {}),
+    ("libros", "idx_libros_autor", ("autor",), {}),
+    ("libros", "idx_libros_categoria", ("categoria", "disponible"), {}),
+    ("libros", "ft_libros_titulo_autor", ("titulo", "autor"), {"fulltext": True}),
+)
+
+
+def up(m):
+    for table, name, columns, options in INDEXES:
+        m.create_index(table, name, columns, **options)
+
+
+def down(m):
+    # La FK libro_id necesita un índice que empiece por esa columna: se restituye
+    # el que MySQL crea con la tabla antes de borrar el compuesto
+    m.create_index("prestamos", "libro_id", ("libro_id",))
+    for table, name, columns, options in reversed(INDEXES):
+        m.drop_index(table, name)
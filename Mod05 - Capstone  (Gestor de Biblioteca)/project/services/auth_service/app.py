@@ -1,44 +1,102 @@
-from flask import Flask, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import Flask, request, jsonify, g
+import math
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from shared.database import DatabaseLayer
+from shared.config import DatabaseConfig, ServiceConfig
+from shared.passwords import HashPoolBusy, password_hasher
+from shared.ratelimit import TokenBucketLimiter
+from shared.tokens import issue_token, protect, role_required
+from shared.tracing import instrument
 
 app = Flask(__name__)
+instrument(app, 'auth')
+protect(app, public=('login', 'health', 'metrics'))
+
+# Intentos de login por nombre de usuario y por IP de origen
+user_limiter = TokenBucketLimiter(ServiceConfig.LOGIN_USER_RATE, ServiceConfig.LOGIN_USER_BURST)
+ip_limiter = TokenBucketLimiter(ServiceConfig.LOGIN_IP_RATE, ServiceConfig.LOGIN_IP_BURST)
+
+def client_ip():
+    """IP del cliente; detrás del gateway es la que este envía en X-Forwarded-For"""
+    forwarded = request.headers.get('X-Forwarded-For')
+    if forwarded and request.remote_addr in ServiceConfig.TRUSTED_PROXIES:
+        return forwarded.split(',')[-1].strip()
+    return request.remote_addr
+
+def retry_later(message, seconds, status):
+    return jsonify({"success": False, "message": message}), status, {"Retry-After": str(math.ceil(seconds))}
+
+def user_response(user):
+    """Datos públicos del usuario y un token nuevo para él"""
+    token, expires_in = issue_token(user)
+    return {
+        "success": True,
+        "token": token,
+        "expires_in": expires_in,
+        "user": {
+            "id": user['id'],
+            "username": user['username'],
+            "nombre": user['nombre'],
+            "rol": user['rol']
+        }
+    }
 
 @app.route('/auth/login', methods=['POST'])
 def login():
     data = request.json
-    username = data.get('username')
-    password = data.get('password')
+    username = data.get('username') or ''
+    password = data.get('password') or ''
+    
+    # Los límites se comprueban antes de consultar la base de datos o calcular el hash
+    for limiter, key in ((ip_limiter, client_ip()), (user_limiter, username.lower())):
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            return retry_later("Demasiados intentos, espera antes de volver a intentar", retry_after, 429)
     
     user = DatabaseLayer.get_user_by_username(username)
     
-    if user and check_password_hash(user['password'], password):
-        return jsonify({
-            "success": True,
-            "user": {
-                "id": user['id'],
-                "username": user['username'],
-                "nombre": user['nombre'],
-                "rol": user['rol']
-            }
-        }), 200
+    try:
+        if user:
+            valid, new_hash = password_hasher.verify(user['password'], password)
+        else:
+            valid, new_hash = password_hasher.verify_unknown_user(password)
+    except HashPoolBusy as e:
+        return retry_later("Servicio de autenticación ocupado", e.retry_after, 503)
+    
+    if valid:
+        if new_hash:
+            # Los parámetros del hash cambiaron: se guarda con los actuales
+            DatabaseLayer.update_user_password(user['id'], new_hash)
+        return jsonify(user_response(user)), 200
     else:
         return jsonify({"success": False, "message": "Credenciales incorrectas"}), 401
 
+@app.route('/auth/refresh', methods=['POST'])
+def refresh():
+    # Se vuelve a leer el usuario para no renovar si se eliminó o cambió de rol
+    user = DatabaseLayer.get_user_by_id(g.user['id'])
+    if not user:
+        return jsonify({"success": False, "message": "Usuario no encontrado"}), 401
+    return jsonify(user_response(user)), 200
+
 @app.route('/auth/users', methods=['GET'])
+@role_required('admin')
 def get_users():
     users = DatabaseLayer.get_all_users()
     return jsonify(users), 200
 
 @app.route('/auth/users', methods=['POST'])
+@role_required('admin')
 def create_user():
     data = request.json
-    password_hash = generate_password_hash(data['password'])
+    try:
+        password_hash = password_hasher.hash(data['password'])
+    except HashPoolBusy as e:
+        return retry_later("Servicio de autenticación ocupado", e.retry_after, 503)
     
     success = DatabaseLayer.create_user(
         data['username'],
@@ -52,6 +110,7 @@ def create_user():
     return jsonify({"error": "Error al crear usuario"}), 400
 
 @app.route('/auth/users/<int:user_id>', methods=['DELETE'])
+@role_required('admin')
 def delete_user(user_id):
     success = DatabaseLayer.delete_user(user_id)
     if success:
@@ -60,7 +119,13 @@ def delete_user(user_id):
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"service": "auth", "status": "healthy"}), 200
+    return jsonify({
+        "service": "auth",
+        "status": "healthy",
+        "db_pool": DatabaseConfig.pool_stats(),
+        "password_hashing": password_hasher.stats(),
+        "login_limits": {"user": user_limiter.stats(), "ip": ip_limiter.stats()}
+    }), 200
 
 if __name__ == "__main__":
     print("🔐 Servicio de Autenticación iniciado en puerto 5001")
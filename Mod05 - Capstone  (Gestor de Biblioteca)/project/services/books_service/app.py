@@ -5,13 +5,65 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from shared.database import DatabaseLayer
+from shared.pagination import parse_list_args, paginated_response
+from shared.bulk import BOOK_COLUMNS, bulk_import, iter_records
+from shared.config import DatabaseConfig
+from shared.events import publish_events
+from shared.tokens import protect
+from shared.tracing import instrument
 
 app = Flask(__name__)
+instrument(app, 'books')
+protect(app)
+publish_events(app, 'libro')
 
 @app.route('/books', methods=['GET'])
 def get_books():
-    books = DatabaseLayer.get_all_books()
-    return jsonify(books), 200
+    try:
+        after_id, limit, fields, count = parse_list_args(request.args, DatabaseLayer.BOOK_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    books = DatabaseLayer.get_all_books(after_id=after_id, limit=limit, fields=fields)
+    total = None
+    if count:
+        stats = DatabaseLayer.get_book_stats()
+        total = stats['total_libros'] if stats else None
+    return paginated_response(books, limit, total), 200
+
+@app.route('/books/search', methods=['GET'])
+def search_books():
+    try:
+        after_id, limit, fields, count = parse_list_args(request.args, DatabaseLayer.BOOK_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    match = request.args.get('match', 'prefix')
+    if match not in DatabaseLayer.BOOK_SEARCH_MODES:
+        return jsonify({"error": f"match debe ser uno de: {', '.join(DatabaseLayer.BOOK_SEARCH_MODES)}"}), 400
+    disponible = request.args.get('disponible')
+    if disponible is not None:
+        if disponible not in ('1', 'true', '0', 'false'):
+            return jsonify({"error": "disponible debe ser 1/true o 0/false"}), 400
+        disponible = disponible in ('1', 'true')
+    filters = {
+        "q": request.args.get('q', '').strip() or None,
+        "match": match,
+        "isbn": request.args.get('isbn', '').strip() or None,
+        "categoria": request.args.get('categoria', '').strip() or None,
+        "disponible": disponible,
+    }
+    
+    books = DatabaseLayer.search_books(after_id=after_id, limit=limit, fields=fields, **filters)
+    total = DatabaseLayer.count_search_books(**filters) if count else None
+    return paginated_response(books, limit, total), 200
+
+@app.route('/books/stats', methods=['GET'])
+def get_book_stats():
+    stats = DatabaseLayer.get_book_stats()
+    if stats is None:
+        return jsonify({"error": "Error al obtener estadísticas"}), 500
+    return jsonify(stats), 200
 
 @app.route('/books/<int:book_id>', methods=['GET'])
 def get_book(book_id):
@@ -35,6 +87,16 @@ def create_book():
         return jsonify({"message": "Libro creado", "id": book_id}), 201
     return jsonify({"error": "Error al crear libro"}), 400
 
+@app.route('/books/bulk', methods=['POST'])
+def bulk_create_books():
+    try:
+        records = iter_records(request.stream, request.content_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 415
+    
+    report = bulk_import(records, BOOK_COLUMNS, DatabaseLayer.create_books_batch)
+    return jsonify(report), 200
+
 @app.route('/books/<int:book_id>', methods=['PUT'])
 def update_book(book_id):
     data = request.json
@@ -68,7 +130,7 @@ def update_availability(book_id):
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"service": "books", "status": "healthy"}), 200
+    return jsonify({"service": "books", "status": "healthy", "db_pool": DatabaseConfig.pool_stats()}), 200
 
 if __name__ == "__main__":
     print("📚 Servicio de Libros iniciado en puerto 5002")
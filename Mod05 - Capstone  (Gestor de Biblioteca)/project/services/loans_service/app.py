@@ -1,19 +1,80 @@
 from flask import Flask, request, jsonify
-import requests
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from shared.database import DatabaseLayer
-from shared.config import ServiceConfig
+from shared.pagination import parse_list_args, parse_after_date, paginated_response
+from shared.config import DatabaseConfig
+from shared.events import publish_events
+from shared.tokens import protect
+from shared.tracing import instrument
 
 app = Flask(__name__)
+instrument(app, 'loans')
+protect(app)
+publish_events(app, 'prestamo')
+
+# Código HTTP para cada error de create_loan / return_loan
+LOAN_ERROR_STATUS = {
+    DatabaseLayer.BOOK_NOT_FOUND: 404,
+    DatabaseLayer.MEMBER_NOT_FOUND: 404,
+    DatabaseLayer.LOAN_NOT_FOUND: 404,
+    DatabaseLayer.BOOK_UNAVAILABLE: 400,
+    DatabaseLayer.LOAN_ALREADY_RETURNED: 400,
+}
+
+def parse_loan_cursor(after_id):
+    """Fecha del cursor de los listados de préstamos (`after_date`)
+
+    Si el cliente solo envía `after_id`, la fecha se toma de ese préstamo;
+    si ya no existe, no se puede continuar el listado y se lanza ValueError.
+    """
+    after_date = parse_after_date(request.args)
+    if after_id is not None and after_date is None:
+        loan = DatabaseLayer.get_loan_by_id(after_id)
+        if loan is None:
+            raise ValueError("after_id no corresponde a ningún préstamo: envíe también after_date")
+        after_date = loan['fecha_prestamo']
+    return after_date
 
 @app.route('/loans', methods=['GET'])
 def get_loans():
-    loans = DatabaseLayer.get_all_loans()
-    return jsonify(loans), 200
+    try:
+        after_id, limit, fields, count = parse_list_args(request.args, DatabaseLayer.LOAN_FIELDS)
+        after_date = parse_loan_cursor(after_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    loans = DatabaseLayer.get_all_loans(after_id=after_id, after_date=after_date, limit=limit, fields=fields)
+    total = None
+    if count:
+        stats = DatabaseLayer.get_loan_stats()
+        total = stats['total_prestamos'] if stats else None
+    return paginated_response(loans, limit, total, date_field='fecha_prestamo'), 200
+
+@app.route('/loans/detailed', methods=['GET'])
+def get_loans_detailed():
+    try:
+        after_id, limit, _, count = parse_list_args(request.args, ())
+        after_date = parse_loan_cursor(after_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    loans = DatabaseLayer.get_all_loans_detailed(after_id=after_id, after_date=after_date, limit=limit)
+    total = None
+    if count:
+        stats = DatabaseLayer.get_loan_stats()
+        total = stats['total_prestamos'] if stats else None
+    return paginated_response(loans, limit, total, date_field='fecha_prestamo'), 200
+
+@app.route('/loans/stats', methods=['GET'])
+def get_loan_stats():
+    stats = DatabaseLayer.get_loan_stats()
+    if stats is None:
+        return jsonify({"error": "Error al obtener estadísticas"}), 500
+    return jsonify(stats), 200
 
 @app.route('/loans/<int:loan_id>', methods=['GET'])
 def get_loan(loan_id):
@@ -25,59 +86,20 @@ def get_loan(loan_id):
 @app.route('/loans', methods=['POST'])
 def create_loan():
     data = request.json
-    libro_id = data['libro_id']
-    miembro_id = data['miembro_id']
-    
-    try:
-        book_response = requests.get(f"{ServiceConfig.BOOKS_SERVICE_URL}/books/{libro_id}")
-        if book_response.status_code != 200:
-            return jsonify({"error": "Libro no encontrado"}), 404
-        
-        book = book_response.json()
-        if not book['disponible']:
-            return jsonify({"error": "Libro no disponible"}), 400
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": f"Error al comunicarse con servicio de libros: {str(e)}"}), 500
-    
-    try:
-        member_response = requests.get(f"{ServiceConfig.MEMBERS_SERVICE_URL}/members/{miembro_id}")
-        if member_response.status_code != 200:
-            return jsonify({"error": "Miembro no encontrado"}), 404
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": f"Error al comunicarse con servicio de miembros: {str(e)}"}), 500
-    
-    loan_id = DatabaseLayer.create_loan(libro_id, miembro_id)
-    
-    if not loan_id:
-        return jsonify({"error": "Error al crear préstamo"}), 400
     
-    try:
-        requests.put(
-            f"{ServiceConfig.BOOKS_SERVICE_URL}/books/{libro_id}/availability",
-            json={"disponible": False}
-        )
-    except requests.exceptions.RequestException as e:
-        print(f"Error al actualizar disponibilidad: {e}")
+    # Verificación del libro y del miembro, alta del préstamo y cambio de
+    # disponibilidad ocurren en una sola transacción
+    loan_id, error = DatabaseLayer.create_loan(data['libro_id'], data['miembro_id'])
+    if error:
+        return jsonify({"error": error}), LOAN_ERROR_STATUS.get(error, 400)
     
     return jsonify({"message": "Préstamo creado exitosamente", "id": loan_id}), 201
 
 @app.route('/loans/<int:loan_id>/return', methods=['PUT'])
 def return_loan(loan_id):
-    loan = DatabaseLayer.get_loan_by_id(loan_id)
-    if not loan:
-        return jsonify({"error": "Préstamo no encontrado"}), 404
-    
-    success = DatabaseLayer.return_loan(loan_id)
-    if not success:
-        return jsonify({"error": "Error al devolver préstamo"}), 400
-    
-    try:
-        requests.put(
-            f"{ServiceConfig.BOOKS_SERVICE_URL}/books/{loan['libro_id']}/availability",
-            json={"disponible": True}
-        )
-    except requests.exceptions.RequestException as e:
-        print(f"Error al actualizar disponibilidad: {e}")
+    _, error = DatabaseLayer.return_loan(loan_id)
+    if error:
+        return jsonify({"error": error}), LOAN_ERROR_STATUS.get(error, 400)
     
     return jsonify({"message": "Préstamo devuelto exitosamente"}), 200
 
@@ -90,7 +112,7 @@ def delete_loan(loan_id):
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"service": "loans", "status": "healthy"}), 200
+    return jsonify({"service": "loans", "status": "healthy", "db_pool": DatabaseConfig.pool_stats()}), 200
 
 if __name__ == "__main__":
     print("📖 Servicio de Préstamos iniciado en puerto 5004")
@@ -5,13 +5,38 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from shared.database import DatabaseLayer
+from shared.pagination import parse_list_args, paginated_response
+from shared.bulk import MEMBER_COLUMNS, bulk_import, iter_records
+from shared.config import DatabaseConfig
+from shared.events import publish_events
+from shared.tokens import protect
+from shared.tracing import instrument
 
 app = Flask(__name__)
+instrument(app, 'members')
+protect(app)
+publish_events(app, 'miembro')
 
 @app.route('/members', methods=['GET'])
 def get_members():
-    members = DatabaseLayer.get_all_members()
-    return jsonify(members), 200
+    try:
+        after_id, limit, fields, count = parse_list_args(request.args, DatabaseLayer.MEMBER_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    members = DatabaseLayer.get_all_members(after_id=after_id, limit=limit, fields=fields)
+    total = None
+    if count:
+        stats = DatabaseLayer.get_member_stats()
+        total = stats['total_miembros'] if stats else None
+    return paginated_response(members, limit, total), 200
+
+@app.route('/members/stats', methods=['GET'])
+def get_member_stats():
+    stats = DatabaseLayer.get_member_stats()
+    if stats is None:
+        return jsonify({"error": "Error al obtener estadísticas"}), 500
+    return jsonify(stats), 200
 
 @app.route('/members/<int:member_id>', methods=['GET'])
 def get_member(member_id):
@@ -34,6 +59,16 @@ def create_member():
         return jsonify({"message": "Miembro creado", "id": member_id}), 201
     return jsonify({"error": "Error al crear miembro"}), 400
 
+@app.route('/members/bulk', methods=['POST'])
+def bulk_create_members():
+    try:
+        records = iter_records(request.stream, request.content_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 415
+    
+    report = bulk_import(records, MEMBER_COLUMNS, DatabaseLayer.create_members_batch)
+    return jsonify(report), 200
+
 @app.route('/members/<int:member_id>', methods=['PUT'])
 def update_member(member_id):
     data = request.json
@@ -58,7 +93,7 @@ def delete_member(member_id):
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"service": "members", "status": "healthy"}), 200
+    return jsonify({"service": "members", "status": "healthy", "db_pool": DatabaseConfig.pool_stats()}), 200
 
 if __name__ == "__main__":
     print("👥 Servicio de Miembros iniciado en puerto 5003")
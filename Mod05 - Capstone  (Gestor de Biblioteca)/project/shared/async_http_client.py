@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from shared.circuit_breaker import CircuitBreaker, CircuitOpenError
+from shared.config import ServiceConfig
+from shared.http_client import ServiceClient, with_token
+from shared.tracing import client_span, with_traceparent
+
+
+class AsyncResponse:
+    """Respuesta ya leída, con la interfaz de requests.Response que usa el gateway"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncServiceClient:
+    """Cliente HTTP asíncrono hacia un microservicio (gateway asíncrono)
+
+    Misma interfaz y política que ServiceClient, pero con `await`: mientras
+    una llamada espera la respuesta el event loop atiende otras, así que un
+    solo proceso puede tener miles de llamadas en curso. Mantiene un
+    `aiohttp.ClientSession` (pool keep-alive) por event loop.
+    """
+
+    IDEMPOTENT_METHODS = ServiceClient.IDEMPOTENT_METHODS
+    RETRY_STATUS = (502, 503, 504)
+
+    def __init__(self, base_url, max_connections=None, timeout=None, retries=None, backoff=None,
+                 breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections or ServiceConfig.ASYNC_HTTP_MAX_CONNECTIONS
+        self.timeout = timeout or ServiceConfig.REQUEST_TIMEOUT
+        self.retries = ServiceConfig.HTTP_RETRIES if retries is None else retries
+        self.backoff = ServiceConfig.HTTP_BACKOFF if backoff is None else backoff
+        self.breaker = breaker
+        self.name = breaker.name if breaker is not None else self.base_url
+        self._session = None
+        self._loop = None
+
+    @property
+    def session(self):
+        # Una ClientSession solo puede usarse en el event loop donde se creó
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                self.base_url,
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    async def request(self, method, path, **kwargs):
+        """Envía la petición pasando por el circuit breaker, como ServiceClient"""
+        with_token(kwargs)
+        with client_span(self.name, method, path) as call:
+            with_traceparent(kwargs, call)
+            response = await self._request(method, path, **kwargs)
+            call.set_tag("http.status_code", response.status_code)
+            return response
+
+    async def _request(self, method, path, **kwargs):
+        if self.breaker is None:
+            return await self._send(method, path, **kwargs)
+
+        ticket = self.breaker.before_call()
+        if ticket.probe:
+            healthy = False
+            try:
+                healthy = await self._probe()
+            finally:
+                # También si la corrutina se cancela (timeout del fan-out)
+                ticket = self.breaker.probe_finished(healthy)
+            if ticket is None:
+                raise CircuitOpenError(self.breaker.name, self.breaker.open_seconds)
+
+        start = time.monotonic()
+        try:
+            response = await self._send(method, path, **kwargs)
+        except BaseException:
+            # Incluye CancelledError, para no dejar sin resolver una llamada de prueba
+            self.breaker.after_call(ticket, time.monotonic() - start, success=False)
+            raise
+        self.breaker.after_call(ticket, time.monotonic() - start, success=response.status_code < 500)
+        return response
+
+    async def _probe(self):
+        """Consulta /health sin reintentos (circuito abierto)"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=ServiceConfig.BREAKER_PROBE_TIMEOUT)
+            async with self.session.get("/health", timeout=timeout) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def _send(self, method, path, **kwargs):
+        """Envía la petición, reintentando con backoff como ServiceClient"""
+        if "timeout" in kwargs:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=kwargs["timeout"])
+        idempotent = method.upper() in self.IDEMPOTENT_METHODS
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                async with self.session.request(method, path, **kwargs) as response:
+                    content = await response.read()
+            except aiohttp.ClientConnectorError:
+                # No llegó a enviarse: se puede reintentar cualquier método
+                if last_attempt:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last_attempt or not idempotent:
+                    raise
+            else:
+                if last_attempt or not idempotent or response.status not in self.RETRY_STATUS:
+                    return AsyncResponse(response.status, response.headers, content)
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+# Un cliente (con su circuit breaker) por microservicio definido en ServiceConfig
+auth_service = AsyncServiceClient(ServiceConfig.AUTH_SERVICE_URL, breaker=CircuitBreaker("auth"))
+books_service = AsyncServiceClient(ServiceConfig.BOOKS_SERVICE_URL, breaker=CircuitBreaker("books"))
+members_service = AsyncServiceClient(ServiceConfig.MEMBERS_SERVICE_URL, breaker=CircuitBreaker("members"))
+loans_service = AsyncServiceClient(ServiceConfig.LOANS_SERVICE_URL, breaker=CircuitBreaker("loans"))
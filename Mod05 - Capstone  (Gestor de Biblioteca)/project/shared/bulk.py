@@ -0,0 +1,202 @@
+import csv
+import heapq
+import io
+import json
+
+from shared.config import ServiceConfig
+
+# (campo, tipo, longitud máxima) según las columnas de biblioteca_db.sql
+BOOK_COLUMNS = (
+    ("titulo", str, 200),
+    ("autor", str, 150),
+    ("isbn", str, 20),
+    ("año_publicacion", int, None),
+    ("categoria", str, 100),
+)
+
+MEMBER_COLUMNS = (
+    ("nombre", str, 100),
+    ("apellido", str, 100),
+    ("correo", str, 150),
+    ("telefono", str, 20),
+)
+
+JSON_LINES_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+_READ_SIZE = 64 * 1024
+# Un objeto cortado al final del bloque leído falla a lo sumo unos caracteres
+# antes del final (p. ej. en "tru" de true, o "-Infinit" de -Infinity)
+_TRUNCATION_MARGIN = 10
+
+
+def iter_records(stream, content_type):
+    """Registros de un cuerpo JSON (arreglo), JSON Lines o CSV, leídos en streaming
+
+    Genera tuplas (número de fila, registro, error). Lanza ValueError si el
+    Content-Type no es soportado.
+    """
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype == "application/json":
+        return _iter_json_array(stream)
+    if mimetype in JSON_LINES_TYPES:
+        return _iter_json_lines(stream)
+    if mimetype == "text/csv":
+        return _iter_csv(stream)
+    raise ValueError(f"Content-Type no soportado: {mimetype or 'ninguno'} "
+                     "(use application/json, application/x-ndjson o text/csv)")
+
+
+def _iter_json_lines(stream):
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    for row, line in enumerate(reader, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield row, None, f"JSON inválido: {e.msg}"
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+    # La fila 1 es el encabezado
+    for row, record in enumerate(reader, start=2):
+        yield row, record, None
+
+
+def _iter_json_array(stream):
+    """Decodifica un arreglo JSON objeto por objeto sin cargarlo completo"""
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    buffer = ""
+    pos = 0
+    eof = False
+    row = 0
+    state = "start"  # start -> value|end -> separator|end -> value ...
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("JSON incompleto: falta cerrar el arreglo")
+            buffer, pos = buffer[pos:] + reader.read(_READ_SIZE), 0
+            eof = pos >= len(buffer)
+            continue
+
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Se esperaba un arreglo JSON")
+            pos += 1
+            state = "first"
+        elif char == "]" and state in ("first", "separator"):
+            return
+        elif state == "separator":
+            if char != ",":
+                raise ValueError(f"JSON inválido después de la fila {row}")
+            pos += 1
+            state = "value"
+        else:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Solo un error al final del bloque (o una cadena sin cerrar)
+                # puede ser un objeto cortado; cualquier otro es JSON inválido
+                truncated = (e.pos >= len(buffer) - _TRUNCATION_MARGIN
+                             or e.msg.startswith("Unterminated string"))
+                if not truncated:
+                    raise ValueError(f"JSON inválido en la fila {row + 1}: {e.msg}")
+                if len(buffer) - pos > ServiceConfig.BULK_MAX_RECORD_SIZE:
+                    raise ValueError(f"La fila {row + 1} excede {ServiceConfig.BULK_MAX_RECORD_SIZE} caracteres")
+                chunk = reader.read(_READ_SIZE)
+                if not chunk:
+                    raise ValueError(f"JSON inválido en la fila {row + 1}")
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            if end == len(buffer) and not isinstance(record, (dict, list, str)):
+                # Un número al final del bloque puede seguir en el siguiente
+                chunk = reader.read(_READ_SIZE)
+                if chunk:
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+            pos = end
+            row += 1
+            state = "separator"
+            yield row, record, None
+
+
+def validate_record(record, columns):
+    """Valida un registro y lo convierte en la tupla de valores del INSERT
+
+    Devuelve (valores, None) o (None, mensaje de error).
+    """
+    if not isinstance(record, dict):
+        return None, "Se esperaba un objeto"
+    values = []
+    for name, kind, max_length in columns:
+        value = record.get(name)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None, f"Falta el campo '{name}'"
+        if kind is int:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None, f"'{name}' debe ser un entero"
+        else:
+            value = str(value).strip()
+            if max_length and len(value) > max_length:
+                return None, f"'{name}' excede {max_length} caracteres"
+            if name == "correo" and "@" not in value:
+                return None, "'correo' no es un correo válido"
+        values.append(value)
+    return tuple(values), None
+
+
+def bulk_import(records, columns, insert_batch, batch_size=None):
+    """Valida los registros y los inserta por lotes con `insert_batch`
+
+    `insert_batch(filas)` debe devolver (insertados, [(índice en el lote, error)]).
+    Cada lote se confirma por separado; un error de formato que impida seguir
+    leyendo detiene la importación, pero lo ya confirmado se mantiene.
+    """
+    batch_size = batch_size or ServiceConfig.BULK_BATCH_SIZE
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    batch, batch_rows = [], []
+    # Los errores de un lote llegan después de los de validación de filas
+    # posteriores: se guardan las BULK_MAX_REPORTED_ERRORS filas más bajas
+    # (heap de (-fila, error)) y se ordenan al final
+    errors = []
+
+    def add_error(row, message):
+        report["failed"] += 1
+        if len(errors) < ServiceConfig.BULK_MAX_REPORTED_ERRORS:
+            heapq.heappush(errors, (-row, message))
+        elif row < -errors[0][0]:
+            heapq.heapreplace(errors, (-row, message))
+
+    def flush():
+        inserted, errors = insert_batch(batch)
+        report["inserted"] += inserted
+        for index, message in errors:
+            add_error(batch_rows[index], message)
+        batch.clear()
+        batch_rows.clear()
+
+    try:
+        for row, record, error in records:
+            values, error = (None, error) if error else validate_record(record, columns)
+            if error:
+                add_error(row, error)
+                continue
+            batch.append(values)
+            batch_rows.append(row)
+            if len(batch) >= batch_size:
+                flush()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        report["aborted"] = str(e)
+
+    if batch:
+        flush()
+    report["errors"] = [{"row": -row, "error": message} for row, message in sorted(errors, reverse=True)]
+    return report
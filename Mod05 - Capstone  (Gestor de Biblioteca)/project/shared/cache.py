@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Caché en memoria (por proceso) con expiración y desalojo LRU
+
+    - Cada entrada vive como máximo `ttl` segundos
+    - Con más de `maxsize` entradas se desaloja la usada hace más tiempo
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data = OrderedDict()  # clave -> (valor, instante de expiración)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        """Devuelve el valor cacheado o None si no está o expiró"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+            self._misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self._ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Read-through: si no está en caché llama a `loader()` y guarda el resultado
+
+        Un resultado None (p. ej. registro inexistente) no se guarda.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self._maxsize,
+                "ttl": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from shared.config import ServiceConfig
+
+# Permiso para hacer una llamada; `probe` indica que antes hay que consultar /health
+Ticket = namedtuple("Ticket", ["probe", "generation"])
+
+
+class CircuitOpenError(Exception):
+    """El circuito del servicio está abierto: la llamada se rechaza sin hacerse"""
+
+    def __init__(self, name, retry_in):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"servicio {name} no disponible (circuito abierto)")
+
+
+class CircuitBreaker:
+    """Circuit breaker por servicio destino
+
+    - CLOSED: las llamadas pasan; se guarda el resultado de las últimas
+      `window`. Con al menos `min_calls`, si la tasa de fallos (excepción o
+      HTTP 5xx) o la de llamadas lentas supera su umbral, el circuito se abre.
+    - OPEN: las llamadas fallan al instante con CircuitOpenError. Pasados
+      `open_seconds`, la siguiente llamada consulta antes el /health del
+      servicio (una sola a la vez).
+    - HALF_OPEN: si /health respondió, se dejan pasar `half_open_calls`
+      llamadas de prueba; si todas salen bien se cierra, si una falla se
+      vuelve a abrir.
+
+    El estado es por proceso (cada worker del gateway tiene el suyo).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, window=None, min_calls=None, failure_rate=None,
+                 slow_call_seconds=None, slow_call_rate=None, open_seconds=None,
+                 half_open_calls=None):
+        self.name = name
+        self.min_calls = min_calls or ServiceConfig.BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate or ServiceConfig.BREAKER_FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds or ServiceConfig.BREAKER_SLOW_CALL_SECONDS
+        self.slow_call_rate = slow_call_rate or ServiceConfig.BREAKER_SLOW_CALL_RATE
+        self.open_seconds = open_seconds or ServiceConfig.BREAKER_OPEN_SECONDS
+        self.half_open_calls = half_open_calls or ServiceConfig.BREAKER_HALF_OPEN_CALLS
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window or ServiceConfig.BREAKER_WINDOW)  # (falló, lenta)
+        self._state = self.CLOSED
+        self._generation = 0  # cambia en cada transición; invalida resultados viejos
+        self._open_until = 0
+        self._probing = False
+        self._trial_calls = 0
+        self._trial_successes = 0
+
+        self._opened = 0
+        self._rejected = 0
+
+    def before_call(self):
+        """Autoriza una llamada; lanza CircuitOpenError si el circuito está abierto"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return Ticket(False, self._generation)
+
+            if self._state == self.OPEN:
+                remaining = self._open_until - time.monotonic()
+                if remaining > 0 or self._probing:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, max(0, remaining))
+                self._probing = True
+                return Ticket(True, self._generation)
+
+            if self._trial_calls >= self.half_open_calls:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, 0)
+            self._trial_calls += 1
+            return Ticket(False, self._generation)
+
+    def probe_finished(self, healthy):
+        """Resultado del /health: si respondió pasa a HALF_OPEN y devuelve el
+        ticket de la llamada; si no, vuelve a abrir y devuelve None"""
+        with self._lock:
+            self._probing = False
+            if not healthy:
+                self._trip()
+                self._rejected += 1
+                return None
+            self._transition(self.HALF_OPEN)
+            self._trial_calls = 1
+            return Ticket(False, self._generation)
+
+    def after_call(self, ticket, duration, success):
+        """Registra el resultado de una llamada autorizada con `ticket`"""
+        with self._lock:
+            if ticket.generation != self._generation:
+                return
+
+            if self._state == self.HALF_OPEN:
+                if not success or duration > self.slow_call_seconds:
+                    self._trip()
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self._transition(self.CLOSED)
+                return
+
+            self._calls.append((not success, duration > self.slow_call_seconds))
+            if len(self._calls) >= self.min_calls:
+                failures = sum(1 for failed, _ in self._calls if failed)
+                slow = sum(1 for _, is_slow in self._calls if is_slow)
+                if (failures / len(self._calls) >= self.failure_rate
+                        or slow / len(self._calls) >= self.slow_call_rate):
+                    self._trip()
+
+    def _trip(self):
+        self._transition(self.OPEN)
+        self._open_until = time.monotonic() + self.open_seconds
+        self._opened += 1
+        print(f"Circuito abierto para {self.name} durante {self.open_seconds} s")
+
+    def _transition(self, state):
+        self._state = state
+        self._generation += 1
+        self._calls.clear()
+        self._trial_calls = 0
+        self._trial_successes = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failure_rate": round(sum(1 for f, _ in self._calls if f) / calls, 2) if calls else 0,
+                "slow_rate": round(sum(1 for _, s in self._calls if s) / calls, 2) if calls else 0,
+                "opened": self._opened,
+                "rejected": self._rejected,
+            }
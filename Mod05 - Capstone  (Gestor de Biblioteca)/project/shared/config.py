@@ -1,5 +1,10 @@
+import os
+import tempfile
+import threading
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+
+from shared.pool import ConnectionPool
 
 class DatabaseConfig:
     """Configuración de la base de datos MySQL compartida entre microservicios"""
@@ -10,40 +15,208 @@ class DatabaseConfig:
     DATABASE = "biblioteca_db"
     PORT = 3306
     
+    # Motor: "mysql" o "sqlite" (sin servidor, para pruebas de carga; ver shared/sqlite_backend.py)
+    BACKEND = os.environ.get("DB_BACKEND", "mysql")
+    SQLITE_PATH = os.environ.get("DB_SQLITE_PATH", os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loadtest", "data", "biblioteca.db"))
+    
+    # Pool de conexiones (uno por proceso)
+    POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))  # segundos esperando una conexión libre
+    POOL_HEALTH_CHECK_INTERVAL = 30  # ping solo si la conexión estuvo ociosa este tiempo
+    
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+    
+    @staticmethod
+    def create_connection():
+        """Abre una conexión nueva a MySQL (sin pasar por el pool)"""
+        from shared.tracing import span  # diferido: tracing importa este módulo
+        with span("db.connect"):
+            try:
+                if DatabaseConfig.BACKEND == "sqlite":
+                    from shared.sqlite_backend import connect
+                    return connect(DatabaseConfig.SQLITE_PATH)
+                connection = mysql.connector.connect(
+                    host=DatabaseConfig.HOST,
+                    user=DatabaseConfig.USER,
+                    password=DatabaseConfig.PASSWORD,
+                    database=DatabaseConfig.DATABASE,
+                    port=DatabaseConfig.PORT,
+                    consume_results=True
+                )
+                if connection.is_connected():
+                    return connection
+            except Error as e:
+                print(f"Error al conectar a MySQL: {e}")
+                return None
+    
+    @staticmethod
+    def get_pool():
+        """Devuelve el pool del proceso actual, creándolo la primera vez"""
+        pid = os.getpid()
+        if DatabaseConfig._pool is None or DatabaseConfig._pool_pid != pid:
+            with DatabaseConfig._pool_lock:
+                # Tras un fork las conexiones heredadas no son utilizables
+                if DatabaseConfig._pool is None or DatabaseConfig._pool_pid != pid:
+                    DatabaseConfig._pool = ConnectionPool(
+                        DatabaseConfig.create_connection,
+                        size=DatabaseConfig.POOL_SIZE,
+                        timeout=DatabaseConfig.POOL_TIMEOUT,
+                        health_check_interval=DatabaseConfig.POOL_HEALTH_CHECK_INTERVAL,
+                        is_disconnect=DatabaseConfig.is_disconnect
+                    )
+                    DatabaseConfig._pool_pid = pid
+        return DatabaseConfig._pool
+    
+    @staticmethod
+    def is_disconnect(error):
+        """True si el error es porque el servidor cerró la conexión (p. ej. wait_timeout)"""
+        return getattr(error, "errno", None) in (errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST,
+                                                 errorcode.CR_SERVER_LOST_EXTENDED)
+    
     @staticmethod
     def get_connection():
-        """Obtiene una conexión a la base de datos"""
-        try:
-            connection = mysql.connector.connect(
-                host=DatabaseConfig.HOST,
-                user=DatabaseConfig.USER,
-                password=DatabaseConfig.PASSWORD,
-                database=DatabaseConfig.DATABASE,
-                port=DatabaseConfig.PORT
-            )
-            if connection.is_connected():
-                return connection
-        except Error as e:
-            print(f"Error al conectar a MySQL: {e}")
-            return None
+        """Obtiene una conexión del pool (incluye abrirla si no hay una libre)"""
+        from shared.tracing import span
+        with span("db.pool.acquire"):
+            return DatabaseConfig.get_pool().acquire()
     
     @staticmethod
     def close_connection(connection, cursor=None):
-        """Cierra la conexión y el cursor si existen"""
+        """Cierra el cursor y devuelve la conexión al pool"""
         if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+            try:
+                cursor.close()
+            except Error as e:
+                print(f"Error al cerrar cursor: {e}")
+        if connection:
+            DatabaseConfig.get_pool().release(connection)
+    
+    @staticmethod
+    def pool_stats():
+        """Métricas del pool de conexiones del proceso actual"""
+        return DatabaseConfig.get_pool().stats()
 
 
 class ServiceConfig:
     """Configuración de URLs de los microservicios"""
     
     # URLs de los microservicios
-    AUTH_SERVICE_URL = "http://localhost:5001"
-    BOOKS_SERVICE_URL = "http://localhost:5002"
-    MEMBERS_SERVICE_URL = "http://localhost:5003"
-    LOANS_SERVICE_URL = "http://localhost:5004"
+    AUTH_SERVICE_URL = os.environ.get("AUTH_SERVICE_URL", "http://localhost:5001")
+    BOOKS_SERVICE_URL = os.environ.get("BOOKS_SERVICE_URL", "http://localhost:5002")
+    MEMBERS_SERVICE_URL = os.environ.get("MEMBERS_SERVICE_URL", "http://localhost:5003")
+    LOANS_SERVICE_URL = os.environ.get("LOANS_SERVICE_URL", "http://localhost:5004")
     
     # Puerto del Gateway
-    GATEWAY_PORT = 5000
\ No newline at end of file
+    GATEWAY_PORT = 5000
+    
+    # Clave para firmar la cookie de sesión (la comparten el gateway síncrono y el asíncrono)
+    GATEWAY_SECRET_KEY = os.environ.get("GATEWAY_SECRET_KEY", "tu_clave_secreta_super_segura_123")
+    
+    # Tokens firmados (JWT HS256) que emite auth y verifica cada servicio (shared/tokens.py)
+    # Al rotar la clave, la anterior se deja en TOKEN_PREVIOUS_KEYS ("kid:clave,...")
+    # hasta que expiren los tokens firmados con ella
+    TOKEN_KEY_ID = os.environ.get("TOKEN_KEY_ID", "k1")
+    TOKEN_KEYS = {
+        **dict(item.split(":", 1) for item in os.environ.get("TOKEN_PREVIOUS_KEYS", "").split(",") if item),
+        TOKEN_KEY_ID: os.environ.get("TOKEN_SECRET", "clave_de_tokens_cambiar_en_produccion_456"),
+    }
+    TOKEN_TTL = int(os.environ.get("TOKEN_TTL", 900))  # segundos
+    TOKEN_REFRESH_BEFORE = 300  # el gateway renueva el token cuando le queda menos que esto
+    TOKEN_LEEWAY = 30           # tolerancia de reloj entre servicios
+    
+    # Hash de contraseñas del servicio de autenticación (shared/passwords.py).
+    # Al cambiar el método, cada contraseña se actualiza en el siguiente login
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    HASH_QUEUE_MAX = int(os.environ.get("AUTH_HASH_QUEUE_MAX", 16))  # logins esperando un hilo
+    HASH_TIMEOUT = 5  # segundos
+    
+    # Intentos de login (token bucket): ráfaga y fichas por segundo
+    LOGIN_USER_BURST = int(os.environ.get("LOGIN_USER_BURST", 5))
+    LOGIN_USER_RATE = float(os.environ.get("LOGIN_USER_RATE", 0.1))   # 1 intento cada 10 s
+    LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", 20))
+    LOGIN_IP_RATE = float(os.environ.get("LOGIN_IP_RATE", 1))
+    # Solo se confía en X-Forwarded-For si la petición viene de estas direcciones (el gateway)
+    TRUSTED_PROXIES = tuple(os.environ.get("TRUSTED_PROXIES", "127.0.0.1,::1").split(","))
+    
+    # Tiempo máximo (segundos) de cada llamada entre servicios
+    REQUEST_TIMEOUT = float(os.environ.get("SERVICE_REQUEST_TIMEOUT", 5))
+    
+    # Conexiones HTTP keep-alive por servicio destino y reintentos con backoff
+    HTTP_POOL_SIZE = int(os.environ.get("SERVICE_HTTP_POOL_SIZE", 20))
+    HTTP_RETRIES = int(os.environ.get("SERVICE_HTTP_RETRIES", 2))
+    HTTP_BACKOFF = float(os.environ.get("SERVICE_HTTP_BACKOFF", 0.2))
+    
+    # Conexiones simultáneas por servicio destino del gateway asíncrono
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get("GATEWAY_ASYNC_MAX_CONNECTIONS", 1000))
+    
+    # Circuit breaker por servicio destino (ver shared/circuit_breaker.py)
+    BREAKER_WINDOW = 20               # últimas llamadas evaluadas
+    BREAKER_MIN_CALLS = 10            # mínimo de llamadas antes de poder abrir
+    BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", 0.5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("BREAKER_SLOW_CALL_SECONDS", 2))
+    BREAKER_SLOW_CALL_RATE = float(os.environ.get("BREAKER_SLOW_CALL_RATE", 0.8))
+    BREAKER_OPEN_SECONDS = float(os.environ.get("BREAKER_OPEN_SECONDS", 10))
+    BREAKER_HALF_OPEN_CALLS = 3       # llamadas de prueba antes de volver a cerrar
+    BREAKER_PROBE_TIMEOUT = 1         # timeout del /health de prueba
+    
+    # Copia de la última respuesta correcta de las páginas de lectura del
+    # gateway, que se muestra si el servicio falla
+    FALLBACK_MAX_AGE = float(os.environ.get("GATEWAY_FALLBACK_MAX_AGE", 3600))
+    FALLBACK_MAX_ROWS = 5000
+    
+    # Eventos de cambio (outbox `eventos` + GET /events de cada servicio, ver shared/events.py)
+    EVENTS_POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL", 0.5))  # segundos
+    EVENTS_BATCH = 500
+    EVENTS_GAP_WATCH = 600        # segundos que se vigila un id saltado por si se confirma tarde
+    EVENTS_KEEPALIVE = 15         # comentario SSE si no hubo eventos en este tiempo
+    EVENTS_LOCK_WAIT = 2          # segundos que el stream espera por un id sin confirmar
+    EVENTS_RETENTION_HOURS = int(os.environ.get("EVENTS_RETENTION_HOURS", 24))
+    
+    # Modelo de lectura del gateway (gateway/read_model.py)
+    READ_MODEL_ENABLED = os.environ.get("GATEWAY_READ_MODEL", "1") != "0"
+    READ_MODEL_WAIT = 2           # espera máxima a ver su propia escritura (segundos)
+    # Un solo proceso del gateway por host se suscribe: el que toma este lock
+    READ_MODEL_LOCK_FILE = os.environ.get("GATEWAY_READ_MODEL_LOCK",
+                                          os.path.join(tempfile.gettempdir(), "biblioteca-read-model.lock"))
+    READ_MODEL_LOCK_RETRY = 5     # segundos entre intentos de los procesos que no lo tienen
+    
+    # Trazas distribuidas y métricas (shared/tracing.py, shared/metrics.py)
+    # TRACE_EXPORT: "log" (logs/traces-<servicio>.jsonl), "off" o la URL de un
+    # colector compatible con Zipkin (p. ej. http://localhost:9411/api/v2/spans)
+    TRACE_EXPORT = os.environ.get("TRACE_EXPORT", "log")
+    TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 1.0))  # fracción de trazas exportadas
+    TRACE_QUEUE_MAX = 10000       # spans pendientes de exportar; si se llena se descartan
+    TRACE_LOG_MAX_BYTES = 50 * 1024 * 1024  # al superarlo el log pasa a .1
+    # Directorio donde los workers de un servicio comparten sus métricas (vacío:
+    # cada proceso expone solo las suyas); start_services.py --production lo fija
+    METRICS_DIR = os.environ.get("METRICS_DIR") or None
+    METRICS_WRITE_INTERVAL = 5    # segundos entre escrituras de las series de cada worker
+    
+    # Paginación de los listados (GET /books, /members, /loans)
+    PAGE_SIZE_DEFAULT = 100
+    PAGE_SIZE_MAX = 1000
+    
+    # Importación masiva (POST /books/bulk, /members/bulk)
+    BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 1000))
+    BULK_MAX_REPORTED_ERRORS = 1000
+    BULK_MAX_RECORD_SIZE = 1024 * 1024  # caracteres de un objeto del arreglo JSON
+    
+    # Hilos del gateway para consultar varios servicios en paralelo
+    FANOUT_WORKERS = int(os.environ.get("GATEWAY_FANOUT_WORKERS", 16))
+    
+    # Servidor WSGI de producción (python start_services.py --production)
+    # Procesos y hilos por servicio; se ajustan con <SERVICIO>_WORKERS y <SERVICIO>_THREADS
+    # (p. ej. BOOKS_WORKERS=4). DB_POOL_SIZE debe ser >= hilos por proceso.
+    WSGI_HOST = os.environ.get("WSGI_HOST", "127.0.0.1")
+    WSGI_WORKERS = {
+        name: int(os.environ.get(f"{name.upper()}_WORKERS", os.cpu_count() or 1))
+        for name in ("auth", "books", "members", "loans", "gateway")
+    }
+    WSGI_THREADS = {
+        name: int(os.environ.get(f"{name.upper()}_THREADS", threads))
+        for name, threads in (("auth", 2), ("books", 4), ("members", 4), ("loans", 4), ("gateway", 8))
+    }
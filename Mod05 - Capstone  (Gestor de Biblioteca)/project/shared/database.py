@@ -1,8 +1,146 @@
-from shared.config import DatabaseConfig
+import contextvars
+import json
+import re
+from datetime import datetime
+
+from mysql.connector import Error, IntegrityError, errorcode
+from werkzeug.http import http_date
+
+from shared.config import DatabaseConfig, ServiceConfig
+from shared.tracing import trace_static_methods
 
 class DatabaseLayer:
     """Capa de datos compartida entre microservicios"""
     
+    # Columnas que se pueden pedir con `fields=` en los listados
+    BOOK_FIELDS = ("id", "titulo", "autor", "isbn", "año_publicacion", "categoria", "disponible", "created_at")
+    MEMBER_FIELDS = ("id", "nombre", "apellido", "correo", "telefono", "fecha_registro")
+    LOAN_FIELDS = ("id", "libro_id", "miembro_id", "fecha_prestamo", "fecha_devolucion", "estado")
+    
+    # Errores de create_loan / return_loan
+    BOOK_NOT_FOUND = "Libro no encontrado"
+    BOOK_UNAVAILABLE = "Libro no disponible"
+    MEMBER_NOT_FOUND = "Miembro no encontrado"
+    LOAN_NOT_FOUND = "Préstamo no encontrado"
+    LOAN_ALREADY_RETURNED = "El préstamo ya fue devuelto"
+    LOAN_ERROR = "Error al procesar el préstamo"
+    
+    # Modos de búsqueda de libros por texto (ver _book_search_filter)
+    BOOK_SEARCH_MODES = ("prefix", "words", "contains")
+    # Palabras más cortas no entran en el índice FULLTEXT (innodb_ft_min_token_size)
+    FULLTEXT_MIN_TERM = 3
+    
+    # Outbox de eventos de cambio (tabla `eventos`): entidad -> tabla
+    ENTITY_TABLES = {"libro": "libros", "miembro": "miembros", "prestamo": "prestamos"}
+    # Id del último evento registrado en la petición actual (cabecera X-Event-Id)
+    last_event_id = contextvars.ContextVar("last_event_id", default=None)
+    
+    @staticmethod
+    def _columns(fields, allowed):
+        """Columnas del SELECT para una proyección (el id siempre se incluye: es el cursor)"""
+        if not fields:
+            return "*"
+        columns = ["id"] + [f for f in fields if f in allowed and f != "id"]
+        return ", ".join(f"`{c}`" for c in columns)
+    
+    @staticmethod
+    def _record_events(cursor, entity, action, ids):
+        """Registra eventos `created`/`updated`/`deleted` en el outbox
+
+        Se ejecuta con el cursor de la escritura, antes del commit: el evento se
+        confirma o se deshace junto con el cambio. Los eventos llevan la fila
+        completa (como la devuelve la API) salvo los de borrado. Los ids que no
+        tienen fila (p. ej. un UPDATE de un id que no existe) no generan evento.
+        """
+        if not ids:
+            return
+        if action == "deleted":
+            rows = {entity_id: None for entity_id in ids}
+        else:
+            rows = {}
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"SELECT * FROM {DatabaseLayer.ENTITY_TABLES[entity]} WHERE id IN ({placeholders})",
+                           list(ids))
+            for row in cursor.fetchall():
+                if not isinstance(row, dict):
+                    row = dict(zip(cursor.column_names, row))
+                rows[row["id"]] = json.dumps(row, default=DatabaseLayer._json_default)
+            if not rows:
+                return
+        cursor.executemany("INSERT INTO eventos (entidad, accion, entidad_id, datos) VALUES (%s, %s, %s, %s)",
+                           [(entity, action, entity_id, data) for entity_id, data in rows.items()])
+        if len(rows) == 1:
+            DatabaseLayer.last_event_id.set(cursor.lastrowid)
+            return
+        # No se supone que los ids sean consecutivos (depende de cómo el conector
+        # ejecute executemany): lastrowid es el id de uno de los eventos, y el
+        # último es el mayor de los de estas filas, que siguen bloqueadas
+        placeholders = ", ".join(["%s"] * len(rows))
+        cursor.execute(f"""SELECT MAX(id) FROM eventos
+                           WHERE id >= %s AND entidad = %s AND accion = %s AND entidad_id IN ({placeholders})""",
+                       [cursor.lastrowid, entity, action, *rows])
+        DatabaseLayer.last_event_id.set(DatabaseLayer._scalar(cursor.fetchone()))
+    
+    @staticmethod
+    def _json_default(value):
+        # Mismo formato que jsonify para las fechas
+        if isinstance(value, datetime):
+            return http_date(value)
+        raise TypeError(f"{type(value).__name__} no es serializable")
+    
+    @staticmethod
+    def _scalar(row):
+        """Primera columna de una fila de fetchone() (cursor normal o dictionary)"""
+        if isinstance(row, dict):
+            return next(iter(row.values()))
+        return row[0]
+    
+    @staticmethod
+    def _insert_batch(query, rows, entity, key_column, key_index):
+        """Inserta un lote con executemany y un solo commit
+
+        Si el lote falla (p. ej. por un ISBN o correo duplicado) se deshace y se
+        inserta fila por fila para saber cuáles fallaron; las demás se confirman.
+        `key_column` es una columna única (la posición `key_index` de cada
+        fila): con ella se buscan los ids insertados para los eventos.
+        Devuelve (insertados, [(índice en el lote, error), ...]).
+        """
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return 0, [(i, "Sin conexión a la base de datos") for i in range(len(rows))]
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, rows)
+                placeholders = ", ".join(["%s"] * len(rows))
+                cursor.execute(f"SELECT id FROM {DatabaseLayer.ENTITY_TABLES[entity]} "
+                               f"WHERE {key_column} IN ({placeholders})",
+                               [row[key_index] for row in rows])
+                inserted_ids = sorted(row[0] for row in cursor.fetchall())
+                DatabaseLayer._record_events(cursor, entity, "created", inserted_ids)
+                connection.commit()
+                return len(rows), []
+            except Error:
+                connection.rollback()
+            
+            errors = []
+            inserted_ids = []
+            for i, row in enumerate(rows):
+                try:
+                    cursor.execute(query, row)
+                    inserted_ids.append(cursor.lastrowid)
+                except Error as e:
+                    errors.append((i, e.msg))
+            DatabaseLayer._record_events(cursor, entity, "created", inserted_ids)
+            connection.commit()
+            return len(rows) - len(errors), errors
+        except Exception as e:
+            print(f"Error: {e}")
+            return 0, [(i, "Error al insertar el lote") for i in range(len(rows))]
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     # ==================== USUARIOS ====================
     
     @staticmethod
@@ -10,6 +148,7 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
             query = "SELECT * FROM usuarios WHERE username = %s"
@@ -21,11 +160,28 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def get_user_by_id(user_id):
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT id, username, nombre, rol FROM usuarios WHERE id = %s", (user_id,))
+            return cursor.fetchone()
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def get_all_users():
         connection = DatabaseConfig.get_connection()
         if not connection:
             return []
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
             cursor.execute("SELECT id, username, nombre, rol FROM usuarios")
@@ -41,6 +197,7 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             query = "INSERT INTO usuarios (username, password, nombre, rol) VALUES (%s, %s, %s, %s)"
@@ -53,11 +210,29 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def update_user_password(user_id, password_hash):
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return False
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("UPDATE usuarios SET password = %s WHERE id = %s", (password_hash, user_id))
+            connection.commit()
+            return True
+        except Exception as e:
+            print(f"Error: {e}")
+            return False
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def delete_user(user_id):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             cursor.execute("DELETE FROM usuarios WHERE id = %s", (user_id,))
@@ -72,13 +247,24 @@ class DatabaseLayer:
     # ==================== LIBROS ====================
     
     @staticmethod
-    def get_all_books():
+    def get_all_books(after_id=None, limit=None, fields=None):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return []
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM libros")
+            # Paginación por cursor (keyset): usa el índice de la PK sin OFFSET
+            query = f"SELECT {DatabaseLayer._columns(fields, DatabaseLayer.BOOK_FIELDS)} FROM libros"
+            params = []
+            if after_id is not None:
+                query += " WHERE id > %s"
+                params.append(after_id)
+            query += " ORDER BY id"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             print(f"Error: {e}")
@@ -86,11 +272,33 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def get_book_stats():
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT COUNT(*) AS total_libros, SUM(disponible) AS libros_disponibles FROM libros")
+            row = cursor.fetchone()
+            # SUM() devuelve DECIMAL; se normaliza a int para el JSON
+            return {
+                "total_libros": int(row["total_libros"] or 0),
+                "libros_disponibles": int(row["libros_disponibles"] or 0)
+            }
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def get_book_by_id(book_id):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
             cursor.execute("SELECT * FROM libros WHERE id = %s", (book_id,))
@@ -101,34 +309,137 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def _escape_like(text):
+        # '!' como carácter de escape (ESCAPE '!') se interpreta igual en MySQL y en SQLite
+        return text.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    
+    @staticmethod
+    def _book_search_filter(q=None, match="prefix", isbn=None, categoria=None, disponible=None):
+        """Cláusula WHERE y parámetros de una búsqueda de libros
+
+        El texto `q` se busca en el título y el autor según `match`:
+        - prefix: empiezan por `q` (rango en idx_libros_titulo / idx_libros_autor)
+        - words: cada palabra de `q` es el inicio de alguna palabra del título o
+          del autor (índice FULLTEXT; las palabras cortas se buscan con LIKE)
+        - contains: `q` aparece en cualquier parte (recorre la tabla)
+        `isbn` es exacto (índice único); `categoria` y `disponible` usan
+        idx_libros_categoria.
+        """
+        conditions = []
+        params = []
+        if q and match == "words":
+            terms = re.findall(r"\w+", q)
+            long_terms = [t for t in terms if len(t) >= DatabaseLayer.FULLTEXT_MIN_TERM]
+            if long_terms:
+                conditions.append("MATCH(titulo, autor) AGAINST(%s IN BOOLEAN MODE)")
+                params.append(" ".join(f"+{t}*" for t in long_terms))
+            for term in terms:
+                if len(term) < DatabaseLayer.FULLTEXT_MIN_TERM:
+                    pattern = f"%{DatabaseLayer._escape_like(term)}%"
+                    conditions.append("(titulo LIKE %s ESCAPE '!' OR autor LIKE %s ESCAPE '!')")
+                    params += [pattern, pattern]
+            if not terms:
+                match = "contains"
+        if q and match in ("prefix", "contains"):
+            pattern = DatabaseLayer._escape_like(q) + "%"
+            if match == "contains":
+                pattern = "%" + pattern
+            conditions.append("(titulo LIKE %s ESCAPE '!' OR autor LIKE %s ESCAPE '!')")
+            params += [pattern, pattern]
+        if isbn:
+            conditions.append("isbn = %s")
+            params.append(isbn)
+        if categoria:
+            conditions.append("categoria = %s")
+            params.append(categoria)
+        if disponible is not None:
+            conditions.append("disponible = %s")
+            params.append(bool(disponible))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    @staticmethod
+    def search_books(q=None, match="prefix", isbn=None, categoria=None, disponible=None,
+                     after_id=None, limit=None, fields=None):
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return []
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            where, params = DatabaseLayer._book_search_filter(q, match, isbn, categoria, disponible)
+            if after_id is not None:
+                where += (" AND" if where else " WHERE") + " id > %s"
+                params.append(after_id)
+            query = f"SELECT {DatabaseLayer._columns(fields, DatabaseLayer.BOOK_FIELDS)} FROM libros{where} ORDER BY id"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def count_search_books(q=None, match="prefix", isbn=None, categoria=None, disponible=None):
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            where, params = DatabaseLayer._book_search_filter(q, match, isbn, categoria, disponible)
+            cursor.execute(f"SELECT COUNT(*) AS total FROM libros{where}", params)
+            return int(cursor.fetchone()["total"])
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def create_book(titulo, autor, isbn, año_publicacion, categoria):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor()
             query = """INSERT INTO libros (titulo, autor, isbn, año_publicacion, categoria, disponible) 
                        VALUES (%s, %s, %s, %s, %s, TRUE)"""
             cursor.execute(query, (titulo, autor, isbn, año_publicacion, categoria))
+            book_id = cursor.lastrowid
+            DatabaseLayer._record_events(cursor, "libro", "created", [book_id])
             connection.commit()
-            return cursor.lastrowid
+            return book_id
         except Exception as e:
             print(f"Error: {e}")
             return None
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def create_books_batch(rows):
+        """Inserta libros en lote; cada fila es (titulo, autor, isbn, año_publicacion, categoria)"""
+        query = """INSERT INTO libros (titulo, autor, isbn, año_publicacion, categoria, disponible)
+                   VALUES (%s, %s, %s, %s, %s, TRUE)"""
+        return DatabaseLayer._insert_batch(query, rows, "libro", "isbn", 2)
+    
     @staticmethod
     def update_book(book_id, titulo, autor, isbn, año_publicacion, categoria):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             query = """UPDATE libros SET titulo = %s, autor = %s, isbn = %s, 
                        año_publicacion = %s, categoria = %s WHERE id = %s"""
             cursor.execute(query, (titulo, autor, isbn, año_publicacion, categoria, book_id))
+            DatabaseLayer._record_events(cursor, "libro", "updated", [book_id])
             connection.commit()
             return True
         except Exception as e:
@@ -142,9 +453,19 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
+            # Los préstamos del libro se borran en cascada (FK): también se publican.
+            # Bloquear el libro impide que se cree un préstamo nuevo mientras tanto
+            cursor.execute("SELECT id FROM libros WHERE id = %s FOR UPDATE", (book_id,))
+            exists = bool(cursor.fetchall())
+            cursor.execute("SELECT id FROM prestamos WHERE libro_id = %s", (book_id,))
+            loan_ids = [row[0] for row in cursor.fetchall()]
             cursor.execute("DELETE FROM libros WHERE id = %s", (book_id,))
+            if exists:
+                DatabaseLayer._record_events(cursor, "prestamo", "deleted", loan_ids)
+                DatabaseLayer._record_events(cursor, "libro", "deleted", [book_id])
             connection.commit()
             return True
         except Exception as e:
@@ -158,9 +479,11 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             cursor.execute("UPDATE libros SET disponible = %s WHERE id = %s", (disponible, book_id))
+            DatabaseLayer._record_events(cursor, "libro", "updated", [book_id])
             connection.commit()
             return True
         except Exception as e:
@@ -172,13 +495,23 @@ class DatabaseLayer:
     # ==================== MIEMBROS ====================
     
     @staticmethod
-    def get_all_members():
+    def get_all_members(after_id=None, limit=None, fields=None):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return []
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM miembros")
+            query = f"SELECT {DatabaseLayer._columns(fields, DatabaseLayer.MEMBER_FIELDS)} FROM miembros"
+            params = []
+            if after_id is not None:
+                query += " WHERE id > %s"
+                params.append(after_id)
+            query += " ORDER BY id"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             print(f"Error: {e}")
@@ -186,11 +519,31 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def get_member_stats():
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT COUNT(*) AS total_miembros FROM miembros")
+            row = cursor.fetchone()
+            return {
+                "total_miembros": int(row["total_miembros"] or 0)
+            }
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def get_member_by_id(member_id):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
             cursor.execute("SELECT * FROM miembros WHERE id = %s", (member_id,))
@@ -206,27 +559,38 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor()
             query = "INSERT INTO miembros (nombre, apellido, correo, telefono) VALUES (%s, %s, %s, %s)"
             cursor.execute(query, (nombre, apellido, correo, telefono))
+            member_id = cursor.lastrowid
+            DatabaseLayer._record_events(cursor, "miembro", "created", [member_id])
             connection.commit()
-            return cursor.lastrowid
+            return member_id
         except Exception as e:
             print(f"Error: {e}")
             return None
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def create_members_batch(rows):
+        """Inserta miembros en lote; cada fila es (nombre, apellido, correo, telefono)"""
+        query = "INSERT INTO miembros (nombre, apellido, correo, telefono) VALUES (%s, %s, %s, %s)"
+        return DatabaseLayer._insert_batch(query, rows, "miembro", "correo", 2)
+    
     @staticmethod
     def update_member(member_id, nombre, apellido, correo, telefono):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             query = "UPDATE miembros SET nombre = %s, apellido = %s, correo = %s, telefono = %s WHERE id = %s"
             cursor.execute(query, (nombre, apellido, correo, telefono, member_id))
+            DatabaseLayer._record_events(cursor, "miembro", "updated", [member_id])
             connection.commit()
             return True
         except Exception as e:
@@ -240,9 +604,17 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
+            cursor.execute("SELECT id FROM miembros WHERE id = %s FOR UPDATE", (member_id,))
+            exists = bool(cursor.fetchall())
+            cursor.execute("SELECT id FROM prestamos WHERE miembro_id = %s", (member_id,))
+            loan_ids = [row[0] for row in cursor.fetchall()]
             cursor.execute("DELETE FROM miembros WHERE id = %s", (member_id,))
+            if exists:
+                DatabaseLayer._record_events(cursor, "prestamo", "deleted", loan_ids)
+                DatabaseLayer._record_events(cursor, "miembro", "deleted", [member_id])
             connection.commit()
             return True
         except Exception as e:
@@ -254,13 +626,32 @@ class DatabaseLayer:
     # ==================== PRÉSTAMOS ====================
     
     @staticmethod
-    def get_all_loans():
+    def get_all_loans(after_id=None, after_date=None, limit=None, fields=None):
+        """Préstamos, los más recientes primero
+
+        El cursor es (after_date, after_id): la fecha y el id del último
+        préstamo de la página anterior. Lleva la fecha para no depender de que
+        ese préstamo siga existiendo; si solo se indica after_id, no se filtra.
+        """
         connection = DatabaseConfig.get_connection()
         if not connection:
             return []
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM prestamos ORDER BY fecha_prestamo DESC")
+            if fields and "fecha_prestamo" not in fields:
+                fields = list(fields) + ["fecha_prestamo"]  # es parte del cursor
+            query = f"SELECT {DatabaseLayer._columns(fields, DatabaseLayer.LOAN_FIELDS)} FROM prestamos"
+            params = []
+            if after_id is not None and after_date is not None:
+                # El orden es por fecha (más recientes primero); el id desempata
+                query += " WHERE fecha_prestamo < %s OR (fecha_prestamo = %s AND id < %s)"
+                params.extend([after_date, after_date, after_id])
+            query += " ORDER BY fecha_prestamo DESC, id DESC"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             print(f"Error: {e}")
@@ -268,11 +659,68 @@ class DatabaseLayer:
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
+    @staticmethod
+    def get_all_loans_detailed(after_id=None, after_date=None, limit=None):
+        """Préstamos con el título del libro y el nombre del miembro (un solo JOIN)
+
+        Se pagina con el mismo cursor que get_all_loans.
+        """
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return []
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            query = """SELECT p.*, l.titulo AS libro_titulo,
+                              m.nombre AS miembro_nombre, m.apellido AS miembro_apellido
+                       FROM prestamos p
+                       LEFT JOIN libros l ON l.id = p.libro_id
+                       LEFT JOIN miembros m ON m.id = p.miembro_id"""
+            params = []
+            if after_id is not None and after_date is not None:
+                query += " WHERE p.fecha_prestamo < %s OR (p.fecha_prestamo = %s AND p.id < %s)"
+                params.extend([after_date, after_date, after_id])
+            query += " ORDER BY p.fecha_prestamo DESC, p.id DESC"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def get_loan_stats():
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("""SELECT COUNT(*) AS total_prestamos,
+                                     SUM(estado = 'Activo') AS prestamos_activos
+                              FROM prestamos""")
+            row = cursor.fetchone()
+            # SUM() devuelve DECIMAL; se normaliza a int para el JSON
+            return {
+                "total_prestamos": int(row["total_prestamos"] or 0),
+                "prestamos_activos": int(row["prestamos_activos"] or 0)
+            }
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
     @staticmethod
     def get_loan_by_id(loan_id):
         connection = DatabaseConfig.get_connection()
         if not connection:
             return None
+        cursor = None
         try:
             cursor = connection.cursor(dictionary=True)
             cursor.execute("SELECT * FROM prestamos WHERE id = %s", (loan_id,))
@@ -285,35 +733,81 @@ class DatabaseLayer:
     
     @staticmethod
     def create_loan(libro_id, miembro_id):
+        """Presta un libro en una sola transacción
+
+        Bloquea la fila del libro (SELECT ... FOR UPDATE), inserta el préstamo
+        y marca el libro como no disponible; dos préstamos simultáneos del mismo
+        libro no pueden pasar ambos. La existencia del miembro la valida la FK.
+        Devuelve (loan_id, None) o (None, mensaje de error).
+        """
         connection = DatabaseConfig.get_connection()
         if not connection:
-            return None
+            return None, DatabaseLayer.LOAN_ERROR
+        cursor = None
         try:
             cursor = connection.cursor()
+            cursor.execute("SELECT disponible FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+            book = cursor.fetchone()
+            if not book:
+                connection.rollback()
+                return None, DatabaseLayer.BOOK_NOT_FOUND
+            if not book[0]:
+                connection.rollback()
+                return None, DatabaseLayer.BOOK_UNAVAILABLE
+            
             query = "INSERT INTO prestamos (libro_id, miembro_id, estado) VALUES (%s, %s, 'Activo')"
             cursor.execute(query, (libro_id, miembro_id))
+            loan_id = cursor.lastrowid
+            cursor.execute("UPDATE libros SET disponible = FALSE WHERE id = %s", (libro_id,))
+            DatabaseLayer._record_events(cursor, "prestamo", "created", [loan_id])
+            DatabaseLayer._record_events(cursor, "libro", "updated", [libro_id])
             connection.commit()
-            return cursor.lastrowid
+            return loan_id, None
+        except IntegrityError as e:
+            # close_connection() deshace la transacción pendiente al devolverla al pool
+            if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+                return None, DatabaseLayer.MEMBER_NOT_FOUND
+            print(f"Error: {e}")
+            return None, DatabaseLayer.LOAN_ERROR
         except Exception as e:
             print(f"Error: {e}")
-            return None
+            return None, DatabaseLayer.LOAN_ERROR
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
     @staticmethod
     def return_loan(loan_id):
+        """Devuelve un préstamo y libera el libro en una sola transacción
+
+        Devuelve (libro_id, None) o (None, mensaje de error).
+        """
         connection = DatabaseConfig.get_connection()
         if not connection:
-            return False
+            return None, DatabaseLayer.LOAN_ERROR
+        cursor = None
         try:
             cursor = connection.cursor()
-            query = "UPDATE prestamos SET fecha_devolucion = NOW(), estado = 'Devuelto' WHERE id = %s"
+            cursor.execute("SELECT libro_id, estado FROM prestamos WHERE id = %s FOR UPDATE", (loan_id,))
+            loan = cursor.fetchone()
+            if not loan:
+                connection.rollback()
+                return None, DatabaseLayer.LOAN_NOT_FOUND
+            if loan[1] != 'Activo':
+                connection.rollback()
+                return None, DatabaseLayer.LOAN_ALREADY_RETURNED
+            
+            # Préstamo y libro se actualizan en la misma sentencia
+            query = """UPDATE prestamos p JOIN libros l ON l.id = p.libro_id
+                       SET p.fecha_devolucion = NOW(), p.estado = 'Devuelto', l.disponible = TRUE
+                       WHERE p.id = %s"""
             cursor.execute(query, (loan_id,))
+            DatabaseLayer._record_events(cursor, "prestamo", "updated", [loan_id])
+            DatabaseLayer._record_events(cursor, "libro", "updated", [loan[0]])
             connection.commit()
-            return True
+            return loan[0], None
         except Exception as e:
             print(f"Error: {e}")
-            return False
+            return None, DatabaseLayer.LOAN_ERROR
         finally:
             DatabaseConfig.close_connection(connection, cursor)
     
@@ -322,13 +816,134 @@ class DatabaseLayer:
         connection = DatabaseConfig.get_connection()
         if not connection:
             return False
+        cursor = None
         try:
             cursor = connection.cursor()
             cursor.execute("DELETE FROM prestamos WHERE id = %s", (loan_id,))
+            if cursor.rowcount:
+                DatabaseLayer._record_events(cursor, "prestamo", "deleted", [loan_id])
             connection.commit()
             return True
         except Exception as e:
             print(f"Error: {e}")
             return False
         finally:
-            DatabaseConfig.close_connection(connection, cursor)
\ No newline at end of file
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    # ==================== EVENTOS ====================
+    
+    @staticmethod
+    def get_events(after_id, limit):
+        """Eventos del outbox con id mayor que `after_id`, en orden"""
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("""SELECT id, entidad, accion, entidad_id, datos FROM eventos
+                              WHERE id > %s ORDER BY id LIMIT %s""", (after_id, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def wait_for_events(after_id, before_id):
+        """Ids del outbox entre `after_id` y `before_id` (sin incluirlos)
+
+        Es una lectura con bloqueo: si una transacción sin confirmar tiene uno
+        de esos ids, espera a que termine, como mucho EVENTS_LOCK_WAIT segundos
+        (innodb_lock_wait_timeout de la sesión; el de MySQL es 50 s). Un id que
+        no aparece es de una transacción deshecha. Devuelve None si la espera
+        no terminó (o hubo otro error).
+        """
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SET SESSION innodb_lock_wait_timeout = %s", (ServiceConfig.EVENTS_LOCK_WAIT,))
+            try:
+                cursor.execute("SELECT id FROM eventos WHERE id > %s AND id < %s FOR UPDATE", (after_id, before_id))
+                ids = [row[0] for row in cursor.fetchall()]
+            except Exception as e:
+                print(f"Error: {e}")
+                ids = None
+            connection.rollback()
+            cursor.execute("SET SESSION innodb_lock_wait_timeout = DEFAULT")
+            return ids
+        except Exception as e:
+            print(f"Error: {e}")
+            # La conexión podría conservar el timeout corto: no vuelve al pool
+            if cursor:
+                cursor.close()
+            DatabaseConfig.get_pool().discard(connection)
+            connection = cursor = None
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def get_event_ids(ranges):
+        """Ids del outbox dentro de los rangos [(primero, último), ...]"""
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            condition = " OR ".join(["id BETWEEN %s AND %s"] * len(ranges))
+            cursor.execute(f"SELECT id FROM eventos WHERE {condition}",
+                           [bound for id_range in ranges for bound in id_range])
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def get_event_bounds():
+        """(id mínimo, id máximo) del outbox; (None, None) si está vacío"""
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return None
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT MIN(id), MAX(id) FROM eventos")
+            return cursor.fetchone()
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+    
+    @staticmethod
+    def prune_events():
+        """Borra los eventos más viejos que EVENTS_RETENTION_HOURS (conserva siempre el último)"""
+        connection = DatabaseConfig.get_connection()
+        if not connection:
+            return 0
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""DELETE FROM eventos
+                              WHERE created_at < NOW() - INTERVAL %s HOUR
+                                AND id < (SELECT last_id FROM (SELECT MAX(id) AS last_id FROM eventos) AS t)""",
+                           (ServiceConfig.EVENTS_RETENTION_HOURS,))
+            connection.commit()
+            return cursor.rowcount
+        except Exception as e:
+            print(f"Error: {e}")
+            return 0
+        finally:
+            DatabaseConfig.close_connection(connection, cursor)
+
+
+# Un span por llamada a cada método público (db.get_all_books, db.create_loan...)
+trace_static_methods(DatabaseLayer, "db.")
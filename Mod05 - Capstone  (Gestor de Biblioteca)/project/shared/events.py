@@ -0,0 +1,124 @@
+import json
+import time
+
+from flask import Response, request, stream_with_context
+
+from shared.config import ServiceConfig
+from shared.database import DatabaseLayer
+
+
+def format_event(event, event_id, data=""):
+    """Un mensaje Server-Sent Events"""
+    return f"event: {event}\nid: {event_id}\ndata: {data}\n\n"
+
+
+def event_stream(entities, after_id):
+    """Genera los eventos del outbox de `entities` con id mayor que `after_id`
+
+    Los ids son globales (un solo outbox para todas las entidades). Además de
+    los eventos de `entities` se envían:
+
+    - `reset`: el cliente no tiene cursor o el suyo ya no está en el outbox;
+      debe recargar el listado completo y seguir desde el id del reset.
+    - `cursor`: se avanzó sobre eventos de otras entidades; permite al cliente
+      saber hasta dónde está al día.
+
+    Un id que falta puede ser de una transacción aún sin confirmar: se espera
+    por ella con una lectura con bloqueo (wait_for_events). Si el id sigue sin
+    aparecer (transacción deshecha, o la espera no terminó) se salta, pero se
+    vigila durante EVENTS_GAP_WATCH; si se confirma tarde se envía `reset`,
+    porque el cliente ya avanzó sin ese evento.
+    """
+    bounds = DatabaseLayer.get_event_bounds()
+    if bounds is None:
+        return
+    first_id, last_id = bounds
+    if (after_id is None or last_id is None
+            or after_id < first_id - 1 or after_id > last_id):
+        after_id = last_id or 0
+        yield format_event("reset", after_id)
+
+    cursor = after_id
+    skipped = []  # [(primer id, último id, momento)] de los huecos saltados
+    late_ids = set()  # ids saltados que ya se confirmaron (y provocaron un reset)
+    last_sent = time.monotonic()
+    last_prune = 0
+    while True:
+        if skipped:
+            now = time.monotonic()
+            skipped = [gap for gap in skipped if now - gap[2] < ServiceConfig.EVENTS_GAP_WATCH]
+            found = DatabaseLayer.get_event_ids([(first, last) for first, last, _ in skipped]) if skipped else []
+            if found is None:
+                return
+            if set(found) - late_ids:
+                late_ids.update(found)
+                yield format_event("reset", cursor)
+                last_sent = time.monotonic()
+            if not skipped:
+                late_ids.clear()
+
+        events = DatabaseLayer.get_events(cursor, ServiceConfig.EVENTS_BATCH)
+        if events is None:
+            return
+        advanced = False
+        reread = False
+        for event in events:
+            if event["id"] != cursor + 1:
+                committed = DatabaseLayer.wait_for_events(cursor, event["id"])
+                if committed:
+                    # Se confirmaron mientras se esperaba: se vuelven a leer en orden
+                    reread = True
+                    break
+                skipped.append((cursor + 1, event["id"] - 1, time.monotonic()))
+            cursor = event["id"]
+            advanced = True
+            if event["entidad"] in entities:
+                data = json.dumps({"accion": event["accion"], "id": event["entidad_id"],
+                                   "datos": json.loads(event["datos"]) if event["datos"] else None})
+                yield format_event(event["entidad"], cursor, data)
+                advanced = False
+                last_sent = time.monotonic()
+
+        if advanced:
+            yield format_event("cursor", cursor)
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= ServiceConfig.EVENTS_KEEPALIVE:
+            # Mantiene viva la conexión (y detecta antes si el cliente se fue)
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+
+        if time.monotonic() - last_prune >= 3600:
+            DatabaseLayer.prune_events()
+            last_prune = time.monotonic()
+
+        if not reread and len(events) < ServiceConfig.EVENTS_BATCH:
+            time.sleep(ServiceConfig.EVENTS_POLL_INTERVAL)
+
+
+def publish_events(app, *entities):
+    """Registra en `app` GET /events (stream SSE de `entities`) y la cabecera X-Event-Id
+
+    X-Event-Id es el id del último evento que generó la petición; el gateway
+    lo usa para esperar a verlo en su modelo de lectura antes de redirigir.
+    """
+    @app.before_request
+    def reset_event_id():
+        DatabaseLayer.last_event_id.set(None)
+
+    @app.after_request
+    def add_event_id(response):
+        event_id = DatabaseLayer.last_event_id.get()
+        if event_id is not None:
+            response.headers['X-Event-Id'] = str(event_id)
+        return response
+
+    @app.route('/events', methods=['GET'])
+    def events():
+        after_id = request.args.get('after_id', request.headers.get('Last-Event-ID'))
+        try:
+            after_id = int(after_id) if after_id else None
+        except ValueError:
+            after_id = None
+        return Response(stream_with_context(event_stream(entities, after_id)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
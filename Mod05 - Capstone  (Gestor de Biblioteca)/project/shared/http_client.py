@@ -0,0 +1,143 @@
+import contextvars
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from shared.circuit_breaker import CircuitBreaker, CircuitOpenError
+from shared.config import ServiceConfig
+from shared.tracing import client_span, with_traceparent
+
+# Token del usuario de la petición en curso. El gateway lo fija al empezar
+# cada petición y los clientes lo envían como Authorization: Bearer
+request_token = contextvars.ContextVar("request_token", default=None)
+
+
+def with_token(kwargs):
+    """Añade la cabecera Authorization con el token actual, si hay uno"""
+    token = request_token.get()
+    if token:
+        kwargs["headers"] = {"Authorization": f"Bearer {token}", **(kwargs.get("headers") or {})}
+    return kwargs
+
+
+class ServiceClient:
+    """Cliente HTTP hacia un microservicio con conexiones keep-alive
+
+    Mantiene un `requests.Session` por proceso con un pool de conexiones
+    reutilizables, aplica un timeout por defecto y reintenta con backoff
+    las lecturas (GET, HEAD, OPTIONS). Las escrituras (POST, PUT, DELETE)
+    solo se reintentan si falló al conectar, es decir, antes de enviarse:
+    PUT /loans/<id>/return o un DELETE repetidos responden 400 o 404 aunque
+    el primer intento haya funcionado.
+
+    Con un `breaker` (CircuitBreaker), si el servicio está caído o lento las
+    llamadas fallan al instante con CircuitOpenError en lugar de esperar.
+    """
+
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+    def __init__(self, base_url, pool_size=None, timeout=None, retries=None, backoff=None,
+                 breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size or ServiceConfig.HTTP_POOL_SIZE
+        self.timeout = timeout or ServiceConfig.REQUEST_TIMEOUT
+        self.retries = ServiceConfig.HTTP_RETRIES if retries is None else retries
+        self.backoff = ServiceConfig.HTTP_BACKOFF if backoff is None else backoff
+        self.breaker = breaker
+        self.name = breaker.name if breaker is not None else self.base_url
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=self.IDEMPOTENT_METHODS,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                # Los sockets heredados de un fork no se comparten entre procesos
+                if self._session is None or self._session_pid != pid:
+                    self._session = self._create_session()
+                    self._session_pid = pid
+        return self._session
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with_token(kwargs)
+        with client_span(self.name, method, path) as call:
+            with_traceparent(kwargs, call)
+            response = self._request(method, path, **kwargs)
+            call.set_tag("http.status_code", response.status_code)
+            return response
+
+    def _request(self, method, path, **kwargs):
+        if self.breaker is None:
+            return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+        ticket = self.breaker.before_call()
+        if ticket.probe:
+            ticket = self.breaker.probe_finished(self._probe())
+            if ticket is None:
+                raise CircuitOpenError(self.breaker.name, self.breaker.open_seconds)
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except Exception:
+            self.breaker.after_call(ticket, time.monotonic() - start, success=False)
+            raise
+        self.breaker.after_call(ticket, time.monotonic() - start, success=response.status_code < 500)
+        return response
+
+    def _probe(self):
+        """Consulta /health sin reintentos (circuito abierto)"""
+        try:
+            response = requests.get(f"{self.base_url}/health", timeout=ServiceConfig.BREAKER_PROBE_TIMEOUT)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Un cliente (con su circuit breaker) por microservicio definido en ServiceConfig
+auth_service = ServiceClient(ServiceConfig.AUTH_SERVICE_URL, breaker=CircuitBreaker("auth"))
+books_service = ServiceClient(ServiceConfig.BOOKS_SERVICE_URL, breaker=CircuitBreaker("books"))
+members_service = ServiceClient(ServiceConfig.MEMBERS_SERVICE_URL, breaker=CircuitBreaker("members"))
+loans_service = ServiceClient(ServiceConfig.LOANS_SERVICE_URL, breaker=CircuitBreaker("loans"))
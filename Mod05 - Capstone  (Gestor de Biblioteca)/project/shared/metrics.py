@@ -0,0 +1,177 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from shared.config import ServiceConfig
+
+# Límites (segundos) de los buckets de los histogramas de latencia
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Histograma acumulativo por combinación de etiquetas (formato de Prometheus)
+
+    `observe` guarda cada valor en su bucket; el texto expone, por cada
+    bucket, cuántos valores fueron menores o iguales a su límite, además de
+    la suma y el conteo, de donde se calculan percentiles y promedios.
+    """
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Un contador por bucket más el de +Inf, la suma y el conteo
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """Series actuales: {etiquetas: [conteos por bucket, suma, conteo]} (copia)"""
+        with self._lock:
+            return {key: [[*counts], total, count] for key, (counts, total, count) in self._series.items()}
+
+    def render(self, series=None):
+        """Texto de las series del proceso, o de `series` (p. ej. sumadas entre workers)"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        series = sorted((series if series is not None else self.snapshot()).items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total:.6f}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Métricas expuestas en GET /metrics
+
+    Sin METRICS_DIR son las del proceso que responde. Con gunicorn cada worker
+    tiene las suyas, así que cada scrape vería un worker distinto. Con
+    METRICS_DIR (start_services.py --production lo fija), cada proceso guarda
+    sus series en `<servicio>-<pid>.json` dentro de ese directorio cada
+    METRICS_WRITE_INTERVAL segundos. GET /metrics suma las de todos los
+    workers del servicio. Los archivos de workers que ya terminaron se siguen
+    sumando, para que los contadores no retrocedan.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.service = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def share(self, service):
+        """Con METRICS_DIR, publica las series del proceso para los demás workers"""
+        self.service = service
+        if not ServiceConfig.METRICS_DIR or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            os.makedirs(ServiceConfig.METRICS_DIR, exist_ok=True)
+            threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True).start()
+            self._writer_pid = os.getpid()
+
+    def _path(self, pid):
+        return os.path.join(ServiceConfig.METRICS_DIR, f"{self.service}-{pid}.json")
+
+    def _write(self):
+        data = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                for metric in self._metrics}
+        path = self._path(os.getpid())
+        # Se escribe aparte y se reemplaza: quien lee nunca ve un archivo a medias
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def _write_loop(self):
+        while True:
+            time.sleep(ServiceConfig.METRICS_WRITE_INTERVAL)
+            try:
+                self._write()
+            except OSError as e:
+                print(f"Error al guardar las métricas: {e}")
+
+    def _merged(self):
+        """Series de todos los workers del servicio, sumadas: {métrica: series}"""
+        self._write()
+        merged = {metric.name: {} for metric in self._metrics}
+        for path in glob.glob(self._path("*")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # p. ej. borrado mientras se leía
+            for name, entries in data.items():
+                series = merged.get(name)
+                if series is None:
+                    continue
+                for key, (counts, total, count) in entries:
+                    key = tuple(key)
+                    current = series.get(key)
+                    if current is None:
+                        series[key] = [counts, total, count]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], counts)]
+                        current[1] += total
+                        current[2] += count
+        return merged
+
+    def render(self):
+        merged = None
+        if ServiceConfig.METRICS_DIR and self.service:
+            self.share(self.service)  # un worker creado con fork no hereda el hilo
+            try:
+                merged = self._merged()
+            except OSError as e:
+                print(f"Error al leer las métricas de los workers: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged[metric.name] if merged else None))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Duración de las peticiones que atiende el proceso, por ruta (la regla, no la URL)
+request_duration = registry.histogram(
+    "http_server_request_duration_seconds", "Duración de las peticiones atendidas",
+    ("method", "route", "status"))
+
+# Duración de las operaciones internas: métodos de DatabaseLayer, conexiones a
+# MySQL y llamadas HTTP a otros servicios (una serie por nombre de span)
+span_duration = registry.histogram(
+    "span_duration_seconds", "Duración de las operaciones internas (spans)", ("span",))
@@ -0,0 +1,216 @@
+"""
+Migraciones versionadas del esquema de MySQL
+
+Cada archivo migrations/NNNN_descripcion.py es una versión del esquema: el
+número es la versión y el módulo define `up(m)` y `down(m)`, que reciben un
+Migrator. La tabla schema_migrations guarda las versiones aplicadas.
+
+En MySQL cada sentencia DDL hace commit implícito, así que una migración no
+es atómica. Por eso las operaciones de Migrator son idempotentes (crear un
+índice que ya existe no falla) y una migración que se cortó a la mitad se
+puede volver a aplicar.
+
+Uso (desde start_services.py):
+    python start_services.py migrate              # aplica las pendientes
+    python start_services.py migrate --to 1       # revierte hasta la versión 1
+    python start_services.py migrate --status
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+
+from mysql.connector import Error
+
+from shared.config import DatabaseConfig
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+
+class Migration:
+    """Un archivo de migrations/ (el módulo se carga al usarlo)"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self._module = None
+
+    @property
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f"migrations.m{self.version:04d}", self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    def __str__(self):
+        return f"{self.version:04d}_{self.name}"
+
+
+def discover():
+    """Migraciones de migrations/ ordenadas por versión"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(MIGRATIONS_DIR, filename)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Hay dos migraciones con el mismo número de versión")
+    return migrations
+
+
+class Migrator:
+    """Operaciones de esquema que usan las migraciones"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql, params)
+
+    def indexes(self, table):
+        """{nombre: (columnas, único, tipo)} de los índices de una tabla"""
+        self.cursor.execute("""SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE, INDEX_TYPE
+                               FROM information_schema.STATISTICS
+                               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                               ORDER BY INDEX_NAME, SEQ_IN_INDEX""", (table,))
+        indexes = {}
+        for name, column, non_unique, index_type in self.cursor.fetchall():
+            columns, _, _ = indexes.get(name, ((), None, None))
+            indexes[name] = (columns + (column,), not non_unique, index_type)
+        return indexes
+
+    def create_index(self, table, name, columns, unique=False, fulltext=False):
+        """Crea el índice salvo que ya exista uno con ese nombre o uno equivalente
+
+        Equivalente: mismas columnas en el mismo orden, del mismo tipo, y único
+        si se pide único (p. ej. el que MySQL crea para un UNIQUE de columna).
+        """
+        index_type = "FULLTEXT" if fulltext else "BTREE"
+        for existing, (existing_columns, existing_unique, existing_type) in self.indexes(table).items():
+            if existing == name or (tuple(columns) == existing_columns and index_type == existing_type
+                                    and (existing_unique or not unique)):
+                return False
+        kind = "UNIQUE " if unique else "FULLTEXT " if fulltext else ""
+        self.execute(f"CREATE {kind}INDEX `{name}` ON `{table}` ({', '.join(f'`{c}`' for c in columns)})")
+        return True
+
+    def drop_index(self, table, name):
+        if name not in self.indexes(table):
+            return False
+        self.execute(f"DROP INDEX `{name}` ON `{table}`")
+        return True
+
+
+def _ensure_table(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                          version INT PRIMARY KEY,
+                          nombre VARCHAR(200) NOT NULL,
+                          applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                      )""")
+
+
+def applied_versions(connection):
+    cursor = connection.cursor()
+    try:
+        _ensure_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def _connect():
+    if DatabaseConfig.BACKEND != "mysql":
+        raise RuntimeError(f"Las migraciones son para MySQL; el backend {DatabaseConfig.BACKEND} "
+                           "crea su esquema completo al abrir la base")
+    connection = DatabaseConfig.create_connection()
+    if connection is None:
+        raise RuntimeError("No se pudo conectar a MySQL")
+    return connection
+
+
+def pending():
+    """Migraciones sin aplicar (None si no hay conexión a MySQL)"""
+    try:
+        connection = _connect()
+    except RuntimeError:
+        return None
+    try:
+        applied = applied_versions(connection)
+        return [m for m in discover() if m.version not in applied]
+    except Error as e:
+        print(f"Error: {e}")
+        return None
+    finally:
+        connection.close()
+
+
+def migrate(target=None, log=print):
+    """Lleva el esquema a la versión `target` (por defecto, la última)
+
+    Aplica con `up` las versiones pendientes hasta `target` y revierte con
+    `down`, de la más nueva a la más vieja, las aplicadas por encima de él.
+    Devuelve la cantidad de migraciones ejecutadas.
+    """
+    migrations = discover()
+    if target is None:
+        target = migrations[-1].version if migrations else 0
+    connection = _connect()
+    try:
+        applied = applied_versions(connection)
+        unknown = sorted(applied - {m.version for m in migrations})
+        if unknown:
+            raise RuntimeError(f"La base tiene versiones que no están en migrations/: {unknown}")
+
+        steps = [("up", m) for m in migrations if m.version <= target and m.version not in applied]
+        steps += [("down", m) for m in reversed(migrations) if m.version > target and m.version in applied]
+        migrator = Migrator(connection)
+        for direction, migration in steps:
+            log(f"{'⬆️ ' if direction == 'up' else '⬇️ '} {direction:<4} {migration}")
+            getattr(migration.module, direction)(migrator)
+            if direction == "up":
+                migrator.execute("INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)",
+                                 (migration.version, migration.name))
+            else:
+                migrator.execute("DELETE FROM schema_migrations WHERE version = %s", (migration.version,))
+            connection.commit()
+        migrator.cursor.close()
+        return len(steps)
+    finally:
+        connection.close()
+
+
+def status(log=print):
+    connection = _connect()
+    try:
+        applied = applied_versions(connection)
+    finally:
+        connection.close()
+    for migration in discover():
+        log(f"  {'✅' if migration.version in applied else '⏳'} {migration}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python start_services.py migrate",
+                                     description="Migraciones del esquema de MySQL")
+    parser.add_argument("--to", type=int, metavar="VERSION",
+                        help="Versión destino (menor que la actual: revierte). Por defecto, la última")
+    parser.add_argument("--status", action="store_true", help="Muestra las migraciones aplicadas y pendientes")
+    args = parser.parse_args(argv)
+    try:
+        if args.status:
+            status()
+            return 0
+        count = migrate(args.to)
+        print(f"✅ Esquema al día ({count} migraciones ejecutadas)" if count else "✅ Nada que migrar")
+        return 0
+    except (RuntimeError, Error) as e:
+        print(f"Error: {e}")
+        return 1
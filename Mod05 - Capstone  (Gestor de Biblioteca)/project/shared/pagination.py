@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from flask import jsonify
+
+from shared.config import ServiceConfig
+
+
+def parse_list_args(args, allowed_fields):
+    """Lee `after_id`, `limit`, `fields` y `count` de la query string
+
+    Devuelve (after_id, limit, fields, count). Lanza ValueError con un mensaje
+    apto para el cliente si algún parámetro es inválido.
+    """
+    after_id = args.get('after_id')
+    if after_id is not None:
+        try:
+            after_id = int(after_id)
+        except ValueError:
+            raise ValueError("after_id debe ser un entero")
+
+    limit = args.get('limit', ServiceConfig.PAGE_SIZE_DEFAULT)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("limit debe ser un entero")
+    if limit < 1 or limit > ServiceConfig.PAGE_SIZE_MAX:
+        raise ValueError(f"limit debe estar entre 1 y {ServiceConfig.PAGE_SIZE_MAX}")
+
+    fields = None
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+
+    count = args.get('count', '1') not in ('0', 'false')
+    return after_id, limit, fields, count
+
+
+def parse_after_date(args):
+    """Lee `after_date` (ISO 8601) de la query string; None si no viene
+
+    Es la segunda parte del cursor de los listados ordenados por fecha.
+    Lanza ValueError con un mensaje apto para el cliente si es inválido.
+    """
+    after_date = args.get('after_date')
+    if after_date is None:
+        return None
+    try:
+        return datetime.fromisoformat(after_date)
+    except ValueError:
+        raise ValueError("after_date debe ser una fecha ISO 8601")
+
+
+def paginated_response(rows, limit, total=None, date_field=None):
+    """Respuesta JSON de una página con sus cabeceras de paginación
+
+    - `X-Total-Count`: total de registros (si se calculó)
+    - `X-Next-After-Id`: cursor de la página siguiente (solo si puede haberla)
+    - `X-Next-After-Date`: con `date_field`, la fecha del último registro, que
+      completa el cursor de los listados ordenados por esa fecha
+    """
+    response = jsonify(rows)
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    if len(rows) == limit:
+        response.headers['X-Next-After-Id'] = str(rows[-1]['id'])
+        if date_field:
+            response.headers['X-Next-After-Date'] = rows[-1][date_field].isoformat()
+    return response
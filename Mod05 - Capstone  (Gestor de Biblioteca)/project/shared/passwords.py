@@ -0,0 +1,119 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from shared.config import ServiceConfig
+
+
+class HashPoolBusy(Exception):
+    """El pool de hashing tiene la cola llena o no respondió a tiempo"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__("servicio de autenticación ocupado")
+
+
+class PasswordHasher:
+    """Verifica y genera hashes de contraseña en un pool de hilos acotado
+
+    scrypt/pbkdf2 son costosos a propósito. Aquí corren en `workers` hilos
+    (hashlib libera el GIL mientras calcula), así que como mucho ocupan
+    `workers` núcleos por proceso. Hasta `queue_max` peticiones esperan
+    turno; con la cola llena se rechazan al instante con HashPoolBusy.
+
+    Si `method` cambia (p. ej. más iteraciones), la contraseña se vuelve a
+    hashear con los parámetros nuevos la próxima vez que el usuario entra.
+    """
+
+    def __init__(self, method=None, workers=None, queue_max=None, timeout=None):
+        self.method = method or ServiceConfig.PASSWORD_HASH_METHOD
+        self.workers = workers or ServiceConfig.HASH_WORKERS
+        self.queue_max = ServiceConfig.HASH_QUEUE_MAX if queue_max is None else queue_max
+        self.timeout = timeout or ServiceConfig.HASH_TIMEOUT
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._in_use = 0  # en cola + calculando, protegido por _lock
+        self._rejected = 0
+        # Hash de una contraseña vacía con `method`. Se calcula una sola vez,
+        # al crear el hasher, y no en el hilo de una petición
+        self._reference_hash = generate_password_hash("", method=self.method)
+
+    def _pool(self):
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                # Los hilos no sobreviven a un fork: cada proceso crea su pool
+                if self._executor is None or self._pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="hash")
+                    self._in_use = 0
+                    self._pid = pid
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_use -= 1
+
+    def _run(self, fn, *args):
+        executor = self._pool()
+        with self._lock:
+            if self._in_use >= self.workers + self.queue_max:
+                self._rejected += 1
+                raise HashPoolBusy(self.timeout)
+            self._in_use += 1
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._rejected += 1
+            raise HashPoolBusy(self.timeout)
+
+    def needs_rehash(self, stored_hash):
+        # werkzeug guarda el método completo ("pbkdf2" -> "pbkdf2:sha256:600000"):
+        # se compara con el prefijo de un hash real, no con `method` tal cual
+        return stored_hash.split("$", 1)[0] != self._reference_hash.split("$", 1)[0]
+
+    def _verify(self, stored_hash, password):
+        if not check_password_hash(stored_hash, password):
+            return False, None
+        if self.needs_rehash(stored_hash):
+            return True, generate_password_hash(password, method=self.method)
+        return True, None
+
+    def verify(self, stored_hash, password):
+        """Devuelve (válida, hash nuevo o None si no hay que actualizarlo)"""
+        return self._run(self._verify, stored_hash, password)
+
+    def verify_unknown_user(self, password):
+        """Mismo costo que verify() para un usuario que no existe
+
+        Así el tiempo de respuesta no revela qué nombres de usuario existen.
+        """
+        self._run(check_password_hash, self._reference_hash, password)
+        return False, None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def stats(self):
+        self._pool()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_max": self.queue_max,
+                "in_use": self._in_use,
+                "rejected": self._rejected,
+            }
+
+
+# Uno por proceso del servicio de autenticación
+password_hasher = PasswordHasher()
@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import deque
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones reutilizables (uno por proceso)
+
+    Las conexiones se crean bajo demanda hasta `size`. Si todas están en uso,
+    `acquire()` espera hasta `timeout` segundos a que alguna se libere y, si no,
+    devuelve None (igual que `get_connection()` cuando MySQL no responde).
+
+    Un ping en cada préstamo costaría un viaje de ida y vuelta por consulta,
+    así que solo se verifican las conexiones que estuvieron ociosas al menos
+    `health_check_interval` segundos. Las demás se entregan sin ping: si la
+    primera sentencia falla con un error para el que `is_disconnect(error)`
+    es True (el servidor cerró la conexión), se reemplaza por una nueva y la
+    sentencia se repite una vez.
+    """
+
+    def __init__(self, factory, size=5, timeout=5.0, health_check_interval=30.0,
+                 is_disconnect=None):
+        self._factory = factory
+        self._size = size
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        self._is_disconnect = is_disconnect
+        self._idle = deque()  # (conexión, instante en que se devolvió)
+        self._open = 0  # conexiones vivas: en uso + ociosas + creándose
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "reconnects": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "exhausted": 0,
+            "create_errors": 0,
+            "peak_in_use": 0,
+        }
+
+    @property
+    def size(self):
+        return self._size
+
+    def acquire(self):
+        """Toma una conexión del pool, creando una nueva si hay cupo"""
+        start = time.monotonic()
+        deadline = start + self._timeout
+        waited = False
+        exhausted = False
+        connection = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._open < self._size:
+                    self._open += 1
+                    released_at = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["exhausted"] += 1
+                    exhausted = True
+                    break
+                if not waited:
+                    waited = True
+                    self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            if waited:
+                self._stats["wait_time_total"] += time.monotonic() - start
+
+        if exhausted:
+            print(f"Pool de conexiones agotado ({self._size} en uso)")
+            return None
+
+        # La verificación y la creación se hacen fuera del lock: implican red
+        verified = True
+        if connection is not None:
+            idle_for = time.monotonic() - released_at
+            verified = idle_for >= self._health_check_interval
+            if verified and not self._is_healthy(connection):
+                self._close_quietly(connection)
+                connection = None
+                with self._cond:
+                    self._stats["discarded"] += 1
+            else:
+                with self._cond:
+                    self._stats["reused"] += 1
+
+        if connection is None:
+            connection = self._create()
+            if connection is None:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                return None
+
+        with self._cond:
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+        return PooledConnection(self, connection, verified or self._is_disconnect is None)
+
+    def release(self, connection):
+        """Devuelve una conexión al pool (o la descarta si quedó inservible)"""
+        connection = _unwrap(connection)
+        healthy = True
+        try:
+            # Una transacción abierta (incluso de solo lectura) fijaría el
+            # snapshot de REPEATABLE READ para el siguiente que use la conexión
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._open -= 1
+                self._stats["discarded"] += 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_quietly(connection)
+
+    def discard(self, connection):
+        """Cierra una conexión en uso sin devolverla al pool"""
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+        self._close_quietly(_unwrap(connection))
+
+    def close_all(self):
+        """Cierra las conexiones ociosas (las que están en uso se cierran al devolverse)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """Métricas del pool, incluyendo cuántas veces se agotó"""
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                "size": self._size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            })
+        data["wait_time_total"] = round(data["wait_time_total"], 4)
+        return data
+
+    def _create(self):
+        """Conexión nueva del factory (None si no se pudo conectar)"""
+        connection = self._factory()
+        with self._cond:
+            self._stats["created" if connection is not None else "create_errors"] += 1
+        return connection
+
+    def _reconnect(self, connection):
+        """Reemplaza una conexión en uso que el servidor cerró (None si no se pudo)"""
+        self._close_quietly(connection)
+        replacement = self._create()
+        if replacement is not None:
+            # Si no se pudo, la cerrada se descarta al devolverse
+            with self._cond:
+                self._stats["discarded"] += 1
+                self._stats["reconnects"] += 1
+        return replacement
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            # is_connected() hace un ping al servidor
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _unwrap(connection):
+    return connection._connection if isinstance(connection, PooledConnection) else connection
+
+
+class PooledConnection:
+    """Conexión prestada por el pool; se usa igual que la conexión que envuelve
+
+    Si no se verificó al prestarla, su primera sentencia se repite una vez en
+    una conexión nueva cuando falla porque el servidor cerró la conexión. Es
+    seguro porque no hay autocommit: lo que alcanzó a ejecutarse en la
+    conexión perdida se deshizo al cerrarse.
+    """
+
+    def __init__(self, pool, connection, verified):
+        self._pool = pool
+        self._connection = connection
+        self._verified = verified
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        if self._verified:
+            return cursor
+        return _FirstStatementCursor(self, cursor, args, kwargs)
+
+    def _run_first(self, cursor, cursor_args, cursor_kwargs, method, args):
+        """Ejecuta la primera sentencia; devuelve el cursor con el que se ejecutó"""
+        self._verified = True
+        try:
+            getattr(cursor, method)(*args)
+            return cursor
+        except Exception as e:
+            if not self._pool._is_disconnect(e):
+                raise
+            connection = self._pool._reconnect(self._connection)
+            if connection is None:
+                raise
+            self._connection = connection
+        cursor = self._connection.cursor(*cursor_args, **cursor_kwargs)
+        getattr(cursor, method)(*args)
+        return cursor
+
+
+class _FirstStatementCursor:
+    """Cursor que, en la primera sentencia de la conexión, reconecta si hace falta"""
+
+    def __init__(self, owner, cursor, cursor_args, cursor_kwargs):
+        self._owner = owner
+        self._cursor = cursor
+        self._cursor_args = cursor_args
+        self._cursor_kwargs = cursor_kwargs
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _run(self, method, args):
+        if self._owner._verified:
+            return getattr(self._cursor, method)(*args)
+        self._cursor = self._owner._run_first(self._cursor, self._cursor_args, self._cursor_kwargs,
+                                              method, args)
+
+    def execute(self, *args):
+        return self._run("execute", args)
+
+    def executemany(self, *args):
+        return self._run("executemany", args)
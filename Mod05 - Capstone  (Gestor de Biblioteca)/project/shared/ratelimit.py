@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Límite de frecuencia por clave (usuario, IP...) con token bucket
+
+    Cada clave tiene un balde de `burst` fichas que se recarga a `rate`
+    fichas por segundo; cada intento consume una. Se guardan como máximo
+    `max_keys` baldes: se desaloja el usado hace más tiempo (un balde
+    desalojado vuelve lleno, igual que uno que no se usó en mucho tiempo).
+
+    El estado es por proceso, como las cachés en memoria.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self._max_keys = max_keys
+        self._buckets = OrderedDict()  # clave -> (fichas, instante de la última recarga)
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def allow(self, key):
+        """Consume una ficha de `key`; devuelve (permitido, segundos hasta la próxima ficha)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self._rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, 0 if allowed else (1 - tokens) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._buckets), "rejected": self._rejected}
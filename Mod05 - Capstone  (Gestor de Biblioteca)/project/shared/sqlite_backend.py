@@ -0,0 +1,266 @@
+"""
+Base de datos SQLite con la interfaz de mysql.connector que usa DatabaseLayer
+
+Permite levantar los microservicios sin un servidor MySQL, p. ej. para las
+pruebas de carga (loadtest/). Se activa con DB_BACKEND=sqlite; el archivo
+se indica con DB_SQLITE_PATH y se crea con el esquema si no existe.
+
+No es un emulador general de MySQL: traduce solo lo que usan las consultas
+de shared/database.py (marcadores %s, NOW(), INTERVAL, FOR UPDATE, el
+UPDATE con JOIN de return_loan y el MATCH ... AGAINST de la búsqueda de
+libros, que aquí recorre la tabla) y convierte los errores de sqlite3 a los de
+mysql.connector con el errno equivalente.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from mysql.connector import errorcode, errors
+
+# Esquema completo, con los índices de migrations/ (esta base no usa migraciones)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    rol TEXT NOT NULL CHECK (rol IN ('admin', 'bibliotecario')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS libros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titulo TEXT NOT NULL,
+    autor TEXT NOT NULL,
+    isbn TEXT UNIQUE NOT NULL,
+    año_publicacion INTEGER NOT NULL,
+    categoria TEXT NOT NULL,
+    disponible BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS miembros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    apellido TEXT NOT NULL,
+    correo TEXT UNIQUE NOT NULL,
+    telefono TEXT NOT NULL,
+    fecha_registro TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS prestamos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    libro_id INTEGER NOT NULL REFERENCES libros(id) ON DELETE CASCADE,
+    miembro_id INTEGER NOT NULL REFERENCES miembros(id) ON DELETE CASCADE,
+    fecha_prestamo TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    fecha_devolucion TIMESTAMP NULL,
+    estado TEXT DEFAULT 'Activo' CHECK (estado IN ('Activo', 'Devuelto'))
+);
+
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entidad TEXT NOT NULL CHECK (entidad IN ('libro', 'miembro', 'prestamo')),
+    accion TEXT NOT NULL CHECK (accion IN ('created', 'updated', 'deleted')),
+    entidad_id INTEGER NOT NULL,
+    datos TEXT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_eventos_created_at ON eventos (created_at);
+
+-- NOCASE: LIKE no distingue mayúsculas y así puede usar el índice con un prefijo
+CREATE INDEX IF NOT EXISTS idx_libros_titulo ON libros (titulo COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_libros_autor ON libros (autor COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_libros_categoria ON libros (categoria, disponible);
+CREATE INDEX IF NOT EXISTS idx_prestamos_fecha ON prestamos (fecha_prestamo);
+CREATE INDEX IF NOT EXISTS idx_prestamos_libro_estado ON prestamos (libro_id, estado);
+CREATE INDEX IF NOT EXISTS idx_prestamos_miembro ON prestamos (miembro_id);
+"""
+
+# Las columnas TIMESTAMP se devuelven como datetime, igual que con MySQL
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+_NOW = "datetime('now', 'localtime')"
+_REWRITES = (
+    (re.compile(r"\s+FOR UPDATE\b"), ""),
+    (re.compile(r"NOW\(\) - INTERVAL %s HOUR"), "datetime('now', 'localtime', '-' || %s || ' hours')"),
+    (re.compile(r"\bNOW\(\)"), _NOW),
+    (re.compile(r"MATCH\(titulo, autor\) AGAINST\(%s IN BOOLEAN MODE\)"), "fulltext_match(titulo || ' ' || autor, %s)"),
+    (re.compile(r"%[s%]"), lambda m: "?" if m.group() == "%s" else "%"),
+)
+
+# Sentencias sin equivalente en SQLite: se ejecutan como varias (misma transacción)
+_SPLIT = {
+    "UPDATE prestamos p JOIN libros l ON l.id = p.libro_id "
+    "SET p.fecha_devolucion = NOW(), p.estado = 'Devuelto', l.disponible = TRUE "
+    "WHERE p.id = %s": (
+        "UPDATE libros SET disponible = TRUE WHERE id = (SELECT libro_id FROM prestamos WHERE id = ?)",
+        f"UPDATE prestamos SET fecha_devolucion = {_NOW}, estado = 'Devuelto' WHERE id = ?",
+    ),
+}
+
+_SESSION_SETTING = re.compile(r"\s*SET SESSION\b", re.IGNORECASE)
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _translate(query):
+    """Sentencias SQLite equivalentes a una consulta de DatabaseLayer"""
+    normalized = " ".join(query.split())
+    if normalized in _SPLIT:
+        return _SPLIT[normalized]
+    for pattern, replacement in _REWRITES:
+        normalized = pattern.sub(replacement, normalized)
+    return (normalized,)
+
+
+def _fulltext_match(text, expression):
+    """MATCH ... AGAINST en modo booleano, solo con términos `+palabra*`"""
+    words = re.findall(r"\w+", (text or "").lower())
+    prefixes = [term.strip("+*") for term in expression.lower().split()]
+    return all(any(word.startswith(prefix) for word in words) for prefix in prefixes)
+
+
+def _is_write(query):
+    return not query.lstrip().upper().startswith("SELECT") or "FOR UPDATE" in query.upper()
+
+
+def _mysql_error(e):
+    """Error de mysql.connector equivalente a un error de sqlite3"""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if "FOREIGN KEY" in message:
+            return errors.IntegrityError(msg=message, errno=errorcode.ER_NO_REFERENCED_ROW_2)
+        if "UNIQUE" in message:
+            return errors.IntegrityError(msg=message, errno=errorcode.ER_DUP_ENTRY)
+        return errors.IntegrityError(msg=message, errno=errorcode.ER_BAD_NULL_ERROR)
+    if isinstance(e, sqlite3.OperationalError) and "locked" in message:
+        return errors.DatabaseError(msg=message, errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+    return errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """Cursor con la interfaz de MySQLCursor / MySQLCursorDict"""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._dictionary = dictionary
+        self._cursor = connection._db.cursor()
+        self.lastrowid = None
+        self.rowcount = -1
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    def execute(self, query, params=()):
+        if _SESSION_SETTING.match(query):
+            return  # variables de sesión de MySQL: SQLite usa su propio timeout
+        # Como mysql.connector (sin autocommit), una escritura abre una
+        # transacción que dura hasta commit() o rollback(). IMMEDIATE toma el
+        # bloqueo de escritura al empezar: es lo que da FOR UPDATE en MySQL
+        if _is_write(query) and not self._connection.in_transaction:
+            self._run("BEGIN IMMEDIATE", ())
+        for statement in _translate(query):
+            self._run(statement, tuple(params or ()))
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+
+    def executemany(self, query, rows):
+        # Como un INSERT de varias filas en MySQL: lastrowid es el id de la primera
+        first_id = None
+        count = 0
+        for row in rows:
+            self.execute(query, row)
+            first_id = first_id if first_id is not None else self.lastrowid
+            count += max(self.rowcount, 0)
+        self.lastrowid = first_id
+        self.rowcount = count
+
+    def _run(self, statement, params):
+        try:
+            self._cursor.execute(statement, params)
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión con la interfaz de MySQLConnection que usan el pool y DatabaseLayer"""
+
+    def __init__(self, path):
+        # El pool entrega la conexión a distintos hilos (uno a la vez)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.create_function("fulltext_match", 2, _fulltext_match, deterministic=True)
+
+    @property
+    def in_transaction(self):
+        return self._db is not None and self._db.in_transaction
+
+    def is_connected(self):
+        return self._db is not None
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self, dictionary)
+
+    def commit(self):
+        if self.in_transaction:
+            self._db.execute("COMMIT")
+
+    def rollback(self):
+        if self.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def create_schema(path):
+    """Crea el archivo y las tablas si no existen (modo WAL: lectores y un escritor a la vez)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode = WAL")
+        db.executescript(SCHEMA)
+    finally:
+        db.close()
+
+
+def connect(path):
+    """Abre una conexión a `path`, creando el esquema la primera vez en el proceso"""
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                try:
+                    create_schema(path)
+                except sqlite3.Error as e:
+                    raise _mysql_error(e) from e
+                _schema_ready.add(path)
+    try:
+        return SQLiteConnection(path)
+    except sqlite3.Error as e:
+        raise _mysql_error(e) from e
@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+from shared.config import ServiceConfig
+
+
+class TokenError(Exception):
+    """Token ausente, mal formado, con firma inválida o expirado"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def issue_token(user, ttl=None):
+    """Emite un token firmado (JWT HS256) con el id, nombre y rol del usuario
+
+    Devuelve (token, segundos de validez). Lo usa el servicio de autenticación.
+    """
+    ttl = ttl or ServiceConfig.TOKEN_TTL
+    now = int(time.time())
+    header = {"alg": "HS256", "typ": "JWT", "kid": ServiceConfig.TOKEN_KEY_ID}
+    claims = {
+        "sub": str(user["id"]),
+        "nombre": user["nombre"],
+        "rol": user["rol"],
+        "iat": now,
+        "exp": now + ttl,
+    }
+    signing_input = b".".join(_b64encode(json.dumps(part, separators=(",", ":")).encode())
+                              for part in (header, claims))
+    key = ServiceConfig.TOKEN_KEYS[ServiceConfig.TOKEN_KEY_ID].encode()
+    signature = hmac.new(key, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64encode(signature)).decode(), ttl
+
+
+class TokenVerifier:
+    """Verifica tokens localmente, sin llamar al servicio de autenticación
+
+    Las claves (una por `kid`, para poder rotarlas) se leen una vez al crear
+    el verificador; verificar es solo un HMAC y la lectura del JSON.
+    """
+
+    def __init__(self, keys=None, leeway=None):
+        self._keys = {kid: secret.encode() for kid, secret in (keys or ServiceConfig.TOKEN_KEYS).items()}
+        self.leeway = ServiceConfig.TOKEN_LEEWAY if leeway is None else leeway
+
+    def verify(self, token):
+        """Devuelve los claims del token; lanza TokenError si no es válido"""
+        try:
+            header_b64, claims_b64, signature_b64 = token.encode().split(b".")
+            header = json.loads(_b64decode(header_b64))
+        except (ValueError, UnicodeError):
+            raise TokenError("token mal formado")
+        if not isinstance(header, dict):
+            raise TokenError("token mal formado")
+
+        # Un kid que no es cadena (p. ej. una lista) ni siquiera sirve de llave del dict
+        kid = header.get("kid")
+        key = self._keys.get(kid) if isinstance(kid, str) else None
+        if header.get("alg") != "HS256" or key is None:
+            raise TokenError("algoritmo o clave desconocidos")
+
+        expected = hmac.new(key, header_b64 + b"." + claims_b64, hashlib.sha256).digest()
+        try:
+            signature = _b64decode(signature_b64)
+        except ValueError:
+            raise TokenError("token mal formado")
+        if not hmac.compare_digest(expected, signature):
+            raise TokenError("firma inválida")
+
+        claims = json.loads(_b64decode(claims_b64))
+        if claims.get("exp", 0) + self.leeway < time.time():
+            raise TokenError("token expirado")
+        return claims
+
+    def expires_in(self, token):
+        """Segundos que le quedan al token (negativo si expiró); TokenError si no es válido"""
+        return self.verify(token)["exp"] - time.time()
+
+
+# Uno por proceso
+token_verifier = TokenVerifier()
+
+
+def bearer_token():
+    """Token de la cabecera Authorization: Bearer de la petición actual, o None"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def protect(app, public=("health", "metrics")):
+    """Exige un token válido en todos los endpoints de `app` salvo los `public`
+
+    Los claims quedan en `g.user` ({"id", "nombre", "rol"}) para el endpoint.
+    """
+    @app.before_request
+    def verify_token():
+        if request.endpoint in public or request.endpoint is None:
+            return None
+        token = bearer_token()
+        if token is None:
+            return jsonify({"error": "Falta el token de autenticación"}), 401
+        try:
+            claims = token_verifier.verify(token)
+        except TokenError as e:
+            return jsonify({"error": f"Token inválido: {e}"}), 401
+        g.user = {"id": int(claims["sub"]), "nombre": claims.get("nombre"), "rol": claims.get("rol")}
+        return None
+
+
+def role_required(*roles):
+    """Restringe un endpoint ya protegido con protect() a los roles indicados"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if g.user["rol"] not in roles:
+                return jsonify({"error": "No tienes permisos para esta operación"}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,408 @@
+"""
+Trazas distribuidas entre el gateway y los microservicios
+
+Cada petición que atiende un servicio es un span de tipo SERVER; dentro de
+ella, cada método de DatabaseLayer, cada conexión nueva a MySQL, la espera
+por una conexión del pool y cada llamada HTTP a otro servicio son spans
+hijos. El contexto (trace id + span padre) viaja entre servicios en la
+cabecera estándar `traceparent` (W3C Trace Context), así que una página
+lenta del gateway se puede seguir hasta la consulta que la frenó.
+
+Los spans terminados se exportan en segundo plano, en formato JSON de
+Zipkin v2, a logs/traces-<servicio>.jsonl o a un colector por HTTP (Zipkin,
+Jaeger...) según TRACE_EXPORT. Sus duraciones alimentan además los
+histogramas de GET /metrics (shared/metrics.py).
+
+Para ver una traza del log (el id viene en la cabecera X-Trace-Id):
+    python -m shared.tracing <trace_id>
+"""
+
+import contextvars
+import functools
+import glob
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from shared.config import ServiceConfig
+from shared.metrics import registry, request_duration, span_duration
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+# Span activo en el hilo / corrutina actual (los hilos del fan-out copian el contexto)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """Una operación medida: nombre, duración, span padre y etiquetas"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "sampled",
+                 "tags", "start", "_start_monotonic", "duration")
+
+    def __init__(self, name, kind="INTERNAL", parent=None, tags=None):
+        """`parent` es un Span o una tupla (trace_id, span_id, sampled) recibida de otro servicio"""
+        if isinstance(parent, Span):
+            parent = (parent.trace_id, parent.span_id, parent.sampled)
+        if parent:
+            self.trace_id, self.parent_id, self.sampled = parent
+        else:
+            self.trace_id = secrets.token_hex(16)
+            self.parent_id = None
+            # Solo se exportan trazas de peticiones; el trabajo de fondo (polling
+            # de eventos, recargas del modelo de lectura) queda solo en /metrics
+            self.sampled = kind == "SERVER" and random.random() < ServiceConfig.TRACE_SAMPLE_RATE
+        self.name = name
+        self.kind = kind
+        self.span_id = secrets.token_hex(8)
+        self.tags = dict(tags or {})
+        self.start = time.time()
+        self._start_monotonic = time.monotonic()
+        self.duration = None
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def finish(self, error=None):
+        self.duration = time.monotonic() - self._start_monotonic
+        if error is not None:
+            self.tags["error"] = f"{type(error).__name__}: {error}"
+        if self.kind != "SERVER":
+            span_duration.observe(self.duration, self.name)
+        if self.sampled:
+            exporter.export(self)
+
+    def to_zipkin(self):
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.start * 1_000_000),
+            "duration": max(1, int(self.duration * 1_000_000)),
+            "localEndpoint": {"serviceName": exporter.service},
+            "tags": {key: str(value) for key, value in self.tags.items()},
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.kind != "INTERNAL":
+            span["kind"] = self.kind
+        return span
+
+
+def parse_traceparent(header):
+    """(trace_id, span_id, sampled) de una cabecera traceparent, o None si no es válida"""
+    match = _TRACEPARENT.match((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+@contextmanager
+def span(name, kind="INTERNAL", **tags):
+    """Mide el bloque como un span hijo del span activo
+
+        with span("db.get_all_books"):
+            ...
+    """
+    child = Span(name, kind, current_span.get(), tags)
+    token = current_span.set(child)
+    error = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        current_span.reset(token)
+        child.finish(error)
+
+
+def traced(name):
+    """Decorador: cada llamada a la función es un span `name`"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_static_methods(cls, prefix):
+    """Envuelve en un span cada método estático público de `cls` (p. ej. DatabaseLayer)"""
+    for name, attribute in list(vars(cls).items()):
+        if isinstance(attribute, staticmethod) and not name.startswith("_"):
+            setattr(cls, name, staticmethod(traced(prefix + name)(attribute.__func__)))
+    return cls
+
+
+def client_span(service, method, path):
+    """Span de una llamada HTTP saliente; su traceparent se envía en la petición"""
+    return span(f"http {method.upper()} {service}", "CLIENT",
+                **{"http.method": method.upper(), "http.path": path, "peer.service": service})
+
+
+def with_traceparent(kwargs, client):
+    """Añade la cabecera traceparent del span `client` a los argumentos de la petición"""
+    kwargs["headers"] = {**(kwargs.get("headers") or {}), "traceparent": client.traceparent}
+    return kwargs
+
+# ---------------------------------------------------------------------------
+# Exportación
+# ---------------------------------------------------------------------------
+
+class SpanExporter:
+    """Envía los spans terminados desde un hilo en segundo plano
+
+    La petición solo encola el span; si la cola se llena (el destino no da
+    abasto) se descartan spans en lugar de frenar al servicio. Destinos:
+    "log" (una línea JSON por span en logs/traces-<servicio>.jsonl),
+    una URL http(s) de un colector Zipkin, o "off".
+    """
+
+    BATCH_SIZE = 200
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, target, service="desconocido", queue_max=10000, log_max_bytes=50 * 1024 * 1024):
+        self.target = target
+        self.service = service
+        self.log_max_bytes = log_max_bytes
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._pid = None
+        self._lock = threading.Lock()
+        self._file = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, finished_span):
+        if self.target == "off":
+            return
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(finished_span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Un hilo por proceso (con gunicorn, en cada worker)
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._file = None
+            threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                spans = [finished.to_zipkin() for finished in batch]
+                if self.target.startswith(("http://", "https://")):
+                    requests.post(self.target, json=spans, timeout=5).raise_for_status()
+                else:
+                    self._write(spans)
+                self.exported += len(spans)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Error al exportar trazas: {e}")
+
+    @property
+    def log_path(self):
+        return os.path.join(LOG_DIR, f"traces-{self.service}.jsonl")
+
+    def _write(self, spans):
+        path = self.log_path
+        # Otro proceso del mismo servicio pudo haber rotado el archivo
+        if self._file is not None and not self._same_file(path):
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+        # Una sola escritura por lote: en modo append las líneas de varios procesos no se mezclan
+        self._file.write("".join(json.dumps(s, ensure_ascii=False) + "\n" for s in spans))
+        self._file.flush()
+        if self._file.tell() > self.log_max_bytes:
+            self._file.close()
+            self._file = None
+            os.replace(path, path + ".1")
+
+    def _same_file(self, path):
+        try:
+            return os.stat(path).st_ino == os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def stats(self):
+        return {"target": self.target, "queued": self._queue.qsize(), "exported": self.exported,
+                "dropped": self.dropped, "failed": self.failed}
+
+
+exporter = SpanExporter(ServiceConfig.TRACE_EXPORT, queue_max=ServiceConfig.TRACE_QUEUE_MAX,
+                        log_max_bytes=ServiceConfig.TRACE_LOG_MAX_BYTES)
+
+# ---------------------------------------------------------------------------
+# Integración con Flask / Quart
+# ---------------------------------------------------------------------------
+
+# Endpoints sin span: streams largos (SSE) y archivos estáticos
+UNTRACED_ENDPOINTS = ("events", "static", "metrics")
+
+
+def _start_request_span(request):
+    route = request.url_rule.rule if request.url_rule else "(sin ruta)"
+    server_span = Span(f"{request.method} {route}", "SERVER",
+                       parse_traceparent(request.headers.get("traceparent")),
+                       {"http.method": request.method, "http.path": request.path, "http.route": route})
+    current_span.set(server_span)
+    return server_span
+
+
+def _finish_request_span(server_span, status, error=None):
+    # Las peticiones que terminan con una excepción se cuentan como 500
+    status = 500 if error is not None else status or 500
+    server_span.set_tag("http.status_code", status)
+    server_span.finish(error)
+    request_duration.observe(server_span.duration, server_span.tags["http.method"],
+                             server_span.tags["http.route"], str(status))
+    current_span.set(None)
+
+
+def _metrics_response(response_class):
+    body = registry.render()
+    return response_class(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def instrument(app, service):
+    """Traza cada petición de una app Flask y registra GET /metrics
+
+    Continúa la traza de la cabecera traceparent si llega una (llamadas
+    entre servicios) o empieza una nueva (el gateway, peticiones directas).
+    Cada respuesta lleva X-Trace-Id. Debe llamarse antes que protect() para
+    que las peticiones rechazadas también se midan.
+    """
+    from flask import Response, g, request
+
+    exporter.service = service
+    registry.share(service)
+
+    @app.before_request
+    def start_trace():
+        if request.endpoint not in UNTRACED_ENDPOINTS:
+            g.trace_span = _start_request_span(request)
+
+    @app.after_request
+    def add_trace_header(response):
+        server_span = g.get('trace_span')
+        if server_span is not None:
+            server_span.set_tag("http.status_code", response.status_code)
+            response.headers['X-Trace-Id'] = server_span.trace_id
+        return response
+
+    @app.teardown_request
+    def finish_trace(error):
+        # Con respuestas en streaming se ejecuta al terminar de enviarlas
+        server_span = g.pop('trace_span', None)
+        if server_span is not None:
+            _finish_request_span(server_span, server_span.tags.get("http.status_code"), error)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return _metrics_response(Response)
+
+
+def instrument_async(app, service):
+    """Igual que instrument() para una app Quart (gateway asíncrono)"""
+    from quart import Response, g, request
+
+    exporter.service = service
+    registry.share(service)
+
+    @app.before_request
+    async def start_trace():
+        if request.endpoint not in UNTRACED_ENDPOINTS:
+            g.trace_span = _start_request_span(request)
+
+    @app.after_request
+    async def add_trace_header(response):
+        server_span = g.get('trace_span')
+        if server_span is not None:
+            server_span.set_tag("http.status_code", response.status_code)
+            response.headers['X-Trace-Id'] = server_span.trace_id
+        return response
+
+    @app.teardown_request
+    async def finish_trace(error):
+        server_span = g.pop('trace_span', None)
+        if server_span is not None:
+            _finish_request_span(server_span, server_span.tags.get("http.status_code"), error)
+
+    @app.route('/metrics', methods=['GET'])
+    async def metrics():
+        return _metrics_response(Response)
+
+# ---------------------------------------------------------------------------
+# Consulta de una traza en los logs
+# ---------------------------------------------------------------------------
+
+def load_trace(trace_id):
+    spans = []
+    for path in sorted(glob.glob(os.path.join(LOG_DIR, "traces-*.jsonl*"))):
+        with open(path, encoding="utf-8") as f:
+            spans.extend(s for s in map(json.loads, f) if s["traceId"] == trace_id)
+    return spans
+
+
+def print_trace(trace_id):
+    """Árbol de spans de una traza con su duración y su inicio relativo"""
+    spans = load_trace(trace_id)
+    if not spans:
+        print(f"No se encontró la traza {trace_id} en {LOG_DIR}")
+        return
+    children = {}
+    for s in spans:
+        children.setdefault(s.get("parentId"), []).append(s)
+    ids = {s["id"] for s in spans}
+    roots = [s for s in spans if s.get("parentId") not in ids]
+    origin = min(s["timestamp"] for s in spans)
+
+    def show(s, depth):
+        error = f"  ❌ {s['tags']['error']}" if "error" in s["tags"] else ""
+        print(f"{(s['timestamp'] - origin) / 1000:>9.1f} ms {s['duration'] / 1000:>9.1f} ms  "
+              f"{'  ' * depth}[{s['localEndpoint']['serviceName']}] {s['name']}{error}")
+        for child in sorted(children.get(s["id"], []), key=lambda c: c["timestamp"]):
+            show(child, depth + 1)
+
+    print(f"{'inicio':>12} {'duración':>12}  span")
+    for root in sorted(roots, key=lambda r: r["timestamp"]):
+        show(root, 0)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m shared.tracing <trace_id>")
+        sys.exit(1)
+    print_trace(sys.argv[1])
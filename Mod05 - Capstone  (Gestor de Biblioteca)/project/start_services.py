@@ -1,106 +1,351 @@
 """
 Script para iniciar todos los microservicios del sistema de biblioteca
-Versión optimizada para Windows
+Funciona como supervisor: inicia los servicios en paralelo, espera a que
+respondan en /health, reinicia los que se caen y los detiene con Ctrl+C
+
+Uso:
+    python start_services.py                   # servidor de desarrollo de Flask
+    python start_services.py --production      # servidor WSGI multi-proceso
+    python start_services.py --async-gateway   # gateway asíncrono (Quart)
+    python start_services.py migrate           # aplica las migraciones del esquema
 """
 
+import glob
+import logging
+import os
+import signal
 import subprocess
-import time
 import sys
-import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+import requests
+
+from shared import migrations
+from shared.config import DatabaseConfig, ServiceConfig
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Logs de cada servicio: logs/<servicio>.log, rotando a los 5 MB (3 respaldos)
+LOG_DIR = os.path.join(PROJECT_DIR, "logs")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Sondeo de /health hasta que el servicio responde
+HEALTH_POLL_INTERVAL = 0.2
+HEALTH_TIMEOUT = 1
+READY_TIMEOUT = 30  # si no responde en este tiempo se reinicia
+
+# Reinicio de servicios caídos: espera 1 s, 2 s, 4 s... hasta 30 s. Si el
+# proceso estuvo arriba al menos STABLE_AFTER segundos la espera vuelve a 1 s
+RESTART_BACKOFF_MIN = 1
+RESTART_BACKOFF_MAX = 30
+STABLE_AFTER = 60
+
+SHUTDOWN_TIMEOUT = 10
+
+_console_lock = threading.Lock()
+
+def app_module(path):
+    return path[:-len(".py")].replace("/", ".") + ":app"
+
+def wsgi_command(key, path, port, workers=None, threads=None):
+    """Comando para servir la app con un servidor WSGI de producción
+
+    - Linux/Mac: gunicorn con WSGI_WORKERS procesos de WSGI_THREADS hilos
+    - Windows: waitress (un solo proceso), con workers x threads hilos
+    """
+    module = app_module(path)
+    workers = workers or ServiceConfig.WSGI_WORKERS[key]
+    threads = threads or ServiceConfig.WSGI_THREADS[key]
+    bind = f"{ServiceConfig.WSGI_HOST}:{port}"
 
-def start_service(name, path, port):
-    """Inicia un microservicio en un proceso separado"""
-    print(f"🚀 Iniciando {name} en puerto {port}...")
-    
-    # Verificar que el archivo existe
-    if not os.path.exists(path):
-        print(f"❌ ERROR: No se encontró {path}")
-        return None
-    
-    # En Windows, usar CREATE_NEW_CONSOLE para cada proceso
     if sys.platform == 'win32':
-        process = subprocess.Popen(
-            [sys.executable, path],
-            creationflags=subprocess.CREATE_NEW_CONSOLE
-        )
-    else:
-        process = subprocess.Popen(
-            [sys.executable, path],
+        return [sys.executable, "-m", "waitress",
+                f"--listen={bind}", f"--threads={workers * threads}", module]
+    return [sys.executable, "-m", "gunicorn",
+            "--bind", bind,
+            "--workers", str(workers),
+            "--threads", str(threads),
+            "--name", key,
+            module]
+
+def asgi_command(key, path, port, workers=None):
+    """Comando para servir una app ASGI (gateway asíncrono) con uvicorn
+
+    Cada proceso es un event loop: no hace falta un hilo por petición.
+    """
+    workers = workers or ServiceConfig.WSGI_WORKERS[key]
+    return [sys.executable, "-m", "uvicorn", app_module(path),
+            "--host", ServiceConfig.WSGI_HOST,
+            "--port", str(port),
+            "--workers", str(workers),
+            "--no-access-log"]
+
+def log(message):
+    with _console_lock:
+        print(message, flush=True)
+
+
+class ManagedService:
+    """Un microservicio supervisado: proceso, logs, estado y reinicios"""
+
+    def __init__(self, name, key, path, port, depends_on=(), asgi=False):
+        self.name = name
+        self.key = key
+        self.path = path
+        self.port = port
+        self.depends_on = depends_on
+        self.asgi = asgi
+        self.health_url = f"http://127.0.0.1:{port}/health"
+
+        self.process = None
+        self.ready = False
+        self.started_at = None
+        self.next_start = 0
+        self.backoff = RESTART_BACKOFF_MIN
+        self.restarts = 0
+
+        self.logger = logging.getLogger(f"services.{key}")
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(os.path.join(LOG_DIR, f"{key}.log"),
+                                          maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUP_COUNT,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+
+    def start(self, production):
+        """Inicia el proceso y un hilo que lee su salida"""
+        if not production:
+            command = [sys.executable, self.path]
+        elif self.asgi:
+            command = asgi_command(self.key, self.path, self.port)
+        else:
+            command = wsgi_command(self.key, self.path, self.port)
+
+        # Salida sin buffer y en UTF-8 (los servicios imprimen emojis)
+        env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+
+        # En un grupo de procesos propio, para que Ctrl+C llegue solo al
+        # supervisor y sea él quien detenga los servicios en orden
+        if sys.platform == 'win32':
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            kwargs = {"start_new_session": True}
+
+        self.process = subprocess.Popen(
+            command,
+            cwd=PROJECT_DIR,
+            env=env,
+            stdin=subprocess.DEVNULL,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.STDOUT,
+            **kwargs
         )
-    
-    time.sleep(3)  # Dar más tiempo para que inicie
-    return process
+        self.ready = False
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._pump_output, args=(self.process,),
+                         name=f"log-{self.key}", daemon=True).start()
+        log(f"🚀 Iniciando {self.name} en puerto {self.port} (pid {self.process.pid})...")
+
+    def _pump_output(self, process):
+        """Copia la salida del proceso a la consola y a su archivo de log
+
+        Se lee continuamente: si nadie vacía el pipe, el proceso se bloquea
+        al llenarse el buffer.
+        """
+        for raw in iter(process.stdout.readline, b""):
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            self.logger.info(line)
+            log(f"[{self.key:<8}] {line}")
+        process.stdout.close()
+
+    def check_health(self):
+        try:
+            return requests.get(self.health_url, timeout=HEALTH_TIMEOUT).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def stop(self):
+        """Pide al proceso que termine; devuelve False si ya no corría"""
+        if self.process is None or self.process.poll() is not None:
+            return False
+        if sys.platform == 'win32':
+            self.process.terminate()
+        else:
+            # A todo el grupo: gunicorn reenvía la señal a sus workers
+            os.killpg(self.process.pid, signal.SIGTERM)
+        return True
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            if sys.platform == 'win32':
+                self.process.kill()
+            else:
+                os.killpg(self.process.pid, signal.SIGKILL)
+
+
+class Supervisor:
+    """Inicia, vigila y detiene los microservicios"""
+
+    def __init__(self, services, production=False):
+        self.services = services
+        self.production = production
+        self._by_key = {service.key: service for service in services}
+        self._all_ready_reported = False
+
+    def run(self):
+        """Bucle principal: arranque, sondeo de salud y reinicios"""
+        while True:
+            now = time.monotonic()
+            for service in self.services:
+                if service.process is None:
+                    dependencies_ready = all(self._by_key[key].ready for key in service.depends_on)
+                    if dependencies_ready and now >= service.next_start:
+                        service.start(self.production)
+                elif service.process.poll() is not None:
+                    self._schedule_restart(service, f"terminó con código {service.process.returncode}")
+                elif not service.ready:
+                    if service.check_health():
+                        service.ready = True
+                        log(f"✅ {service.name} listo en {time.monotonic() - service.started_at:.1f} s")
+                    elif now - service.started_at > READY_TIMEOUT:
+                        service.kill()
+                        service.process.wait()
+                        self._schedule_restart(service, f"no respondió en {READY_TIMEOUT} s")
+
+            if not self._all_ready_reported and all(service.ready for service in self.services):
+                self._all_ready_reported = True
+                self._print_summary()
+            time.sleep(HEALTH_POLL_INTERVAL)
+
+    def _schedule_restart(self, service, reason):
+        uptime = time.monotonic() - service.started_at
+        if uptime >= STABLE_AFTER:
+            service.backoff = RESTART_BACKOFF_MIN
+        log(f"⚠️  {service.name} {reason}; reinicio en {service.backoff} s")
+
+        service.process = None
+        service.ready = False
+        service.restarts += 1
+        service.next_start = time.monotonic() + service.backoff
+        service.backoff = min(service.backoff * 2, RESTART_BACKOFF_MAX)
+
+    def shutdown(self):
+        """Detiene los servicios en orden inverso (primero el gateway)"""
+        log("\n🛑 Deteniendo servicios...")
+        # Un segundo Ctrl+C no debe dejar procesos huérfanos
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        running = [service for service in reversed(self.services) if service.stop()]
+
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for service in running:
+            try:
+                service.process.wait(timeout=max(0, deadline - time.monotonic()))
+                log(f"   • {service.name} detenido")
+            except subprocess.TimeoutExpired:
+                service.kill()
+                service.process.wait()
+                log(f"   • {service.name} forzado a terminar")
+        log("✅ Todos los servicios detenidos")
+
+    def _print_summary(self):
+        log("")
+        log("=" * 70)
+        log("✅ TODOS LOS SERVICIOS INICIADOS")
+        log("=" * 70)
+        log("")
+        log(f"🌐 Accede a: http://localhost:{ServiceConfig.GATEWAY_PORT}")
+        log("")
+        log("📊 Servicios activos:")
+        for service in self.services:
+            line = f"   • {service.name + ':':<17}Puerto {service.port}"
+            if self.production and service.asgi:
+                line += f" ({ServiceConfig.WSGI_WORKERS[service.key]} procesos, asíncrono)"
+            elif self.production:
+                line += (f" ({ServiceConfig.WSGI_WORKERS[service.key]} procesos x "
+                         f"{ServiceConfig.WSGI_THREADS[service.key]} hilos)")
+            log(line)
+        log("")
+        log(f"📝 Logs en: {LOG_DIR}")
+        log("")
+        log("=" * 70)
+        log("\nPresiona Ctrl+C para detener todos los servicios...")
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def share_metrics():
+    """Directorio donde los workers de cada servicio suman sus métricas
+
+    Se vacía al arrancar: los archivos de una ejecución anterior no deben
+    sumarse a los contadores de esta.
+    """
+    metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(LOG_DIR, "metrics"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 def main():
+    if sys.argv[1:2] == ["migrate"]:
+        sys.exit(migrations.main(sys.argv[2:]))
+    production = "--production" in sys.argv[1:]
+    async_gateway = "--async-gateway" in sys.argv[1:]
+
     print("=" * 70)
     print("🏗️  INICIANDO ARQUITECTURA DE MICROSERVICIOS")
     print("=" * 70)
     print()
-    print(f"📂 Directorio: {os.getcwd()}")
+    print(f"📂 Directorio: {PROJECT_DIR}")
+    if production:
+        server = "waitress" if sys.platform == 'win32' else "gunicorn"
+        print(f"🏭 Modo producción: {server} (debug desactivado)")
+    if async_gateway:
+        print("⚡ Gateway asíncrono (Quart" + (" + uvicorn)" if production else ")"))
     print()
-    
-    processes = []
-    
+
+    if DatabaseConfig.BACKEND == "mysql":
+        pending = migrations.pending()
+        if pending:
+            print(f"⚠️  Migraciones pendientes: {', '.join(str(m) for m in pending)}")
+            print("   Aplícalas con: python start_services.py migrate")
+            print()
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    if production:
+        share_metrics()
+
+    # Los servicios arrancan en paralelo; el gateway cuando todos responden
+    backend = ("auth", "books", "members", "loans")
+    services = [
+        ManagedService("Auth Service", "auth", "services/auth_service/app.py", 5001),
+        ManagedService("Books Service", "books", "services/books_service/app.py", 5002),
+        ManagedService("Members Service", "members", "services/members_service/app.py", 5003),
+        ManagedService("Loans Service", "loans", "services/loans_service/app.py", 5004),
+        ManagedService("API Gateway", "gateway",
+                       "gateway/async_app.py" if async_gateway else "gateway/app.py",
+                       ServiceConfig.GATEWAY_PORT, depends_on=backend, asgi=async_gateway),
+    ]
+    supervisor = Supervisor(services, production)
+
+    # SIGTERM (p. ej. desde systemd o docker stop) se trata igual que Ctrl+C
+    if sys.platform != 'win32':
+        signal.signal(signal.SIGTERM, _interrupt)
+
     try:
-        # Servicios a iniciar
-        services = [
-            ("Auth Service", "services/auth_service/app.py", 5001),
-            ("Books Service", "services/books_service/app.py", 5002),
-            ("Members Service", "services/members_service/app.py", 5003),
-            ("Loans Service", "services/loans_service/app.py", 5004),
-        ]
-        
-        # Iniciar microservicios
-        for name, path, port in services:
-            process = start_service(name, path, port)
-            if process:
-                processes.append((name, process))
-                print(f"✅ {name} iniciado (ventana separada)")
-        
-        print()
-        time.sleep(2)
-        
-        # Iniciar Gateway
-        gateway_path = "gateway/app.py"
-        print("🌐 Iniciando API Gateway en puerto 5000...")
-        gateway_process = start_service("API Gateway", gateway_path, 5000)
-        
-        if gateway_process:
-            processes.append(("API Gateway", gateway_process))
-            print("✅ API Gateway iniciado (ventana separada)")
-        
-        print()
-        print("=" * 70)
-        print("✅ TODOS LOS SERVICIOS INICIADOS")
-        print("=" * 70)
-        print()
-        print("🌐 Accede a: http://localhost:5000")
-        print()
-        print("📊 Servicios activos en ventanas separadas:")
-        print("   • Auth Service:    Puerto 5001")
-        print("   • Books Service:   Puerto 5002")
-        print("   • Members Service: Puerto 5003")
-        print("   • Loans Service:   Puerto 5004")
-        print("   • API Gateway:     Puerto 5000")
-        print()
-        print("⚠️  IMPORTANTE:")
-        print("   - Se abrieron 5 ventanas (una por servicio)")
-        print("   - Para detener TODO: Cierra TODAS las ventanas")
-        print("   - O presiona Ctrl+C aquí y luego cierra las ventanas")
-        print()
-        print("=" * 70)
-        
-        # Mantener el script corriendo
-        print("\nPresiona Ctrl+C para terminar este script...")
-        while True:
-            time.sleep(1)
-            
+        supervisor.run()
     except KeyboardInterrupt:
-        print("\n\n🛑 Script terminado")
-        print("⚠️  RECUERDA: Cierra manualmente las ventanas de los servicios")
-        sys.exit(0)
+        pass
+    finally:
+        supervisor.shutdown()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
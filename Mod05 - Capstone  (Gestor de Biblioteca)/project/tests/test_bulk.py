@@ -0,0 +1,156 @@
+"""
+Pruebas del lector de arreglos JSON en streaming y del reporte de bulk_import
+
+Ejecutar desde project/:
+    python -m unittest discover tests
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared import bulk
+from shared.config import ServiceConfig
+
+
+def read_all(body):
+    return list(bulk.iter_records(io.BytesIO(body.encode("utf-8")), "application/json"))
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO que cuenta los bytes leídos"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read1(self, size=-1):
+        chunk = super().read1(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+class JsonArrayReaderTests(unittest.TestCase):
+
+    RECORDS = [
+        {"titulo": "Cien años de soledad", "autor": "García Márquez", "isbn": "978-0307474728",
+         "año_publicacion": 1967, "categoria": "Novela", "precio": -1.5e-3, "activo": True,
+         "notas": None, "tags": ["a", "b\"c", "ñ"]},
+        {"titulo": "x" * 300, "autor": "y", "isbn": "1", "año_publicacion": 2000, "categoria": "z"},
+        {"vacío": {}, "lista": [], "número": 12345678901234567890},
+    ]
+
+    def test_reads_whole_array(self):
+        rows = read_all(json.dumps(self.RECORDS, ensure_ascii=False))
+        self.assertEqual([row for row, _, _ in rows], [1, 2, 3])
+        self.assertEqual([record for _, record, _ in rows], self.RECORDS)
+
+    def test_objects_split_across_reads(self):
+        # Con lecturas de pocos caracteres cada objeto queda cortado en
+        # muchos puntos: dentro de cadenas, números, literales y escapes
+        body = json.dumps(self.RECORDS, ensure_ascii=False, indent=1)
+        for read_size in (1, 2, 3, 7, 16):
+            with self.subTest(read_size=read_size), mock.patch.object(bulk, "_READ_SIZE", read_size):
+                self.assertEqual([record for _, record, _ in read_all(body)], self.RECORDS)
+
+    def test_scalars_split_across_reads(self):
+        # Un número cortado también es un JSON válido: no debe leerse a medias
+        with mock.patch.object(bulk, "_READ_SIZE", 3):
+            self.assertEqual([record for _, record, _ in read_all("[1, 23456, -7.25e3, true]")],
+                             [1, 23456, -7.25e3, True])
+
+    def test_empty_array(self):
+        self.assertEqual(read_all(" [ ] "), [])
+
+    def test_malformed_row_stops_with_its_number(self):
+        body = '[{"a": 1}, {"a": }, {"a": 3}]'
+        records = bulk.iter_records(io.BytesIO(body.encode()), "application/json")
+        self.assertEqual(next(records)[1], {"a": 1})
+        with self.assertRaisesRegex(ValueError, "fila 2"):
+            next(records)
+
+    def test_malformed_row_does_not_read_the_rest(self):
+        # Un error en medio del bloque no es un objeto cortado: no se sigue leyendo
+        body = ('[{"a": 1}, {"a": tru}, ' + ", ".join(['{"b": 2}'] * 100000) + "]").encode()
+        stream = CountingStream(body)
+        with self.assertRaises(ValueError):
+            list(bulk.iter_records(stream, "application/json"))
+        self.assertLess(stream.bytes_read, 2 * bulk._READ_SIZE)
+
+    def test_missing_separator(self):
+        with self.assertRaisesRegex(ValueError, "después de la fila 1"):
+            read_all('[{"a": 1} {"a": 2}]')
+
+    def test_unclosed_array(self):
+        with self.assertRaisesRegex(ValueError, "incompleto"):
+            read_all('[{"a": 1},')
+
+    def test_truncated_last_object(self):
+        with self.assertRaisesRegex(ValueError, "fila 2"):
+            read_all('[{"a": 1}, {"a": "sin cerrar')
+
+    def test_not_an_array(self):
+        with self.assertRaisesRegex(ValueError, "arreglo"):
+            read_all('{"a": 1}')
+
+    def test_oversized_row(self):
+        body = '[{"a": 1}, {"a": "' + "x" * 5000 + '"}]'
+        with mock.patch.object(ServiceConfig, "BULK_MAX_RECORD_SIZE", 1000), \
+                mock.patch.object(bulk, "_READ_SIZE", 256):
+            records = bulk.iter_records(io.BytesIO(body.encode()), "application/json")
+            self.assertEqual(next(records)[1], {"a": 1})
+            with self.assertRaisesRegex(ValueError, "fila 2 excede 1000"):
+                next(records)
+
+    def test_row_under_the_limit_split_across_reads(self):
+        body = '[{"a": "' + "x" * 900 + '"}]'
+        with mock.patch.object(ServiceConfig, "BULK_MAX_RECORD_SIZE", 1000), \
+                mock.patch.object(bulk, "_READ_SIZE", 256):
+            self.assertEqual(read_all(body), [(1, {"a": "x" * 900}, None)])
+
+
+class BulkImportTests(unittest.TestCase):
+
+    COLUMNS = (("nombre", str, 10),)
+
+    def test_errors_are_sorted_by_row(self):
+        # La fila 2 falla al insertar su lote, después de validar las filas 3 y 4
+        records = [(1, {"nombre": "a"}, None), (2, {"nombre": "dup"}, None),
+                   (3, {"nombre": ""}, None), (4, {}, None), (5, {"nombre": "e"}, None)]
+
+        def insert_batch(rows):
+            return (sum(1 for row in rows if row != ("dup",)),
+                    [(i, "duplicado") for i, row in enumerate(rows) if row == ("dup",)])
+
+        report = bulk.bulk_import(iter(records), self.COLUMNS, insert_batch, batch_size=10)
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3, 4])
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(report["failed"], 3)
+
+    def test_reported_errors_keep_the_lowest_rows(self):
+        records = [(row, {}, None) for row in range(10, 0, -1)]
+        with mock.patch.object(ServiceConfig, "BULK_MAX_REPORTED_ERRORS", 3):
+            report = bulk.bulk_import(iter(records), self.COLUMNS, lambda rows: (len(rows), []))
+        self.assertEqual([error["row"] for error in report["errors"]], [1, 2, 3])
+        self.assertEqual(report["failed"], 10)
+
+    def test_format_error_aborts_but_keeps_inserted_rows(self):
+        body = io.BytesIO(b'[{"nombre": "a"}, {"nombre": }]')
+        records = bulk.iter_records(body, "application/json")
+        report = bulk.bulk_import(records, self.COLUMNS, lambda rows: (len(rows), []))
+        self.assertEqual(report["inserted"], 1)
+        self.assertIn("fila 2", report["aborted"])
+
+
+if __name__ == "__main__":
+    unittest.main()